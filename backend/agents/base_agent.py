@@ -1,7 +1,11 @@
 # agents/base_agent.py
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
-from models.groq_models import GroqModelManager
+from models.groq_models import get_groq_manager
+from agents.prompt_assembly import PromptAssembler
+from utils.deadline import Deadline
+from utils.bulkhead import get_bulkhead
+from utils.task_tracker import current_session
 
 class BaseSDLCAgent(ABC):
     def __init__(self, name: str, role: str, expertise: List[str]):
@@ -14,7 +18,8 @@ class BaseSDLCAgent(ABC):
     @property
     def groq_manager(self):
         if self._groq_manager is None:
-            self._groq_manager = GroqModelManager()
+            # One manager (and connection pool) for every agent in the process
+            self._groq_manager = get_groq_manager()
         return self._groq_manager
 
     @abstractmethod
@@ -22,84 +27,96 @@ class BaseSDLCAgent(ABC):
         pass
 
     async def process_request(self, user_input: str, context: Dict[str, Any]) -> str:
+        # Bulkhead: agent calls share global, per-session and per-role concurrency caps, so one
+        # session fanning out to the team over and over queues behind its own work instead of
+        # starving everyone else. context["priority"] orders the wait (direct calls first) and
+        # context["on_queued"](role, position) hears about it. A call that gets no slot raises
+        # BulkheadFull so the entry point answers with a busy frame, never an agent reply.
+        deadline = Deadline.from_context(context)
+        on_queued = context.get("on_queued")
+        async with get_bulkhead().slot(
+            self.role,
+            session_id=context.get("session_id") or current_session.get(),
+            timeout=deadline.remaining() if deadline is not None else None,
+            on_queued=(lambda position: on_queued(self.role, position)) if on_queued else None,
+            priority=context.get("priority")
+        ):
+            return await self._generate(user_input, context)
+
+    async def _generate(self, user_input: str, context: Dict[str, Any]) -> str:
         # Check if this is a direct call to this agent
         is_direct_call = context.get("direct_call", False)
         interaction_type = context.get("interaction_type", "")
         
-        # Prepare the context with uploaded files if available
-        context_str = f"Context: {context}"
-        
-        # Add uploaded files to the context if they exist
-        if 'uploaded_files' in context and context['uploaded_files']:
-            context_str += "\n\nUPLOADED DOCUMENTS:\n"
-            for i, file_info in enumerate(context['uploaded_files'], 1):
-                context_str += f"\n{i}. FILE: {file_info.get('name', 'Unknown')}\n"
-                context_str += f"   TYPE: {file_info.get('type', 'Unknown')}\n"
-                context_str += f"   SIZE: {file_info.get('size', 0)} bytes\n"
-                
-                # Include file content with smart truncation
-                content = file_info.get('content', '')
-                if content and file_info.get('type', '').startswith(('text/', 'application/json')):
-                    # For text files, truncate if too long (approximate token limit)
-                    max_chars = 8000  # Roughly 2000 tokens worth of content
-                    if len(content) > max_chars:
-                        context_str += f"   CONTENT (truncated - showing first {max_chars} characters):\n{content[:max_chars]}...\n"
-                        context_str += f"   [Note: File is {len(content)} characters total, truncated for processing]\n"
-                    else:
-                        context_str += f"   CONTENT:\n{content}\n"
-                elif content and file_info.get('type') == 'application/pdf':
-                    # For PDFs, provide a summary instead of full content
-                    if len(content) > 8000:
-                        context_str += f"   CONTENT SUMMARY: This is a PDF document. Key sections visible:\n{content[:2000]}...\n"
-                        context_str += f"   [Note: PDF content truncated for processing - full document is {len(content)} characters]\n"
-                    else:
-                        context_str += f"   CONTENT: {content}\n"
-                else:
-                    context_str += f"   CONTENT: [Binary file - {file_info.get('type', 'unknown type')}]\n"
-                context_str += "---\n"
-
         # Build system prompt with direct call context if applicable
         system_prompt = self.get_system_prompt()
         if is_direct_call:
             system_prompt += f"\n\nIMPORTANT: {interaction_type} Be conversational and personable, as if speaking directly to a colleague."
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"{context_str}\n\nRequest: {user_input}"}
-        ]
+        # Fit project context, documents, history and team responses into this role's
+        # token budget; each section is rendered once and volatile keys are left out so
+        # repeated requests produce identical prompts and hit the completion cache.
+        model = getattr(self.groq_manager, "model_mapping", {}).get(self.role, "llama-3.1-8b-instant")
+        prompt = PromptAssembler(self.role, model).build(system_prompt, user_input, context)
+        messages = prompt.messages
+        if prompt.truncated:
+            print(f"[AGENT] {self.name} prompt trimmed to {prompt.prompt_tokens} tokens: {', '.join(prompt.truncated)}")
 
-        # Additional safety check - if context is still too large, truncate further
-        total_length = len(self.get_system_prompt()) + len(context_str) + len(user_input)
-        if total_length > 15000:  # Conservative limit to avoid token issues
-            print(f"[AGENT] Warning: Context very large ({total_length} chars), truncating...")
-            # Reduce context_str if needed
-            if len(context_str) > 10000:
-                context_str = context_str[:10000] + "\n[Context truncated for processing...]"
-                messages[1]["content"] = f"{context_str}\n\nRequest: {user_input}"
+        # Request-scoped time budget: skip the call once it has run out, otherwise size
+        # the completion so it can finish in time and keep what arrived if it doesn't
+        deadline = Deadline.from_context(context)
+        max_tokens = prompt.max_tokens
+        if deadline is not None:
+            if deadline.expired():
+                print(f"[AGENT] {self.name} skipped: request deadline reached")
+                return ""
+            max_tokens = deadline.cap_max_tokens(max_tokens)
 
         try:
-            completion = await self.groq_manager.get_completion(
+            # Consume the Groq stream asynchronously so other agents and sessions keep
+            # running while this one waits on tokens. Cancellation propagates to the
+            # provider, which closes the upstream stream.
+            chunks = []
+            stream = self.groq_manager.stream_completion(
                 role=self.role,
                 messages=messages,
-                temperature=0.7
+                temperature=0.7,
+                max_tokens=max_tokens,
+                use_cache=True,
+                deadline=deadline
             )
+            # Optional per-request streaming: stream_handler(role) gives a callback that
+            # forwards each delta to the client while the full text is still collected here
+            stream_handler = context.get("stream_handler")
+            on_token = stream_handler(self.role) if stream_handler else None
+
+            async def consume():
+                nonlocal on_token
+                async for delta in stream:
+                    chunks.append(delta)
+                    if on_token is not None:
+                        try:
+                            await on_token(delta)
+                        except Exception as emit_err:
+                            print(f"[AGENT] Stopped streaming {self.name} to client: {emit_err}")
+                            on_token = None
+                return True
 
-            # Handle streaming response from Groq
-            full_response = ""
             try:
-                for chunk in completion:
-                    if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta
-                        if hasattr(delta, 'content') and delta.content:
-                            full_response += delta.content
+                if deadline is None:
+                    await consume()
+                elif not await deadline.run(consume(), default=False):
+                    # Out of time mid-generation: the stream is closed, keep the partial reply
+                    print(f"[AGENT] {self.name} stopped at the request deadline after {len(chunks)} chunks")
+                    if not chunks:
+                        return ""
             except Exception as stream_err:
-                print(f"[AGENT] Streaming error for {self.name}: {stream_err}")
-                # Fallback: try to get the response as a whole
-                if hasattr(completion, 'choices') and len(completion.choices) > 0:
-                    message = completion.choices[0].message
-                    if hasattr(message, 'content'):
-                        full_response = message.content
-            
+                if not chunks:
+                    raise
+                # Keep whatever arrived before the stream broke
+                print(f"[AGENT] Streaming error for {self.name} after {len(chunks)} chunks: {stream_err}")
+            full_response = "".join(chunks)
+
             result = full_response.strip() if full_response else f"I'm {self.name}, ready to help with {self.role} tasks."
             print(f"[AGENT] {self.name} generated {len(result)} chars: {result[:100]}...")
             return result
@@ -107,4 +124,4 @@ class BaseSDLCAgent(ABC):
         except Exception as e:
             error_msg = f"Error in {self.name}: {str(e)}"
             print(f"[AGENT] {error_msg}")
-            return error_msg
\ No newline at end of file
+            return error_msg
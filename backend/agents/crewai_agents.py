@@ -4,13 +4,30 @@ This replaces the simple keyword-based routing with true agent orchestration
 """
 from crewai import Agent, Task, Crew, Process, LLM
 from crewai_tools import tool
+import asyncio
 import os
 from typing import List, Dict, Any, Optional
 import json
+from functools import lru_cache
+
+from utils.deadline import Deadline
+from models.groq_models import get_provider_registry
+from core.intent_classifier import get_intent_classifier
 
 # Initialize LLM for CrewAI - OpenRouter provides FREE access to Gemini!
+@lru_cache(maxsize=1)
 def get_groq_llm():
-    """Get LLM instance for CrewAI agents - Uses OpenRouter for FREE AI access"""
+    """Get LLM instance for CrewAI agents - Uses OpenRouter for FREE AI access.
+
+    Built once and shared by every agent. CrewAI calls the provider from worker
+    threads through litellm, so litellm is pointed at the registry's blocking
+    keep-alive pool instead of opening a session per call.
+    """
+    try:
+        import litellm
+        litellm.client_session = get_provider_registry().sync_http_client()
+    except ImportError:
+        pass
     
     # Try OpenRouter first (RECOMMENDED - FREE models)
     openrouter_key = os.getenv("OPENROUTER_API_KEY")
@@ -313,6 +330,17 @@ class FLUXCrewAI:
             expected_output="A detailed response addressing the user's request"
         )
     
+    async def _kickoff(self, crew: Crew, context: Dict[str, Any] = None):
+        """
+        Run the blocking crew.kickoff() in a worker thread so the event loop keeps
+        serving other sessions, bounded by the request deadline if one was given.
+        On timeout the caller gets asyncio.TimeoutError; the thread finishes on its own.
+        """
+        deadline = Deadline.from_context(context)
+        if deadline is None:
+            return await asyncio.to_thread(crew.kickoff)
+        return await asyncio.wait_for(asyncio.to_thread(crew.kickoff), timeout=deadline.remaining())
+    
     async def execute_single_agent(self, agent_key: str, message: str, context: Dict[str, Any] = None) -> str:
         """
         Execute a single agent task (for direct calls like "Hi Messi")
@@ -334,11 +362,15 @@ class FLUXCrewAI:
             )
             
             # Execute and get result
-            result = crew.kickoff()
+            result = await self._kickoff(crew, context)
             print(f"[CrewAI] ✅ {agent_key} completed task")
             
             return str(result)
             
+        except asyncio.TimeoutError:
+            print(f"[CrewAI] ⏱️ {agent_key} did not finish before the request deadline")
+            return f"⏱️ {agent_key} ran out of time on this one - please try again or narrow the request."
+            
         except Exception as e:
             error_msg = f"Error executing {agent_key}: {str(e)}"
             print(f"[CrewAI] ❌ {error_msg}")
@@ -395,7 +427,7 @@ class FLUXCrewAI:
             print(f"[CrewAI] 🚀 Executing crew with {len(agents)} agents")
             
             # Execute - agents will coordinate autonomously!
-            result = crew.kickoff()
+            result = await self._kickoff(crew, context)
             
             # Parse results back to agent responses
             responses = {}
@@ -406,6 +438,11 @@ class FLUXCrewAI:
             print(f"[CrewAI] ✅ Team collaboration complete")
             return responses
             
+        except asyncio.TimeoutError:
+            error_msg = "Team collaboration did not finish before the request deadline"
+            print(f"[CrewAI] ⏱️ {error_msg}")
+            return {"error": error_msg}
+            
         except Exception as e:
             error_msg = f"Team collaboration error: {str(e)}"
             print(f"[CrewAI] ❌ {error_msg}")
@@ -422,6 +459,22 @@ class FLUXCrewAI:
         """
         print(f"[CrewAI] 🧠 Smart routing message: '{message[:100]}...'")
         
+        # Local classifier first: a confident prediction skips the LLM routing round entirely
+        prediction = get_intent_classifier().classify(message)
+        if prediction.confident:
+            selected_agents = prediction.shortlist()
+            print(f"[CrewAI] ⚡ Local routing ({prediction.confidence:.2f} confidence): {selected_agents}")
+            return await self.execute_team_collaboration(message, selected_agents, context)
+        
+        # The routing round is an extra LLM call; skip it when the request is short on time
+        deadline = Deadline.from_context(context)
+        if deadline is not None and not deadline.allows_optional():
+            fallback = prediction.agent or "messi"
+            print(f"[CrewAI] ⏱️ {deadline.remaining():.1f}s left - skipping routing round, using {fallback}")
+            return await self.execute_team_collaboration(message, [fallback], context)
+        
+        print(f"[CrewAI] 🤔 Low routing confidence ({prediction.confidence:.2f}) - asking Modric")
+        
         # Let Modric (Project Manager) analyze and route
         analysis_task = Task(
             description=f"""Analyze this request and determine which team members should handle it:
@@ -451,7 +504,10 @@ class FLUXCrewAI:
             verbose=True
         )
         
-        routing_result = str(crew.kickoff()).lower()
+        try:
+            routing_result = str(await self._kickoff(crew, context)).lower()
+        except asyncio.TimeoutError:
+            return {"error": "Routing did not finish before the request deadline"}
         
         # Parse agent names from result
         agent_mapping = {
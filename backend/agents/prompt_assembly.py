@@ -0,0 +1,300 @@
+# agents/prompt_assembly.py
+"""
+Token-budgeted prompt assembly for SDLC agents.
+
+Each role gets an input token budget. The system prompt and the user's request
+are always kept whole; what is left is split between uploaded documents,
+conversation history and other agents' responses, with unused share handed on
+to sections that need more. Every section is rendered exactly once, and
+max_tokens is chosen so prompt plus completion fit the model's context window.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Context window (tokens) per Groq model
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "openai/gpt-oss-120b": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "meta-llama/llama-guard-4-12b": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Average characters per token; Llama's tokenizer packs less text per token than the gpt-oss one
+CHARS_PER_TOKEN = {
+    "openai/": 4.0,
+    "llama": 3.5,
+    "meta-llama/": 3.5,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Input token budget per role. Override with PROMPT_BUDGETS='{"developer": 10000}'
+ROLE_INPUT_BUDGETS = {
+    "requirements_analyst": 6000,
+    "software_architect": 5000,
+    "developer": 8000,
+    "qa_tester": 5000,
+    "devops_engineer": 4000,
+    "project_manager": 4000,
+    "security_expert": 5000,
+}
+DEFAULT_INPUT_BUDGET = 4000
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+CONTEXT_SAFETY_MARGIN = 256
+
+# Share of the flexible budget offered to each section, in the order leftovers are handed out
+SECTION_SHARES = (
+    ("documents", 0.55),
+    ("history", 0.25),
+    ("team", 0.20),
+)
+
+# Project fields worth a line in the prompt; everything else in the context dict is plumbing
+PROJECT_FIELDS = ("projectName", "technology", "phase")
+TEXT_FILE_TYPES = ("text/", "application/json")
+
+
+@dataclass
+class AssembledPrompt:
+    messages: List[Dict[str, str]]
+    max_tokens: int
+    prompt_tokens: int
+    sections: Dict[str, int] = field(default_factory=dict)
+    truncated: List[str] = field(default_factory=list)
+
+
+class PromptAssembler:
+    def __init__(self, role: str, model: str, input_budget: int = None, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS):
+        self.role = role
+        self.model = model
+        self.context_window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+        self.chars_per_token = next(
+            (ratio for prefix, ratio in CHARS_PER_TOKEN.items() if model.startswith(prefix)),
+            DEFAULT_CHARS_PER_TOKEN,
+        )
+        self.input_budget = input_budget or _role_budgets().get(role, DEFAULT_INPUT_BUDGET)
+        self.max_output_tokens = max_output_tokens
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        return int(len(text) / self.chars_per_token) + 1
+
+    def build(self, system_prompt: str, user_input: str, context: Dict[str, Any]) -> AssembledPrompt:
+        request_text = f"Request: {user_input}"
+        project_text = self._render_project(context)
+
+        fixed_tokens = (
+            self.estimate(system_prompt)
+            + self.estimate(request_text)
+            + self.estimate(project_text)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        # Never let the input crowd out a useful completion
+        budget = min(self.input_budget, self.context_window - self.max_output_tokens - CONTEXT_SAFETY_MARGIN)
+        flexible = max(0, budget - fixed_tokens)
+
+        candidates = {
+            "documents": _unique_files(context.get("uploaded_files") or []),
+            "history": list(context.get("conversation_history") or []),
+            "team": dict(context.get("previous_responses") or {}),
+        }
+        allowances = self._allocate(flexible, {
+            "documents": self._documents_need(candidates["documents"]),
+            "history": self._history_need(candidates["history"]),
+            "team": self._team_need(candidates["team"]),
+        })
+
+        truncated: List[str] = []
+        rendered = {
+            "documents": self._render_documents(candidates["documents"], allowances["documents"], truncated),
+            "history": self._render_history(candidates["history"], allowances["history"], truncated),
+            "team": self._render_team(candidates["team"], allowances["team"], truncated),
+        }
+
+        parts = [p for p in (project_text, rendered["documents"], rendered["history"], rendered["team"]) if p]
+        parts.append(request_text)
+        user_content = "\n\n".join(parts)
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ]
+        sections = {
+            "system": self.estimate(system_prompt),
+            "project": self.estimate(project_text),
+            "documents": self.estimate(rendered["documents"]),
+            "history": self.estimate(rendered["history"]),
+            "team": self.estimate(rendered["team"]),
+            "request": self.estimate(request_text),
+        }
+        prompt_tokens = sum(sections.values()) + 2 * MESSAGE_OVERHEAD_TOKENS
+        max_tokens = max(64, min(self.max_output_tokens, self.context_window - prompt_tokens - CONTEXT_SAFETY_MARGIN))
+
+        return AssembledPrompt(messages, max_tokens, prompt_tokens, sections, truncated)
+
+    # Budget allocation
+
+    @staticmethod
+    def _allocate(flexible: int, needs: Dict[str, int]) -> Dict[str, int]:
+        """Give each section up to its share, then hand leftovers to sections still short"""
+        allowances = {}
+        for name, share in SECTION_SHARES:
+            allowances[name] = min(needs[name], int(flexible * share))
+        leftover = flexible - sum(allowances.values())
+        for name, _ in SECTION_SHARES:
+            if leftover <= 0:
+                break
+            extra = min(leftover, needs[name] - allowances[name])
+            allowances[name] += extra
+            leftover -= extra
+        return allowances
+
+    def _documents_need(self, files: List[Dict[str, Any]]) -> int:
+        return sum(self.estimate(self._file_header(i, f)) + self.estimate(_file_text(f)) for i, f in enumerate(files, 1))
+
+    def _history_need(self, history: List[Dict[str, Any]]) -> int:
+        return sum(self.estimate(_history_line(m)) for m in history)
+
+    def _team_need(self, responses: Dict[str, Any]) -> int:
+        return sum(self.estimate(f"{agent}: {text}") for agent, text in responses.items())
+
+    # Section rendering
+
+    def _render_project(self, context: Dict[str, Any]) -> str:
+        fields: Dict[str, Any] = {}
+        nested = context.get("project_context")
+        if isinstance(nested, dict):
+            fields.update({k: v for k, v in nested.items() if isinstance(v, (str, int, float)) and v != ""})
+        for key in PROJECT_FIELDS:
+            value = context.get(key)
+            if isinstance(value, (str, int, float)) and value != "":
+                fields[key] = value
+
+        lines = [f"- {key}: {value}" for key, value in fields.items()]
+        if context.get("conversation_flow"):
+            lines.append(f"- {context['conversation_flow']}")
+        if not lines:
+            return ""
+        return "PROJECT CONTEXT:\n" + "\n".join(lines)
+
+    def _render_documents(self, files: List[Dict[str, Any]], allowance: int, truncated: List[str]) -> str:
+        if not files or allowance <= 0:
+            return ""
+        blocks = []
+        remaining = allowance
+        text_files = [f for f in files if _file_text(f)]
+        for i, file_info in enumerate(files, 1):
+            header = self._file_header(i, file_info)
+            remaining -= self.estimate(header)
+            text = _file_text(file_info)
+            if text:
+                # Split what is left evenly across the text files not yet rendered
+                share = max(0, remaining // max(1, len(text_files)))
+                text_files = text_files[1:]
+                body = self._fit(text, share)
+                if len(body) < len(text):
+                    truncated.append(f"document:{file_info.get('name', 'Unknown')}")
+                remaining -= self.estimate(body)
+                blocks.append(f"{header}\n{body}" if body else header)
+            else:
+                blocks.append(header)
+        return "UPLOADED DOCUMENTS:\n" + "\n---\n".join(blocks)
+
+    def _render_history(self, history: List[Dict[str, Any]], allowance: int, truncated: List[str]) -> str:
+        if not history or allowance <= 0:
+            return ""
+        lines = []
+        remaining = allowance
+        # Most recent turns matter most; walk backwards and stop when the budget runs out
+        for message in reversed(history):
+            line = _history_line(message)
+            cost = self.estimate(line)
+            if cost > remaining:
+                truncated.append(f"history:{len(history) - len(lines)} older messages")
+                break
+            lines.append(line)
+            remaining -= cost
+        if not lines:
+            return ""
+        return "CONVERSATION HISTORY (oldest first):\n" + "\n".join(reversed(lines))
+
+    def _render_team(self, responses: Dict[str, Any], allowance: int, truncated: List[str]) -> str:
+        if not responses or allowance <= 0:
+            return ""
+        per_agent = allowance // len(responses)
+        lines = []
+        for agent, text in responses.items():
+            body = self._fit(str(text), per_agent - self.estimate(f"{agent}: "))
+            if len(body) < len(str(text)):
+                truncated.append(f"team:{agent}")
+            if body:
+                lines.append(f"{agent}: {body}")
+        if not lines:
+            return ""
+        return "TEAM RESPONSES SO FAR:\n" + "\n".join(lines)
+
+    def _fit(self, text: str, tokens: int) -> str:
+        """Cut text to roughly `tokens`, preferring a line break, and say how much was dropped"""
+        if tokens <= 0:
+            return ""
+        if self.estimate(text) <= tokens:
+            return text
+        limit = int(tokens * self.chars_per_token) - 60  # Room for the truncation note
+        if limit <= 0:
+            return ""
+        cut = text.rfind("\n", int(limit * 0.8), limit)
+        cut = cut if cut > 0 else limit
+        return f"{text[:cut]}\n[... {len(text) - cut} more characters truncated]"
+
+    @staticmethod
+    def _file_header(index: int, file_info: Dict[str, Any]) -> str:
+        file_type = file_info.get("type", "Unknown")
+        header = f"{index}. FILE: {file_info.get('name', 'Unknown')} ({file_type}, {file_info.get('size', 0)} bytes)"
+        if not _file_text(file_info) and file_info.get("content"):
+            header += f"\n   [Binary file - {file_type}, content not included]"
+        return header
+
+
+def _role_budgets() -> Dict[str, int]:
+    budgets = dict(ROLE_INPUT_BUDGETS)
+    override = os.getenv("PROMPT_BUDGETS")
+    if override:
+        try:
+            budgets.update({k: int(v) for k, v in json.loads(override).items()})
+        except (ValueError, AttributeError) as e:
+            print(f"[PROMPT] Ignoring invalid PROMPT_BUDGETS: {e}")
+    return budgets
+
+
+def _file_text(file_info: Dict[str, Any]) -> str:
+    """Text worth showing the model; binary uploads contribute metadata only"""
+    content = file_info.get("content") or ""
+    file_type = file_info.get("type", "")
+    if file_type.startswith(TEXT_FILE_TYPES) or file_type == "application/pdf":
+        return content
+    return ""
+
+
+def _unique_files(files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop files uploaded more than once in the same request"""
+    seen = set()
+    unique = []
+    for file_info in files:
+        digest = hashlib.sha1((file_info.get("content") or "").encode("utf-8", "ignore")).hexdigest()
+        key: Tuple[Optional[str], str] = (file_info.get("name"), digest)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(file_info)
+    return unique
+
+
+def _history_line(message: Dict[str, Any]) -> str:
+    speaker = message.get("agent") or message.get("role") or message.get("type") or "user"
+    return f"{speaker}: {message.get('message') or message.get('content') or ''}"
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Agent matcher microbenchmark - shows mention detection runs in linear time.
+
+Scans synthetic agent replies of growing length with the compiled single-pass
+matcher and with the per-alias loop it replaced (one re.search per alias plus
+the greeting, dismissal and team keyword loops). Time per character should stay
+flat for the matcher as replies get longer.
+
+Usage:
+    python benchmark_agent_matcher.py
+"""
+
+import re
+import time
+
+from workflows.sdlc_workflow import AGENT_MATCHER, AGENT_NAMES, AGENT_ROLES
+
+SENTENCE = (
+    "Based on the requirements, Marcus should review the service boundaries while Alex "
+    "drafts the API and Jessica plans regression tests; the devops pipeline needs an update too. "
+)
+SIZES = (2_000, 8_000, 32_000, 128_000)
+REPEATS = 5
+
+
+def legacy_scan(text: str) -> set:
+    """The detection the routers used to do: a separate pass per alias and keyword list"""
+    text_lower = text.lower()
+    found = set()
+    for pattern in (r"\bhi\s+(\w+)", r"\bhello\s+(\w+)", r"\bhey\s+(\w+)", r"\bgreetings\s+(\w+)"):
+        re.search(pattern, text_lower)
+    for name, agent in {**AGENT_ROLES, **AGENT_NAMES}.items():
+        if name in text_lower and re.search(r"\b" + re.escape(name) + r"\b", text_lower):
+            found.add(agent)
+    for dismissal in ("drop off", "drop out", "leave", "dismiss", "step back", "thank you", "thanks", "goodbye", "bye"):
+        dismissal in text_lower
+    any(word in text_lower for word in ("everyone", "everybody", "team", "all agents", "all of you"))
+    return found
+
+
+def time_scan(scan, text: str) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        scan(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark() -> dict:
+    results = {}
+    print(f"{'chars':>8} | {'matcher ms':>10} | {'ns/char':>7} | {'legacy ms':>9}")
+    print("-" * 44)
+    for size in SIZES:
+        text = (SENTENCE * (size // len(SENTENCE) + 1))[:size]
+        matcher = time_scan(AGENT_MATCHER.scan, text)
+        legacy = time_scan(legacy_scan, text)
+        results[size] = matcher
+        print(f"{size:>8} | {matcher * 1000:>10.2f} | {matcher / size * 1e9:>7.0f} | {legacy * 1000:>9.2f}")
+
+    smallest, largest = SIZES[0], SIZES[-1]
+    growth = (results[largest] / largest) / (results[smallest] / smallest)
+    print(f"\nPer-character cost at {largest} chars vs {smallest} chars: {growth:.2f}x (1.0 = linear)")
+    return {"per_char_growth": growth, "timings": results}
+
+
+def test_matcher_scales_linearly():
+    result = run_benchmark()
+    assert result["per_char_growth"] < 2.0
+    # Same agents found as the per-alias loop on a long reply
+    text = SENTENCE * 200
+    assert set(AGENT_MATCHER.scan(text).agents) == legacy_scan(text)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Intent classifier benchmark - routing accuracy and throughput on a labeled corpus.
+
+Runs every message in routing_corpus.json through the local BM25 classifier and
+through the substring keyword scorer it replaced, and reports accuracy, how many
+messages would still escalate to the LLM router, and per-decision latency.
+
+Usage:
+    python benchmark_intent_classifier.py
+"""
+
+import json
+import os
+import time
+
+from core.intent_classifier import IntentClassifier
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_corpus.json")
+REPEATS = 20
+
+# The keyword lists SimpleAgentRouter._select_best_agent used to count as raw substrings
+LEGACY_KEYWORDS = {
+    "messi": ["requirement", "requirements", "specification", "spec", "user story", "acceptance criteria", "business rule"],
+    "ronaldo": ["architecture", "design", "system", "structure", "component", "module", "pattern", "framework"],
+    "neymar": ["code", "coding", "implement", "development", "programming", "function", "class", "method", "algorithm"],
+    "mbappe": ["test", "testing", "quality", "bug", "issue", "validation", "verification", "qa", "quality assurance"],
+    "benzema": ["deploy", "deployment", "infrastructure", "server", "cloud", "docker", "kubernetes", "devops", "ci/cd"],
+    "modric": ["project", "management", "timeline", "schedule", "milestone", "resource", "planning", "coordination"],
+    "ramos": ["security", "vulnerability", "authentication", "authorization", "encryption", "protection", "secure"],
+}
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def legacy_select(message: str):
+    message_lower = message.lower()
+    scores = {agent: sum(1 for k in keywords if k in message_lower) for agent, keywords in LEGACY_KEYWORDS.items()}
+    scores = {agent: score for agent, score in scores.items() if score > 0}
+    return max(scores, key=scores.get) if scores else None
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_benchmark() -> dict:
+    corpus = load_corpus()
+    classifier = IntentClassifier()
+
+    correct = legacy_correct = confident = confident_correct = 0
+    for row in corpus:
+        prediction = classifier.classify(row["message"])
+        correct += prediction.agent == row["agent"]
+        legacy_correct += legacy_select(row["message"]) == row["agent"]
+        if prediction.confident:
+            confident += 1
+            confident_correct += prediction.agent == row["agent"]
+
+    latencies = []
+    for _ in range(REPEATS):
+        for row in corpus:
+            start = time.perf_counter()
+            classifier.classify(row["message"])
+            latencies.append(time.perf_counter() - start)
+
+    result = {
+        "messages": len(corpus),
+        "accuracy": correct / len(corpus),
+        "legacy_accuracy": legacy_correct / len(corpus),
+        "escalation_rate": 1 - confident / len(corpus),
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+        "decisions_per_second": len(latencies) / sum(latencies),
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+    }
+    print(f"Messages:            {result['messages']}")
+    print(f"Accuracy:            {result['accuracy']:.1%} (substring scorer: {result['legacy_accuracy']:.1%})")
+    print(f"Escalated to LLM:    {result['escalation_rate']:.1%}")
+    print(f"Accuracy when local: {result['confident_accuracy']:.1%}")
+    print(f"Throughput:          {result['decisions_per_second']:,.0f} decisions/s")
+    print(f"Latency:             p50 {result['p50_us']:.1f}us, p99 {result['p99_us']:.1f}us")
+    return result
+
+
+def test_classifier_accuracy_and_latency():
+    result = run_benchmark()
+    assert result["accuracy"] >= 0.9
+    assert result["accuracy"] > result["legacy_accuracy"]
+    assert result["confident_accuracy"] >= 0.95
+    assert result["p99_us"] < 1000
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Priority dispatch benchmark - direct-call latency while team fan-outs saturate capacity.
+
+Several sessions keep calling the whole team back to back while other users send
+"Hi Messi"-style direct calls. Agent calls go through the bulkhead with a small
+global cap, so they queue. Compares p50/p95 direct-call latency with the
+weighted fair queue (direct calls weighted ahead of team work) against the same
+queue with every class weighted equally, and checks team throughput holds up.
+
+Usage:
+    python benchmark_priority.py
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import random
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import utils.bulkhead as bulkhead_module
+from utils.bulkhead import Bulkhead, PRIORITY_WEIGHTS
+from core.simple_agent_router import SimpleAgentRouter
+
+AGENT_SECONDS = 0.05          # Mean simulated time per agent reply (+/- 60% jitter)
+MAX_CONCURRENT = 8            # Global bulkhead cap for the run
+TEAM_SESSIONS = 6             # Sessions calling the whole team back to back
+DIRECT_CALLS = 40
+DIRECT_INTERVAL = 0.03        # Seconds between direct calls from other users
+
+
+class JitteredLatencyManager:
+    model_mapping = {}
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+
+    async def stream_completion(self, **kwargs):
+        await asyncio.sleep(AGENT_SECONDS * self.random.uniform(0.4, 1.6))
+        yield "ok"
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_load(router: SimpleAgentRouter, weights: dict) -> dict:
+    bulkhead_module._bulkhead_instance = Bulkhead(max_concurrent=MAX_CONCURRENT, per_session=7, per_role=100,
+                                                  max_queue=1000, weights=weights)
+    stop = asyncio.Event()
+    team_replies = 0
+
+    async def team_session(i: int):
+        nonlocal team_replies
+        while not stop.is_set():
+            responses = await router.route_message("Hey everyone, status check", {"session_id": f"team-{i}"})
+            team_replies += len(responses)
+
+    async def direct_call(j: int) -> float:
+        start = time.perf_counter()
+        await router.route_message("Hi Messi, quick question", {"session_id": f"direct-{j}"})
+        return time.perf_counter() - start
+
+    teams = [asyncio.create_task(team_session(i)) for i in range(TEAM_SESSIONS)]
+    await asyncio.sleep(0.2)  # Let the team load build a queue first
+    started = time.perf_counter()
+    directs = []
+    for j in range(DIRECT_CALLS):
+        directs.append(asyncio.create_task(direct_call(j)))
+        await asyncio.sleep(DIRECT_INTERVAL)
+    latencies = await asyncio.gather(*directs)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*teams)
+
+    return {
+        "direct_p50_ms": percentile(latencies, 0.50) * 1000,
+        "direct_p95_ms": percentile(latencies, 0.95) * 1000,
+        "team_replies_per_second": team_replies / elapsed,
+    }
+
+
+def run_benchmark() -> dict:
+    router = SimpleAgentRouter()
+    for seed, agent in enumerate(router.agents.values()):
+        agent._groq_manager = JitteredLatencyManager(seed)
+
+    previous = bulkhead_module._bulkhead_instance
+    results = {}
+    try:
+        for name, weights in (("equal weights", {p: 1 for p in PRIORITY_WEIGHTS}), ("priority", PRIORITY_WEIGHTS)):
+            with contextlib.redirect_stdout(io.StringIO()):  # routers and agents log every call
+                results[name] = asyncio.run(run_load(router, weights))
+    finally:
+        bulkhead_module._bulkhead_instance = previous
+
+    print(f"{'scheduler':<14} | {'direct p50 ms':>13} | {'direct p95 ms':>13} | {'team replies/s':>14}")
+    print("-" * 64)
+    for name, result in results.items():
+        print(f"{name:<14} | {result['direct_p50_ms']:>13.1f} | {result['direct_p95_ms']:>13.1f} | "
+              f"{result['team_replies_per_second']:>14.1f}")
+    return results
+
+
+def test_direct_calls_stay_fast_under_team_load():
+    results = run_benchmark()
+    equal, priority = results["equal weights"], results["priority"]
+    assert priority["direct_p50_ms"] < equal["direct_p50_ms"] * 0.8
+    assert priority["direct_p95_ms"] < equal["direct_p95_ms"]
+    assert priority["direct_p95_ms"] < AGENT_SECONDS * 1000 * 3
+    # Team work still uses the capacity direct calls leave idle
+    assert priority["team_replies_per_second"] > equal["team_replies_per_second"] * 0.8
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Routing benchmark - accuracy, throughput and confusion matrices for every router.
+
+Replays the labeled cases in routing_cases.json through each routing
+implementation we ship and reports, per implementation, accuracy (overall and
+per category), routing decisions per second, p50/p99 decision latency and a
+confusion matrix of expected vs. predicted label, as JSON.
+
+Labels are SDLC role ids ("developer", "qa_tester", ...), "team" when the whole
+team is called and "none" when no agent should be singled out. Messages use
+{role} placeholders that are filled with each implementation's own agent names,
+so the same case works for the footballer and the Sara/Marc personas.
+
+Implementations whose dependencies are missing (e.g. CrewAI) are reported as
+skipped rather than failing the run.
+
+Usage:
+    python benchmark_routing.py                        # JSON report on stdout, summary on stderr
+    python benchmark_routing.py --output report.json   # also write the report to a file
+    python benchmark_routing.py --repeat 20            # more timing samples per case
+"""
+
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CASES_PATH = os.path.join(BACKEND_DIR, "routing_cases.json")
+VERCEL_CHAT_PATH = os.path.join(BACKEND_DIR, "..", "deploy", "api", "chat.py")
+FILLER = "The quarterly newsletter covers office news, lunch menus and parking updates. "
+
+ROLES = ["requirements_analyst", "software_architect", "developer", "qa_tester",
+         "devops_engineer", "project_manager", "security_expert"]
+FOOTBALL_PERSONA = {
+    "requirements_analyst": "Messi", "software_architect": "Ronaldo", "developer": "Neymar",
+    "qa_tester": "Mbappé", "devops_engineer": "Benzema", "project_manager": "Modric",
+    "security_expert": "Ramos",
+}
+FOOTBALL_ROLES = {"messi": "requirements_analyst", "ronaldo": "software_architect", "neymar": "developer",
+                  "mbappe": "qa_tester", "benzema": "devops_engineer", "modric": "project_manager",
+                  "ramos": "security_expert"}
+OFFICE_PERSONA = {
+    "requirements_analyst": "Sara", "software_architect": "Marc", "developer": "Alex",
+    "qa_tester": "Jess", "devops_engineer": "Dave", "project_manager": "Emma",
+    "security_expert": "Robt",
+}
+
+
+class Implementation:
+    """A router under test: a decide(message) -> label function plus the persona it speaks"""
+
+    def __init__(self, name: str, persona: str, decide: Callable[[str], str]):
+        self.name = name
+        self.persona = persona
+        self.decide = decide
+
+
+def _label_agents(agents: List[str], role_of: Dict[str, str], team_size: int = len(ROLES)) -> str:
+    if len(agents) >= team_size:
+        return "team"
+    if not agents:
+        return "none"
+    return role_of.get(agents[0], agents[0]) if len(agents) == 1 else "multi"
+
+
+def simple_router() -> Implementation:
+    from core.simple_agent_router import SimpleAgentRouter
+    router = SimpleAgentRouter()
+
+    def decide(message: str) -> str:
+        mode, agents = router.plan_route(message)
+        if mode == "default":
+            return "none"
+        return "team" if mode == "team" else FOOTBALL_ROLES[agents[0]]
+
+    return Implementation("simple_agent_router", "football", decide)
+
+
+def sdlc_workflow() -> Implementation:
+    from workflows.sdlc_workflow import SDLCWorkflow, AGENT_ROUTES
+    workflow = SDLCWorkflow()
+    role_of_route = {route: role for role, route in AGENT_ROUTES.items()}
+
+    def decide(message: str) -> str:
+        state = {"user_request": message, "requested_agents": []}
+        state.update(workflow._route_entry_point(state))  # The entry node scans, the edge routes on it
+        route = workflow._route_from_entry(state)
+        return {"collaboration": "team", "end": "none"}.get(route) or role_of_route[route]
+
+    return Implementation("sdlc_workflow", "office", decide)
+
+
+def crewai_handler() -> Implementation:
+    from core.crewai_websocket_handler import CrewAIWebSocketHandler
+    from core.intent_classifier import get_intent_classifier
+    classifier = get_intent_classifier()
+
+    def decide(message: str) -> str:
+        # Same order as process_message: direct call, team call, then smart_route's local fast path
+        direct = CrewAIWebSocketHandler.detect_direct_call(None, message)
+        if direct:
+            return FOOTBALL_ROLES[direct]
+        if CrewAIWebSocketHandler.detect_team_call(None, message):
+            return "team"
+        prediction = classifier.classify(message)
+        return FOOTBALL_ROLES[prediction.agent] if prediction.confident else "none"
+
+    return Implementation("crewai_websocket_handler", "football", decide)
+
+
+def main_minimal() -> Implementation:
+    import main_minimal as minimal
+    role_of = {key: info["role"] for key, info in minimal.AGENTS.items()}
+
+    def decide(message: str) -> str:
+        return _label_agents(minimal.detect_target_agents(message), role_of)
+
+    return Implementation("main_minimal", "office", decide)
+
+
+def vercel_chat() -> Implementation:
+    spec = importlib.util.spec_from_file_location("vercel_chat", VERCEL_CHAT_PATH)
+    chat = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(chat)
+
+    def decide(message: str) -> str:
+        named, topics, _ = chat.scan_agents(message)
+        agents, _ = chat.select_responding_agents(message, "team")
+        if agents == ["modric"] and not (named or topics):
+            return "none"  # Modric is the fallback when nothing matched
+        return _label_agents(agents, FOOTBALL_ROLES)
+
+    return Implementation("vercel_chat", "football", decide)
+
+
+IMPLEMENTATIONS = [simple_router, sdlc_workflow, crewai_handler, main_minimal, vercel_chat]
+
+
+def load_cases(path: str = CASES_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def render(case: dict, persona: str) -> Optional[str]:
+    if case.get("persona", persona) != persona:
+        return None
+    names = FOOTBALL_PERSONA if persona == "football" else OFFICE_PERSONA
+    message = case["message"].format(**names)
+    if case.get("filler"):
+        message = FILLER * case["filler"] + message
+    return message
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def evaluate(impl: Implementation, cases: list, repeat: int) -> dict:
+    confusion: Dict[str, Dict[str, int]] = {}
+    by_category: Dict[str, List[int]] = {}
+    mismatches = []
+    latencies = []
+    correct = total = 0
+
+    for case in cases:
+        message = render(case, impl.persona)
+        if message is None:
+            continue
+        samples = []
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):  # routers log every decision
+                start = time.perf_counter()
+                predicted = impl.decide(message)
+                samples.append(time.perf_counter() - start)
+        latencies.extend(samples)
+
+        expected = case["expected"]
+        hit = predicted == expected
+        total += 1
+        correct += hit
+        confusion.setdefault(expected, {})
+        confusion[expected][predicted] = confusion[expected].get(predicted, 0) + 1
+        tally = by_category.setdefault(case["category"], [0, 0])
+        tally[0] += hit
+        tally[1] += 1
+        if not hit:
+            mismatches.append({"category": case["category"], "message": message[-120:],
+                               "expected": expected, "predicted": predicted})
+
+    return {
+        "available": True,
+        "persona": impl.persona,
+        "cases": total,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "by_category": {cat: round(hits / count, 4) for cat, (hits, count) in sorted(by_category.items())},
+        "decisions_per_second": round(len(latencies) / sum(latencies), 1) if latencies else 0.0,
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+        "confusion": confusion,
+        "mismatches": mismatches,
+    }
+
+
+def run_benchmark(repeat: int = 5, cases: list = None) -> dict:
+    cases = cases if cases is not None else load_cases()
+    report = {"generated_at": datetime.now().isoformat(), "repeat": repeat, "implementations": {}}
+    for factory in IMPLEMENTATIONS:
+        name = factory.__name__
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                impl = factory()
+        except (ImportError, SystemExit) as e:
+            report["implementations"][name] = {"available": False, "skipped": f"{type(e).__name__}: {e}"}
+            continue
+        report["implementations"][impl.name] = evaluate(impl, cases, repeat)
+    return report
+
+
+def print_summary(report: dict, out=sys.stderr) -> None:
+    print(f"{'implementation':<26} | {'accuracy':>8} | {'decisions/s':>11} | {'p99 us':>9}", file=out)
+    print("-" * 64, file=out)
+    for name, result in report["implementations"].items():
+        if not result["available"]:
+            print(f"{name:<26} | skipped ({result['skipped']})", file=out)
+            continue
+        print(f"{name:<26} | {result['accuracy']:>8.1%} | {result['decisions_per_second']:>11,.0f} | "
+              f"{result['p99_us']:>9.1f}", file=out)
+
+
+def test_routing_benchmark_report():
+    report = run_benchmark(repeat=1)
+    json.dumps(report)  # machine-readable as-is
+    results = report["implementations"]
+    for name in ("simple_agent_router", "sdlc_workflow", "main_minimal", "vercel_chat"):
+        assert results[name]["available"], name
+    # Regression floors; raise them as routing improves
+    assert results["simple_agent_router"]["accuracy"] >= 0.75
+    assert results["sdlc_workflow"]["accuracy"] >= 0.7
+    assert results["simple_agent_router"]["by_category"]["non_english"] == 1.0
+    for result in results.values():
+        if result["available"]:
+            assert result["p99_us"] < 50_000  # even 30KB documents route in well under 50ms
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[sys.argv.index("--repeat") + 1]) if "--repeat" in sys.argv else 5
+    report = run_benchmark(repeat=repeat)
+    print_summary(report)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if "--output" in sys.argv:
+        with open(sys.argv[sys.argv.index("--output") + 1], "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
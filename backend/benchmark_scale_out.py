@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Scale-out load test - WebSocket frame throughput across several worker processes.
+
+Each worker process holds its own sessions (counting stand-in sockets) and
+publishes frames for the sessions held by the next worker, so every frame
+crosses the Redis delivery bus: owner lookup, pub/sub hop, then encode and
+send on the owning worker. Throughput should grow close to linearly with the
+number of workers until Redis itself saturates.
+
+Runs against REDIS_HOST/REDIS_PORT when a Redis server answers there, else
+against an in-process fakeredis TCP server - that one is single-threaded
+Python, so it shows delivery works but not how a real Redis scales.
+
+Usage:
+    python benchmark_scale_out.py                        # 1, 2 and 4 workers
+    python benchmark_scale_out.py --workers 1 2 4 8 --messages 20000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import redis
+
+SESSIONS_PER_WORKER = 50
+MESSAGES_PER_WORKER = 5000
+DELIVERY_TIMEOUT = 60.0
+FRAME = {"type": "agent_response", "agent": "💻 Messi (Senior Developer)",
+         "message": "Deploy the gateway behind the load balancer and drain old workers first. " * 4}
+
+
+class CountingSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, text: str):
+        self.frames += 1
+
+
+def find_broker():
+    """(host, port, real) - a reachable Redis, or a fakeredis TCP server started for this run"""
+    host, port = os.getenv("REDIS_HOST", "localhost"), int(os.getenv("REDIS_PORT", 6379))
+    try:
+        redis.Redis(host=host, port=port, socket_connect_timeout=0.5).ping()
+        return host, port, True
+    except Exception:
+        pass
+    from fakeredis import TcpFakeServer
+
+    class NoDelayFakeServer(TcpFakeServer):
+        # It writes each reply separately; without TCP_NODELAY a pipeline's replies wait on delayed ACKs
+        def get_request(self):
+            conn, addr = super().get_request()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return conn, addr
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = NoDelayFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return "127.0.0.1", port, False
+
+
+async def run_worker(index: int, workers: int, host: str, port: int, messages: int, barrier, results) -> None:
+    import redis.asyncio as aioredis
+    from utils.delivery_bus import create_delivery
+    from utils.websocket_manager import WebSocketManager
+
+    client = aioredis.Redis(host=host, port=port)
+    registry, bus = create_delivery("redis", client, f"bench-{index}")
+    manager = WebSocketManager(max_queue=messages + 1, registry=registry, bus=bus)
+    sockets = []
+    for s in range(SESSIONS_PER_WORKER):
+        session_id = f"w{index}-s{s}"
+        sockets.append(CountingSocket())
+        manager.active_connections[session_id] = sockets[-1]
+        await registry.register(session_id)
+    await manager.start_delivery()
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    # Background work on this worker sending to sessions connected to the next one
+    target = (index + 1) % workers
+    started = time.monotonic()
+    for m in range(messages):
+        session_id = f"w{target}-s{m % SESSIONS_PER_WORKER}"
+        owner = await registry.owner(session_id)
+        await bus.publish(owner, session_id, FRAME)
+
+    # This worker is done once the frames the previous worker sent here are all on its sockets
+    while sum(s.frames for s in sockets) < messages and time.monotonic() - started < DELIVERY_TIMEOUT:
+        await asyncio.sleep(0.005)
+    finished = time.monotonic()
+    results.put((index, started, finished, sum(s.frames for s in sockets)))
+    await manager.stop_delivery()
+    await client.aclose()
+
+
+def worker_main(*args) -> None:
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run_worker(*args))
+
+
+def run_round(workers: int, host: str, port: int, messages: int) -> dict:
+    barrier = multiprocessing.Barrier(workers)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker_main, args=(i, workers, host, port, messages, barrier, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get(timeout=DELIVERY_TIMEOUT + 30) for _ in processes]
+    for process in processes:
+        process.join()
+    seconds = max(r[2] for r in rows) - min(r[1] for r in rows)
+    delivered = sum(r[3] for r in rows)
+    return {"workers": workers, "sent": workers * messages, "delivered": delivered,
+            "seconds": seconds, "messages_per_second": delivered / seconds}
+
+
+def run_benchmark(worker_counts=(1, 2, 4), messages: int = MESSAGES_PER_WORKER) -> dict:
+    host, port, real = find_broker()
+    if not real:
+        print("⚠️  No Redis reachable - using fakeredis over TCP; throughput won't scale like a real Redis")
+    rows = [run_round(workers, host, port, messages) for workers in worker_counts]
+    base = rows[0]["messages_per_second"] / rows[0]["workers"]
+
+    print(f"{'workers':>7} | {'delivered':>9} | {'seconds':>7} | {'msgs/s':>9} | {'vs linear':>9}")
+    print("-" * 54)
+    for row in rows:
+        row["efficiency"] = row["messages_per_second"] / (base * row["workers"])
+        print(f"{row['workers']:>7} | {row['delivered']:>9} | {row['seconds']:>7.2f} | "
+              f"{row['messages_per_second']:>9.0f} | {row['efficiency']:>8.0%}")
+    return {"real_redis": real, "cpus": os.cpu_count() or 1, "rows": rows}
+
+
+def test_frames_cross_workers_and_throughput_scales():
+    result = run_benchmark(worker_counts=(1, 2), messages=300)
+    for row in result["rows"]:
+        assert row["delivered"] == row["sent"]
+    # Only meaningful with a real Redis and a core per worker plus one for Redis
+    if result["real_redis"] and result["cpus"] >= 3:
+        assert result["rows"][1]["efficiency"] > 0.8
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--messages", type=int, default=MESSAGES_PER_WORKER, help="frames each worker sends")
+    args = parser.parse_args()
+    run_benchmark(args.workers, args.messages)
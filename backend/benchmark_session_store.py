@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Session store benchmark - ops/sec, round trips and bytes on the wire per
+SessionManager call with a full 50-message conversation history.
+
+Compares the hash + capped-list layout against the access pattern it replaced
+(the whole session as one JSON string: GET plus a SETEX rewrite on every read,
+update_session re-reading first, add_message_to_history doing both - five
+round trips, three of them re-sending the entire history). Bytes are counted at
+the socket, so they include the RESP framing.
+
+Runs against REDIS_HOST/REDIS_PORT when a Redis server answers there, else
+against an in-process fakeredis TCP server - slower than a real Redis, but the
+round trips and bytes are the same.
+
+Usage:
+    python benchmark_session_store.py
+    python benchmark_session_store.py --ops 2000
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import redis
+
+from benchmark_scale_out import find_broker
+from utils.session_manager import SessionManager, SESSION_HISTORY_MAX
+
+OPS = 500
+REPLY = ("Split the checkout into a cart service and a payment service, keep idempotency keys on "
+         "the payment calls, and put the order events on a queue so fulfilment can retry. ") * 3
+
+
+class CountingSocket:
+    """Socket proxy counting bytes both ways"""
+
+    def __init__(self, sock, counters: dict):
+        self._sock = sock
+        self._counters = counters
+
+    def sendall(self, data, *args):
+        self._counters["bytes"] += len(data)
+        return self._sock.sendall(data, *args)
+
+    def recv(self, size, *args):
+        data = self._sock.recv(size, *args)
+        self._counters["bytes"] += len(data)
+        return data
+
+    def recv_into(self, buffer, *args):
+        received = self._sock.recv_into(buffer, *args)
+        self._counters["bytes"] += received
+        return received
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class CountingConnection(redis.Connection):
+    """One send_packed_command is one round trip - a pipeline packs all its commands into one"""
+
+    counters = {"round_trips": 0, "bytes": 0}
+
+    def _connect(self):
+        return CountingSocket(super()._connect(), self.counters)
+
+    def send_packed_command(self, command, check_health=True):
+        self.counters["round_trips"] += 1
+        return super().send_packed_command(command, check_health)
+
+
+class LegacySessionManager(SessionManager):
+    """The previous layout: each session one JSON string, rewritten whole on every call"""
+
+    def create_session(self, session_id, initial_data=None):
+        session_data = {"created_at": datetime.now().isoformat(), "last_activity": datetime.now().isoformat(),
+                        "conversation_history": [], "project_context": {}, "agent_outputs": {},
+                        "current_phase": "initial", **(initial_data or {})}
+        self.redis_client.setex(f"session:{session_id}", timedelta(hours=24), json.dumps(session_data))
+        return True
+
+    def get_session(self, session_id):
+        data = self.redis_client.get(f"session:{session_id}")
+        if not data:
+            return None
+        session_data = json.loads(data)
+        session_data["last_activity"] = datetime.now().isoformat()
+        self.redis_client.setex(f"session:{session_id}", timedelta(hours=24), json.dumps(session_data))
+        return session_data
+
+    def update_session(self, session_id, updates):
+        session_data = self.get_session(session_id)
+        if not session_data:
+            return False
+        session_data.update(updates)
+        session_data["last_activity"] = datetime.now().isoformat()
+        self.redis_client.setex(f"session:{session_id}", timedelta(hours=24), json.dumps(session_data))
+        return True
+
+    def add_message_to_history(self, session_id, message):
+        session_data = self.get_session(session_id)
+        if not session_data:
+            return False
+        session_data["conversation_history"] = (session_data["conversation_history"] + [message])[-50:]
+        return self.update_session(session_id, session_data)
+
+
+def message(i: int) -> dict:
+    return {"type": "agent_response", "agent": "💻 Messi (Senior Developer)", "message": f"{i}: {REPLY}",
+            "timestamp": datetime.now().isoformat(), "uploadedFiles": []}
+
+
+def measure(store: SessionManager, name: str, call, ops: int) -> dict:
+    counters = CountingConnection.counters
+    counters.update(round_trips=0, bytes=0)
+    started = time.perf_counter()
+    for i in range(ops):
+        call(i)
+    seconds = time.perf_counter() - started
+    return {"layout": name, "ops_per_second": ops / seconds, "round_trips": counters["round_trips"] / ops,
+            "bytes": counters["bytes"] / ops}
+
+
+def run_layout(layout: str, host: str, port: int, ops: int) -> list:
+    pool = redis.ConnectionPool(connection_class=CountingConnection, host=host, port=port, decode_responses=True)
+    client = redis.Redis(connection_pool=pool)
+    store = (LegacySessionManager if layout == "json string" else SessionManager)(redis_client=client)
+    session_id = f"bench-{layout.replace(' ', '-')}"
+    store.create_session(session_id)
+    for i in range(SESSION_HISTORY_MAX):
+        store.add_message_to_history(session_id, message(i))
+
+    rows = [
+        {"op": "add_message_to_history",
+         **measure(store, layout, lambda i: store.add_message_to_history(session_id, message(i)), ops)},
+        {"op": "update_session",
+         **measure(store, layout, lambda i: store.update_session(session_id, {"current_phase": f"phase-{i}"}), ops)},
+        {"op": "get_session", **measure(store, layout, lambda i: store.get_session(session_id), ops)},
+    ]
+    assert len(store.get_session(session_id)["conversation_history"]) == SESSION_HISTORY_MAX
+    store.delete_session(session_id)
+    pool.disconnect()
+    return rows
+
+
+def run_benchmark(ops: int = OPS) -> dict:
+    host, port, real = find_broker()
+    if not real:
+        print("⚠️  No Redis reachable - using fakeredis over TCP; round trips and bytes match a real Redis, speed doesn't")
+    rows = run_layout("json string", host, port, ops) + run_layout("hash + list", host, port, ops)
+
+    print(f"History: {SESSION_HISTORY_MAX} messages of ~{len(json.dumps(message(0)))} bytes")
+    print(f"{'operation':<24} | {'layout':<11} | {'ops/s':>8} | {'round trips':>11} | {'bytes/op':>9}")
+    print("-" * 76)
+    for row in sorted(rows, key=lambda r: r["op"]):
+        print(f"{row['op']:<24} | {row['layout']:<11} | {row['ops_per_second']:>8.0f} | "
+              f"{row['round_trips']:>11.1f} | {row['bytes']:>9.0f}")
+    return {(row["op"], row["layout"]): row for row in rows}
+
+
+def test_hash_layout_needs_one_round_trip_and_a_fraction_of_the_bytes():
+    result = run_benchmark(ops=30)
+    for op in ("add_message_to_history", "update_session", "get_session"):
+        legacy, current = result[(op, "json string")], result[(op, "hash + list")]
+        assert current["round_trips"] == 1
+        if op != "get_session":  # Reads still return the whole history; they just stop writing it back
+            assert current["bytes"] * 10 < legacy["bytes"]
+    assert result[("add_message_to_history", "json string")]["round_trips"] == 5
+    assert result[("get_session", "hash + list")]["bytes"] * 1.8 < result[("get_session", "json string")]["bytes"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=OPS, help="calls per operation and layout")
+    args = parser.parse_args()
+    run_benchmark(args.ops)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Team latency benchmark - shows whether a 7-agent team request runs concurrently.
+
+With a non-blocking provider path the team reply should take about as long as the
+slowest single agent. If token iteration blocks the event loop, the team reply
+takes roughly the sum of all agents instead.
+
+Usage:
+    python benchmark_team_latency.py          # simulated Groq streams (no API key needed)
+    python benchmark_team_latency.py --live   # real Groq calls (needs GROQ_API_KEY)
+"""
+
+import asyncio
+import sys
+import time
+
+from core.simple_agent_router import SimpleAgentRouter
+
+# role -> (time to first token, number of tokens, seconds between tokens)
+SIMULATED_PROFILES = {
+    "requirements_analyst": (0.35, 40, 0.010),
+    "software_architect": (0.20, 40, 0.008),
+    "developer": (0.60, 40, 0.015),
+    "qa_tester": (0.45, 40, 0.012),
+    "devops_engineer": (0.30, 40, 0.010),
+    "project_manager": (0.20, 40, 0.008),
+    "security_expert": (0.40, 40, 0.010),
+}
+
+TEAM_MESSAGE = "Hey everyone, how should we plan the new billing service?"
+
+
+class SimulatedGroqManager:
+    """Stands in for GroqModelManager with deterministic streaming latency.
+
+    blocking=True reproduces the old behaviour where a synchronous stream was
+    iterated inside a coroutine and every token stalled the event loop.
+    """
+
+    def __init__(self, blocking: bool = False):
+        self.blocking = blocking
+
+    async def stream_completion(self, role: str, messages: list, temperature: float = 0.7, max_tokens: int = 1024, use_cache: bool = False, deadline=None):
+        first_token, tokens, interval = SIMULATED_PROFILES[role]
+        await self._sleep(first_token)
+        for i in range(tokens):
+            if i:
+                await self._sleep(interval)
+            yield f"tok{i} "
+
+    async def _sleep(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+
+def install_manager(router: SimpleAgentRouter, manager) -> None:
+    for agent in router.agents.values():
+        agent._groq_manager = manager
+
+
+async def time_single_agents(router: SimpleAgentRouter) -> dict:
+    timings = {}
+    for agent_key, agent in router.agents.items():
+        start = time.perf_counter()
+        await agent.process_request(TEAM_MESSAGE, {})
+        timings[agent_key] = time.perf_counter() - start
+    return timings
+
+
+async def time_team(router: SimpleAgentRouter) -> float:
+    start = time.perf_counter()
+    responses = await router.route_message(TEAM_MESSAGE, {})
+    elapsed = time.perf_counter() - start
+    assert len(responses) == len(router.agents), f"expected {len(router.agents)} responses, got {len(responses)}"
+    return elapsed
+
+
+async def run_benchmark(live: bool = False) -> dict:
+    router = SimpleAgentRouter()
+    if not live:
+        install_manager(router, SimulatedGroqManager())
+
+    single = await time_single_agents(router)
+    team_async = await time_team(router)
+
+    team_blocking = None
+    if not live:
+        install_manager(router, SimulatedGroqManager(blocking=True))
+        team_blocking = await time_team(router)
+
+    slowest = max(single.values())
+    total = sum(single.values())
+
+    print("\n" + "=" * 60)
+    print("🏁 TEAM LATENCY BENCHMARK" + (" (live Groq)" if live else " (simulated streams)"))
+    print("=" * 60)
+    for agent_key, elapsed in single.items():
+        print(f"  {agent_key:<10} single agent: {elapsed:.2f}s")
+    print("-" * 60)
+    print(f"  Slowest single agent:      {slowest:.2f}s")
+    print(f"  Sum of single agents:      {total:.2f}s")
+    print(f"  7-agent team (async path): {team_async:.2f}s  ({team_async / slowest:.2f}x slowest)")
+    if team_blocking is not None:
+        print(f"  7-agent team (blocking):   {team_blocking:.2f}s  ({team_blocking / slowest:.2f}x slowest)")
+    print("=" * 60)
+
+    return {
+        "single": single,
+        "slowest": slowest,
+        "sum": total,
+        "team_async": team_async,
+        "team_blocking": team_blocking,
+    }
+
+
+def test_team_latency_close_to_slowest_agent():
+    result = asyncio.run(run_benchmark())
+    assert result["team_async"] < result["slowest"] * 1.5
+    assert result["team_blocking"] > result["team_async"] * 2
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(live="--live" in sys.argv))
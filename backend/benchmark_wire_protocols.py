@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Wire protocol benchmark - bytes on the wire and encode CPU per frame for each WebSocket subprotocol.
+
+Replays a typical chat turn (status updates, a streamed reply of small deltas,
+its end frame with the full text, and a long reply echoing an uploaded file)
+through WebSocketManager once per protocol, and compares it with encoding the
+same frames with the stdlib json.dumps the manager used before.
+
+Usage:
+    python benchmark_wire_protocols.py
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.websocket_manager import WebSocketManager
+from utils.wire_protocol import CODECS, LEGACY_CODEC, get_codec, orjson
+
+TURNS = 200
+REPLY = ("To support real-time chat we'll put a WebSocket gateway in front of the message service, "
+         "persist messages in Postgres with a per-room sequence number, and fan out through Redis "
+         "pub/sub so any gateway instance can deliver to any connected user. ") * 6
+UPLOADED_FILE = "\n".join(f"def handler_{i}(request):\n    return {{'status': 'ok', 'id': {i}}}\n" for i in range(120))
+
+
+class ByteCountingSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append(text.encode())
+
+    async def send_bytes(self, data: bytes):
+        self.frames.append(data)
+
+
+async def play_turn(manager: WebSocketManager, turn: int) -> None:
+    await manager.send_status_update("s1", "processing", "Messi is responding...")
+    stream = await manager.open_stream("s1", "💻 Messi (Senior Developer)", message_id=f"turn-{turn}")
+    stream.flush_interval, stream.flush_chars = 10, 48
+    for word in REPLY.split(" "):
+        await stream.push(word + " ")
+    await stream.end(latency_ms=1234.5)
+    await manager.send_agent_response("s1", "🔍 Ronaldo (QA Engineer)",
+                                      f"I reviewed the upload:\n```python\n{UPLOADED_FILE}```", latency_ms=2345.6)
+    await manager.send_status_update("s1", "completed", "Done", latencies_ms={"Messi": 1234.5})
+
+
+def run_protocol(protocol) -> dict:
+    manager = WebSocketManager(max_queue=100000)
+    socket = ByteCountingSocket()
+    manager.active_connections["s1"] = socket
+    manager.codecs["s1"] = get_codec(protocol)
+
+    async def run():
+        for turn in range(TURNS):
+            await play_turn(manager, turn)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    counters = manager.protocols[get_codec(protocol).name]
+    return {
+        "frames": len(socket.frames),
+        "bytes_per_frame": sum(len(f) for f in socket.frames) / len(socket.frames),
+        "encode_us_per_frame": counters["encode_seconds"] / counters["frames"] * 1e6,
+        "sample": socket.frames[:3] + socket.frames[-3:],
+    }
+
+
+def run_stdlib_baseline(frames: list) -> dict:
+    """Encode the decoded frames again the way the manager did before: json.dumps of a fresh dict"""
+    start = time.perf_counter()
+    encoded = [json.dumps({**frame, "timestamp": datetime.now().isoformat()} if "timestamp" in frame else dict(frame))
+               for frame in frames]
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": len(encoded),
+        "bytes_per_frame": sum(len(e.encode()) for e in encoded) / len(encoded),
+        "encode_us_per_frame": elapsed / len(encoded) * 1e6,
+    }
+
+
+def run_benchmark() -> dict:
+    results = {name: run_protocol(name) for name in [None] + [p for p in CODECS if p != "flux.json"]}
+
+    # The baseline re-encodes exactly what a legacy client received
+    manager = WebSocketManager(max_queue=100000)
+    socket = ByteCountingSocket()
+    manager.active_connections["s1"] = socket
+    asyncio.run(play_turn(manager, 0))
+    frames = [LEGACY_CODEC.decode(f) for f in socket.frames] * TURNS
+    rows = {"stdlib json (before)": run_stdlib_baseline(frames)}
+    rows.update({name or "json (legacy clients)": result for name, result in results.items()})
+
+    print(f"{'protocol':<22} | {'frames':>6} | {'bytes/frame':>11} | {'encode µs/frame':>15}")
+    print("-" * 64)
+    for name, result in rows.items():
+        print(f"{name:<22} | {result['frames']:>6} | {result['bytes_per_frame']:>11.1f} | "
+              f"{result['encode_us_per_frame']:>15.2f}")
+    return rows
+
+
+def test_binary_protocols_cut_bytes_and_json_stays_cheap():
+    rows = run_benchmark()
+    baseline, legacy = rows["stdlib json (before)"], rows["json (legacy clients)"]
+    assert legacy["bytes_per_frame"] <= baseline["bytes_per_frame"]
+    if orjson is not None:
+        assert legacy["encode_us_per_frame"] < baseline["encode_us_per_frame"]
+    assert rows["flux.json.deflate"]["bytes_per_frame"] < legacy["bytes_per_frame"] * 0.6
+    if "flux.msgpack" in rows:
+        assert rows["flux.msgpack"]["bytes_per_frame"] < rows["flux.json.deflate"]["bytes_per_frame"]
+
+    # Every protocol decodes back to the same frames
+    for name, result in rows.items():
+        if "sample" in result:
+            codec = get_codec(None if name.startswith("json") else name)
+            decoded = [codec.decode(f) for f in result["sample"]]
+            assert decoded[0]["type"] == "status_update" and decoded[1]["type"] == "agent_response_start"
+            assert decoded[2] == {"type": "agent_response_delta", "message_id": "turn-0",
+                                  "agent": "💻 Messi (Senior Developer)", "seq": 1, "delta": decoded[2]["delta"]}
+            assert UPLOADED_FILE in decoded[-2]["message"]
+
+
+if __name__ == "__main__":
+    run_benchmark()
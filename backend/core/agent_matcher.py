@@ -0,0 +1,149 @@
+# core/agent_matcher.py
+"""
+Single-pass agent mention matcher.
+
+Every routing entry point needs the same facts about a message or an agent's
+reply: is an agent greeted directly, which agents are named, is the whole team
+being addressed, and is anyone being dismissed. All aliases, greetings, team
+words and dismissal phrases are compiled into one alternation, so a text is
+scanned once, left to right, in time linear in its length.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+GREETINGS = ("hi", "hello", "hey", "greetings", "good morning", "good afternoon", "yo")
+TEAM_WORDS = ("everyone", "everybody", "team", "all agents", "all of you", "entire team", "whole team")
+# Only count as a team call straight after a greeting ("hi all", "hey folks")
+GREETING_TEAM_WORDS = ("all", "folks", "guys")
+DISMISSALS = ("drop off", "drop out", "leave", "dismiss", "step back", "thank you", "thanks", "goodbye", "bye")
+# Phrases that hand the conversation to a named agent ("talk to marc")
+LEAD_INS = ("chat with", "work with", "speak with", "talk to", "call", "bring in", "continue with")
+EXCLUSIVE_LEAD_INS = ("would like to talk to", "want to talk to", "need to talk to",
+                      "like to speak to", "want to speak to", "would like to speak to")
+# Sentence boundaries scope dismissals: "Thanks Marc. Alex, go on" only dismisses Marc
+SENTENCE_BREAKS = ".!?;\n"
+# Capture group holding the alias for each kind of match
+ALIAS_GROUPS = {"greet": "greet_name", "lead": "lead_name", "follow": "follow_name"}
+
+
+def _alternation(phrases: Iterable[str]) -> str:
+    # Longest first so "sarah chen" wins over "sarah"; any run of whitespace may separate words
+    ordered = sorted(set(phrases), key=len, reverse=True)
+    return "|".join(r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in ordered)
+
+
+@dataclass
+class MentionScan:
+    """Everything one scan found, with agent keys in order of first appearance"""
+    greeted: Optional[str] = None          # agent greeted directly ("hi marc")
+    team_greeting: bool = False            # team greeted directly ("hello everyone")
+    team_call: bool = False                # team addressed anywhere in the text
+    mentions: List[str] = field(default_factory=list)       # agents named
+    role_mentions: List[str] = field(default_factory=list)  # agents referred to by role word only
+    addressed: List[str] = field(default_factory=list)      # agents a lead-in hands over to ("talk to marc")
+    exclusive: bool = False                # an exclusive lead-in was used ("I want to talk to marc")
+    dismissed: List[str] = field(default_factory=list)      # agents named in a sentence with a dismissal
+    aliases: Dict[str, str] = field(default_factory=dict)   # agent -> first alias matched, for logging
+
+    @property
+    def agents(self) -> List[str]:
+        """Agents mentioned by name or by role"""
+        return self.mentions + [a for a in self.role_mentions if a not in self.mentions]
+
+    @property
+    def first(self) -> Optional[str]:
+        """The agent a message is aimed at: the greeted one, else the first named, else the first role"""
+        if self.greeted:
+            return self.greeted
+        agents = self.agents
+        return agents[0] if agents else None
+
+
+class AgentMatcher:
+    """
+    Precompiled matcher for one set of agent aliases.
+
+    names maps personal names ("marc", "marcus rodriguez") to agent keys; roles maps
+    role words ("architect", "qa") to agent keys and is reported separately, since
+    some callers treat a role word as a topic rather than a call. lead_ins and
+    follow_ups are the phrases before ("talk to marc") or after ("marc should")
+    a name that hand work over to that agent; team_words are the phrases that
+    address the whole team.
+    """
+
+    def __init__(self, names: Dict[str, str], roles: Dict[str, str] = None,
+                 lead_ins: Iterable[str] = LEAD_INS, follow_ups: Iterable[str] = (),
+                 team_words: Iterable[str] = TEAM_WORDS):
+        self._lookup: Dict[str, tuple] = {}
+        for alias, agent in (roles or {}).items():
+            self._lookup[" ".join(alias.lower().split())] = (agent, True)
+        for alias, agent in names.items():
+            self._lookup[" ".join(alias.lower().split())] = (agent, False)
+
+        aliases = _alternation(self._lookup)
+        team_words = tuple(team_words)
+        greeting_team = _alternation(team_words + GREETING_TEAM_WORDS)
+        lead_ins = EXCLUSIVE_LEAD_INS + tuple(lead_ins)
+        follow_ups = tuple(follow_ups)
+        # Every word branch starts at a word boundary on one of these letters; checking that once
+        # per position, instead of once per branch, keeps the scan cheap on long replies
+        first_letters = {p[0] for p in (*self._lookup, *GREETINGS, *lead_ins, *team_words, *DISMISSALS)}
+        self._pattern = re.compile(
+            rf"\b(?=[{re.escape(''.join(sorted(first_letters)))}])(?:"
+            rf"(?P<greet>(?:{_alternation(GREETINGS)})[\s,@]+(?:there\s+)?"
+            rf"(?:(?P<greet_team>{greeting_team})|@?(?P<greet_name>{aliases}))\b)"
+            rf"|(?P<lead>(?P<lead_phrase>{_alternation(lead_ins)})\s+(?:the\s+)?@?(?P<lead_name>{aliases})\b)"
+            rf"|(?P<team>(?:{_alternation(team_words)})\b)"
+            rf"|(?P<dismiss>(?:{_alternation(DISMISSALS)})\b)"
+            + (rf"|(?P<follow>(?P<follow_name>{aliases})\s+(?:{_alternation(follow_ups)})\b)" if follow_ups else "")
+            + rf"|(?P<name>(?:{aliases})\b))"
+            rf"|(?P<stop>[{re.escape(SENTENCE_BREAKS)}])"
+        )
+        self._exclusive = {" ".join(p.split()) for p in EXCLUSIVE_LEAD_INS}
+
+    def scan(self, text: str) -> MentionScan:
+        result = MentionScan()
+        sentence: List[str] = []
+        dismissing = False
+
+        for match in self._pattern.finditer(text.lower()):
+            kind = match.lastgroup
+            if kind == "stop":
+                if dismissing:
+                    self._extend(result.dismissed, sentence)
+                sentence, dismissing = [], False
+                continue
+            if kind == "dismiss":
+                dismissing = True
+                continue
+            if kind == "team" or match.group("greet_team"):
+                result.team_call = True
+                result.team_greeting = result.team_greeting or kind == "greet"
+                continue
+
+            alias = match.group(ALIAS_GROUPS.get(kind, "name"))
+            agent, is_role = self._lookup[" ".join(alias.split())]
+            if kind == "greet" and result.greeted is None:
+                result.greeted = agent
+            elif kind in ("lead", "follow"):
+                self._extend(result.addressed, [agent])
+                if kind == "lead" and " ".join(match.group("lead_phrase").split()) in self._exclusive:
+                    result.exclusive = True
+            self._extend(result.role_mentions if is_role else result.mentions, [agent])
+            result.aliases.setdefault(agent, alias)
+            sentence.append(agent)
+
+        if dismissing:
+            self._extend(result.dismissed, sentence)
+        return result
+
+    def find(self, text: str) -> List[str]:
+        """Agents mentioned by name or role, in order of first appearance"""
+        return self.scan(text).agents
+
+    @staticmethod
+    def _extend(target: List[str], agents: List[str]) -> None:
+        for agent in agents:
+            if agent not in target:
+                target.append(agent)
@@ -9,6 +9,15 @@ from fastapi import WebSocket
 from datetime import datetime
 
 from agents.crewai_agents import get_crewai_system
+from utils.deadline import Deadline
+from utils.bulkhead import request_priority
+from utils.delivery_bus import create_delivery
+from core.agent_matcher import AgentMatcher, MentionScan
+
+AGENT_MATCHER = AgentMatcher({
+    "messi": "messi", "ronaldo": "ronaldo", "neymar": "neymar", "mbappe": "mbappe", "mbappé": "mbappe",
+    "benzema": "benzema", "modric": "modric", "ramos": "ramos",
+})
 
 
 class CrewAIWebSocketHandler:
@@ -20,6 +29,8 @@ class CrewAIWebSocketHandler:
     def __init__(self):
         print("[WS-CrewAI] 🚀 Initializing CrewAI WebSocket Handler")
         self.active_connections: Dict[str, WebSocket] = {}
+        # Clients connected to other workers are reached over the delivery bus (WS_DELIVERY_BUS)
+        self.registry, self.bus = create_delivery()
         self.crewai = get_crewai_system()
         print("[WS-CrewAI] ✅ Handler ready with CrewAI backend")
     
@@ -27,6 +38,7 @@ class CrewAIWebSocketHandler:
         """Accept WebSocket connection"""
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        await self.registry.register(client_id)
         print(f"[WS-CrewAI] ✅ Client {client_id} connected ({len(self.active_connections)} active)")
         
         # Send welcome message
@@ -37,18 +49,41 @@ class CrewAIWebSocketHandler:
     
     async def disconnect(self, client_id: str):
         """Remove WebSocket connection"""
+        self.registry.unregister(client_id)
         if client_id in self.active_connections:
             del self.active_connections[client_id]
             print(f"[WS-CrewAI] 👋 Client {client_id} disconnected ({len(self.active_connections)} active)")
     
+    async def start_delivery(self):
+        """Start receiving frames other workers publish for clients connected here"""
+        await self.bus.start(self.deliver_local)
+
+    async def stop_delivery(self):
+        await self.bus.stop()
+
+    async def deliver_local(self, client_id: str, data: Dict[str, Any]) -> bool:
+        if client_id not in self.active_connections:
+            return False
+        await self.active_connections[client_id].send_json(data)
+        return True
+
+    async def _send(self, client_id: str, data: Dict[str, Any]):
+        """Send to a client here, or hand the frame to the worker it is connected to"""
+        if client_id in self.active_connections:
+            await self.active_connections[client_id].send_json(data)
+            return
+        owner = await self.registry.owner(client_id)
+        if owner is not None and owner != self.registry.worker_id:
+            if not await self.bus.publish(owner, client_id, data):
+                self.registry.forget(client_id)
+
     async def send_system_message(self, client_id: str, message: str):
         """Send system message to client"""
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json({
-                "type": "system",
-                "message": message,
-                "timestamp": datetime.now().isoformat()
-            })
+        await self._send(client_id, {
+            "type": "system",
+            "message": message,
+            "timestamp": datetime.now().isoformat()
+        })
     
     async def send_agent_response(
         self, 
@@ -58,25 +93,24 @@ class CrewAIWebSocketHandler:
         agent_name: str = None
     ):
         """Send agent response to client"""
-        if client_id in self.active_connections:
-            # Map agent keys to display names
-            agent_names = {
-                "messi": "Messi",
-                "ronaldo": "Ronaldo",
-                "neymar": "Neymar",
-                "mbappe": "Mbappé",
-                "benzema": "Benzema",
-                "modric": "Modric",
-                "ramos": "Ramos"
-            }
-            
-            await self.active_connections[client_id].send_json({
-                "type": "agent_response",
-                "agent": agent_key,
-                "agent_name": agent_name or agent_names.get(agent_key, agent_key),
-                "message": response,
-                "timestamp": datetime.now().isoformat()
-            })
+        # Map agent keys to display names
+        agent_names = {
+            "messi": "Messi",
+            "ronaldo": "Ronaldo",
+            "neymar": "Neymar",
+            "mbappe": "Mbappé",
+            "benzema": "Benzema",
+            "modric": "Modric",
+            "ramos": "Ramos"
+        }
+        
+        await self._send(client_id, {
+            "type": "agent_response",
+            "agent": agent_key,
+            "agent_name": agent_name or agent_names.get(agent_key, agent_key),
+            "message": response,
+            "timestamp": datetime.now().isoformat()
+        })
     
     async def send_typing_indicator(
         self, 
@@ -85,47 +119,32 @@ class CrewAIWebSocketHandler:
         is_typing: bool
     ):
         """Send typing indicator"""
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json({
-                "type": "typing",
-                "agent": agent_key,
-                "typing": is_typing,
-                "timestamp": datetime.now().isoformat()
-            })
+        await self._send(client_id, {
+            "type": "typing",
+            "agent": agent_key,
+            "typing": is_typing,
+            "timestamp": datetime.now().isoformat()
+        })
     
-    def detect_direct_call(self, message: str) -> Optional[str]:
+    def detect_direct_call(self, message: str, scan: MentionScan = None) -> Optional[str]:
         """
         Detect if message is a direct call to specific agent
         
         Returns:
             Agent key if direct call detected, None otherwise
         """
-        message_lower = message.lower().strip()
-        
-        # Check for direct greetings
-        import re
-        patterns = [
-            r'\b(hi|hello|hey|greetings)\s+(messi|ronaldo|neymar|mbappe|mbappé|benzema|modric|ramos)\b',
-            r'\b(messi|ronaldo|neymar|mbappe|mbappé|benzema|modric|ramos)[,:\s]',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                name = match.group(2) if match.lastindex >= 2 else match.group(1)
-                name = name.replace('é', 'e')  # Normalize
-                
-                if name in ["messi", "ronaldo", "neymar", "mbappe", "benzema", "modric", "ramos"]:
-                    return name
-        
-        return None
+        return (scan or AGENT_MATCHER.scan(message)).first
     
-    def detect_team_call(self, message: str) -> bool:
+    def detect_team_call(self, message: str, scan: MentionScan = None) -> bool:
         """Check if message is calling the whole team"""
-        message_lower = message.lower().strip()
-        team_keywords = ['everyone', 'everybody', 'team', 'all agents', 'all of you', 'entire team']
-        
-        return any(keyword in message_lower for keyword in team_keywords)
+        return (scan or AGENT_MATCHER.scan(message)).team_call
+    
+    def request_class(self, message: str, uploaded_files: list = None) -> str:
+        """Priority class of a message (see utils.bulkhead), for admission control"""
+        scan = AGENT_MATCHER.scan(message)
+        if self.detect_direct_call(message, scan):
+            return "direct"
+        return request_priority("team", uploaded_files) if self.detect_team_call(message, scan) else "smart"
     
     async def process_message(
         self, 
@@ -153,12 +172,14 @@ class CrewAIWebSocketHandler:
         
         context = {
             "uploaded_files": uploaded_files or [],
-            "client_id": client_id
+            "client_id": client_id,
+            "deadline": Deadline()
         }
         
         try:
             # Step 1: Check for direct agent call
-            direct_agent = self.detect_direct_call(message)
+            scan = AGENT_MATCHER.scan(message)
+            direct_agent = self.detect_direct_call(message, scan)
             
             if direct_agent:
                 print(f"[WS-CrewAI] 🎯 DIRECT CALL to {direct_agent}")
@@ -180,7 +201,7 @@ class CrewAIWebSocketHandler:
                 return {direct_agent: response}
             
             # Step 2: Check for team call
-            if self.detect_team_call(message):
+            if self.detect_team_call(message, scan):
                 print(f"[WS-CrewAI] 👥 TEAM COLLABORATION MODE")
                 
                 # All agents
@@ -0,0 +1,176 @@
+# core/intent_classifier.py
+"""
+Local intent classifier for picking which agent answers a message.
+
+Each agent's curated role vocabulary is treated as one BM25 document. Since the
+documents never change, every term's BM25 contribution to every agent is worked
+out once up front, and classifying a message is just summing those per-term score
+vectors for the message's stemmed words and word pairs - no model, no network,
+a few microseconds per message. Only low-confidence predictions need an LLM.
+"""
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Below this confidence callers should fall back to the LLM router
+CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.5))
+# Added to the top score when computing confidence, so a single weak hit isn't "sure"
+CONFIDENCE_PRIOR = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Role vocabulary per router agent key: term -> weight (3 = defining, 2 = strong, 1 = supporting).
+# Multi-word terms match adjacent words in the message.
+ROLE_VOCABULARY: Dict[str, Dict[str, float]] = {
+    "messi": {  # Requirements Analyst
+        "requirement": 3, "requirements": 3, "specification": 2, "spec": 2, "user story": 3, "user stories": 3,
+        "acceptance criteria": 3, "acceptance": 2, "business rule": 2, "stakeholder": 1, "use case": 2,
+        "functional": 1, "scope": 2, "persona": 2, "elicitation": 2, "epic": 1, "mvp": 1, "prd": 2,
+        "feature": 1, "gather": 1, "needs": 1,
+    },
+    "ronaldo": {  # Software Architect
+        "architecture": 3, "architect": 3, "design": 2, "system design": 3, "structure": 1, "component": 2,
+        "module": 1, "pattern": 2, "framework": 1, "microservice": 3, "monolith": 3, "scalability": 2,
+        "scale": 1, "database": 2, "schema": 2, "diagram": 2, "event driven": 2, "cqrs": 2, "domain": 1,
+        "layer": 1, "tech stack": 2, "caching": 2, "cache": 2, "message broker": 2, "queue": 1,
+        "data model": 2, "integration": 1, "tradeoff": 1, "trade off": 1, "api design": 3,
+    },
+    "neymar": {  # Developer
+        "code": 3, "coding": 3, "implement": 3, "implementation": 3, "develop": 2, "development": 2,
+        "programming": 2, "function": 2, "class": 1, "method": 1, "algorithm": 2, "refactor": 3,
+        "fix": 1, "debug": 2, "python": 2, "javascript": 2, "typescript": 2, "react": 2, "endpoint": 2,
+        "write": 1, "library": 1, "snippet": 2, "compile": 2, "syntax": 2, "pull request": 2,
+        "code review": 2, "build": 1, "crud": 2, "sql query": 2,
+    },
+    "mbappe": {  # QA Tester
+        "test": 3, "testing": 3, "tester": 3, "qa": 3, "quality": 2, "quality assurance": 3, "bug": 2,
+        "issue": 1, "validation": 2, "verification": 2, "regression": 3, "coverage": 2, "test case": 3,
+        "e2e": 2, "end to end": 2, "selenium": 2, "playwright": 2, "pytest": 2, "unit test": 3,
+        "integration test": 3, "flaky": 3, "reproduce": 2, "edge case": 2, "assert": 1, "automation": 1,
+        "validate": 2,
+    },
+    "benzema": {  # DevOps Engineer
+        "deploy": 3, "deployment": 3, "infrastructure": 3, "server": 2, "cloud": 2, "docker": 3,
+        "dockerfile": 3, "kubernetes": 3, "k8s": 3, "devops": 3, "ci cd": 3, "pipeline": 2, "aws": 2,
+        "azure": 2, "gcp": 2, "terraform": 3, "helm": 2, "monitoring": 2, "container": 2, "rollout": 2,
+        "rollback": 2, "release": 1, "hosting": 2, "nginx": 2, "load balancer": 2, "autoscaling": 2,
+        "uptime": 2, "observability": 2, "prometheus": 2, "grafana": 2, "vercel": 2, "logging": 1,
+    },
+    "modric": {  # Project Manager
+        "project": 2, "management": 2, "manage": 1, "timeline": 3, "schedule": 3, "milestone": 3,
+        "resource": 2, "planning": 2, "plan": 1, "coordination": 2, "coordinate": 2, "sprint": 3,
+        "roadmap": 3, "deadline": 2, "estimate": 2, "priority": 2, "prioritize": 2, "standup": 2,
+        "retrospective": 2, "budget": 2, "status": 1, "risk": 1, "kanban": 2, "scrum": 2,
+        "velocity": 2, "backlog": 2, "delivery": 1,
+    },
+    "ramos": {  # Security Expert
+        "security": 3, "secure": 2, "vulnerability": 3, "authentication": 3, "authorization": 3,
+        "encryption": 3, "encrypt": 3, "protection": 2, "owasp": 3, "xss": 3, "injection": 3, "csrf": 3,
+        "penetration": 2, "penetration test": 3, "pentest": 3, "harden": 2, "threat": 2, "threat model": 3,
+        "jwt": 2, "oauth": 2, "password": 2, "secret": 2, "tls": 2, "ssl": 2, "access control": 2, "compliance": 2,
+        "gdpr": 2, "audit": 2, "exploit": 2, "cve": 2, "firewall": 2, "hashing": 2, "permission": 2,
+        "rbac": 2,
+    },
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Longest suffix first; a stem keeps at least three letters
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ities", "ity", "ies", "ing", "ers", "ate", "er", "ed", "es", "s")
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so "deployments", "deploying" and "deploy" share a term"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+            break
+    # "resource" and "resources" both end up as "resourc"
+    return word[:-1] if word.endswith("e") and len(word) > 4 else word
+
+
+def _terms(text: str) -> List[str]:
+    """Stemmed words plus adjacent word pairs"""
+    words = [_stem(w) for w in _WORD.findall(text.lower())]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@dataclass
+class IntentPrediction:
+    """Agents ranked by score, best first, and how sure the top pick is (0-1)"""
+    ranked: List[Tuple[str, float]]
+    confidence: float
+
+    @property
+    def agent(self) -> Optional[str]:
+        return self.ranked[0][0] if self.ranked else None
+
+    @property
+    def confident(self) -> bool:
+        return self.confidence >= CONFIDENCE_THRESHOLD
+
+    def shortlist(self, ratio: float = 0.6) -> List[str]:
+        """The top agent plus any scoring within `ratio` of it, for multi-topic messages"""
+        if not self.ranked:
+            return []
+        top = self.ranked[0][1]
+        return [agent for agent, score in self.ranked if score >= top * ratio]
+
+
+class IntentClassifier:
+    """BM25 over per-agent role vocabularies with precomputed per-term score vectors"""
+
+    def __init__(self, vocabulary: Dict[str, Dict[str, float]] = None, k1: float = BM25_K1, b: float = BM25_B):
+        vocabulary = vocabulary or ROLE_VOCABULARY
+        self.agents = list(vocabulary)
+
+        # Term frequencies per agent document, after stemming
+        docs: List[Dict[str, float]] = []
+        for agent in self.agents:
+            tf: Dict[str, float] = {}
+            for phrase, weight in vocabulary[agent].items():
+                term = " ".join(_stem(w) for w in _WORD.findall(phrase.lower()))
+                tf[term] = max(tf.get(term, 0), weight)
+            docs.append(tf)
+        lengths = [sum(tf.values()) for tf in docs]
+        avg_length = sum(lengths) / len(lengths)
+
+        # term -> BM25 contribution to each agent, in self.agents order
+        self._vectors: Dict[str, Tuple[float, ...]] = {}
+        n = len(docs)
+        for term in {t for tf in docs for t in tf}:
+            df = sum(1 for tf in docs if term in tf)
+            idf = math.log((n - df + 0.5) / (df + 0.5) + 1)
+            self._vectors[term] = tuple(
+                idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * length / avg_length)) if term in tf else 0.0
+                for tf, length in zip(docs, lengths)
+            )
+
+    def scores(self, text: str) -> Dict[str, float]:
+        totals = [0.0] * len(self.agents)
+        for term in set(_terms(text)):
+            vector = self._vectors.get(term)
+            if vector is not None:
+                totals = [t + v for t, v in zip(totals, vector)]
+        return dict(zip(self.agents, totals))
+
+    def classify(self, text: str) -> IntentPrediction:
+        ranked = sorted(((a, s) for a, s in self.scores(text).items() if s > 0), key=lambda item: -item[1])
+        if not ranked:
+            return IntentPrediction([], 0.0)
+        top = ranked[0][1]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        # Ties and weak evidence both pull confidence down
+        confidence = (top - runner_up) / (top + CONFIDENCE_PRIOR) if runner_up < top else 0.0
+        return IntentPrediction([(a, round(s, 4)) for a, s in ranked], round(confidence, 4))
+
+
+_classifier_instance = None
+
+def get_intent_classifier() -> IntentClassifier:
+    """Get or create the process-wide intent classifier"""
+    global _classifier_instance
+    if _classifier_instance is None:
+        _classifier_instance = IntentClassifier()
+    return _classifier_instance
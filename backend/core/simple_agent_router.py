@@ -2,9 +2,7 @@
 """
 Simple Agent Router - Direct agent communication without LangGraph complexity
 """
-import asyncio
-import re
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from agents.requirements_analyst import RequirementsAnalyst
@@ -14,6 +12,11 @@ from agents.qa_tester import QATester
 from agents.devops_engineer import DevOpsEngineer
 from agents.project_manager import ProjectManager
 from agents.security_expert import SecurityExpert
+from utils.deadline import Deadline
+from utils.fan_out import AgentResult, as_completed
+from utils.bulkhead import request_priority
+from core.agent_matcher import AgentMatcher, MentionScan
+from core.intent_classifier import get_intent_classifier
 
 
 class SimpleAgentRouter:
@@ -36,7 +39,7 @@ class SimpleAgentRouter:
             "ramos": SecurityExpert(),
         }
         
-        # Simple name mappings - no regex complexity
+        # Name mappings, compiled once into a single-pass matcher below
         self.agent_names = {
             # Primary names (football players)
             "messi": "messi",
@@ -60,168 +63,138 @@ class SimpleAgentRouter:
             "security": "ramos"
         }
         
+        self.matcher = AgentMatcher(self.agent_names)
+        
         print(f"[ROUTER] ✅ Loaded {len(self.agents)} agents: {list(self.agents.keys())}")
     
-    def detect_called_agent(self, message: str) -> Optional[str]:
+    def detect_called_agent(self, message: str, scan: MentionScan = None) -> Optional[str]:
         """
         Detect which agent is being called from a message.
         Returns agent key (sara, marc, etc.) or None if no direct call detected.
         """
-        message_lower = message.lower().strip()
+        scan = scan or self.matcher.scan(message)
         
         print(f"[ROUTER] 🔍 Detecting agent in: '{message}'")
         
-        # Check for direct greetings first (highest priority)
-        greeting_patterns = [
-            r'\bhi\s+(\w+)',
-            r'\bhello\s+(\w+)', 
-            r'\bhey\s+(\w+)',
-            r'\bgreetings\s+(\w+)'
-        ]
-        
-        for pattern in greeting_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                name = match.group(1)
-                if name in self.agent_names:
-                    agent_key = self.agent_names[name]
-                    print(f"[ROUTER] ✅ DIRECT GREETING: '{name}' → {agent_key}")
-                    return agent_key
-                    
-        # Check for name mentions in message
-        for name_variant, agent_key in self.agent_names.items():
-            if name_variant in message_lower:
-                # Make sure it's a word boundary to avoid false matches
-                if re.search(r'\b' + re.escape(name_variant) + r'\b', message_lower):
-                    print(f"[ROUTER] ✅ NAME MENTION: '{name_variant}' → {agent_key}")
-                    return agent_key
+        # Direct greetings take priority over names mentioned anywhere else
+        if scan.greeted:
+            print(f"[ROUTER] ✅ DIRECT GREETING: '{scan.aliases[scan.greeted]}' → {scan.greeted}")
+            return scan.greeted
+        if scan.first:
+            print(f"[ROUTER] ✅ NAME MENTION: '{scan.aliases[scan.first]}' → {scan.first}")
+            return scan.first
         
         print(f"[ROUTER] ❌ NO AGENT DETECTED in: '{message}'")
         return None
     
-    def detect_team_call(self, message: str) -> bool:
+    def detect_team_call(self, message: str, scan: MentionScan = None) -> bool:
         """Check if message is calling the whole team"""
-        message_lower = message.lower().strip()
-        team_keywords = ['everyone', 'everybody', 'team', 'all agents', 'all of you', 'entire team']
+        scan = scan or self.matcher.scan(message)
+        if scan.team_call:
+            print(f"[ROUTER] 👥 TEAM CALL DETECTED")
+        return scan.team_call
+    
+    def request_class(self, message: str, requested_agents: List[str] = None, uploaded_files: list = None) -> str:
+        """Priority class of a message (see utils.bulkhead) without routing it, for admission control"""
+        scan = self.matcher.scan(message)
+        if scan.greeted or scan.first:
+            return "direct"
+        if scan.team_call or (requested_agents and len(requested_agents) > 1):
+            return request_priority("team", uploaded_files)
+        return "smart"
+    
+    def plan_route(self, message: str, requested_agents: List[str] = None) -> Tuple[str, List[str]]:
+        """
+        Decide who answers a message without calling any agent.
+        Returns the routing mode ("direct", "team", "smart" or "default") and the agent keys.
+        """
+        # One scan of the message answers both the direct-call and the team-call checks
+        scan = self.matcher.scan(message)
+        
+        # Step 1: Check for direct agent call
+        called_agent = self.detect_called_agent(message, scan)
+        if called_agent:
+            return "direct", [called_agent]
         
-        for keyword in team_keywords:
-            if keyword in message_lower:
-                print(f"[ROUTER] 👥 TEAM CALL DETECTED: '{keyword}'")
-                return True
-        return False
+        # Step 2: Check for team call
+        if self.detect_team_call(message, scan) or (requested_agents and len(requested_agents) > 1):
+            return "team", [key for key in (requested_agents or self.agents) if key in self.agents]
+        
+        # Step 3: Smart single agent selection based on message content
+        selected_agent = self._select_best_agent(message)
+        if selected_agent:
+            return "smart", [selected_agent]
+        
+        # Default to Messi only if absolutely no other option
+        return "default", ["messi"]
     
     async def route_message(self, message: str, context: dict = None, requested_agents: List[str] = None) -> Dict[str, str]:
         """
         Route a message to appropriate agents and return their responses.
         This is the main entry point that replaces the entire LangGraph workflow.
+        Callers that can deliver replies one by one should use iter_responses instead.
+        Agents that got no bulkhead slot are left out.
+        """
+        return {result.agent: result.response async for result in self.iter_responses(message, context, requested_agents)
+                if not result.busy}
+    
+    async def iter_responses(self, message: str, context: dict = None,
+                             requested_agents: List[str] = None) -> AsyncIterator[AgentResult]:
+        """
+        Route a message and yield each agent's reply as soon as it finishes, fastest first,
+        so a team call doesn't hold every answer back until the slowest agent is done.
+        Failed agents yield their error text as the response; agents that got no
+        bulkhead slot yield no response and result.busy, for a busy frame instead.
         """
         print(f"\n{'='*60}")
         print(f"[ROUTER] 📨 ROUTING MESSAGE: '{message}'")
         print(f"[ROUTER] 👥 Requested agents: {requested_agents}")
         print(f"{'='*60}")
         
-        responses = {}
         context = context or {}
+        deadline = Deadline.from_context(context)
         
-        # Step 1: Check for direct agent call
-        called_agent = self.detect_called_agent(message)
-        if called_agent:
-            print(f"[ROUTER] 🎯 DIRECT CALL to {called_agent}")
-            agent = self.agents[called_agent]
-            
-            try:
-                response = await agent.process_request(message, context)
-                responses[called_agent] = response
-                print(f"[ROUTER] ✅ {called_agent} responded: {len(response)} chars")
-            except Exception as e:
-                error_msg = f"Error from {called_agent}: {str(e)}"
-                responses[called_agent] = error_msg
-                print(f"[ROUTER] ❌ {called_agent} error: {e}")
-            
-            return responses
+        mode, target_agents = self.plan_route(message, requested_agents)
         
-        # Step 2: Check for team call
-        if self.detect_team_call(message) or (requested_agents and len(requested_agents) > 1):
+        if mode == "team":
             print(f"[ROUTER] 👥 TEAM COLLABORATION MODE")
-            target_agents = requested_agents if requested_agents else list(self.agents.keys())
             
-            # Process all agents in parallel
-            tasks = []
-            for agent_key in target_agents:
-                if agent_key in self.agents:
-                    agent = self.agents[agent_key]
-                    task = agent.process_request(message, context)
-                    tasks.append((agent_key, task))
+            # Agents pulled in only by a team keyword are optional: when the request has
+            # little time left (e.g. it queued behind another), answer with the best match
+            if not requested_agents and deadline is not None and not deadline.allows_optional():
+                target_agents = [self._select_best_agent(message) or "messi"]
+                mode = "smart"
+                print(f"[ROUTER] ⏱️ {deadline.remaining():.1f}s left - skipping optional agents, using {target_agents}")
             
-            if tasks:
-                print(f"[ROUTER] 🚀 Running {len(tasks)} agents in parallel")
-                results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
-                
-                for (agent_key, _), result in zip(tasks, results):
-                    if isinstance(result, Exception):
-                        responses[agent_key] = f"Error: {str(result)}"
-                        print(f"[ROUTER] ❌ {agent_key} error: {result}")
-                    else:
-                        responses[agent_key] = result
-                        print(f"[ROUTER] ✅ {agent_key} responded: {len(result)} chars")
-            
-            return responses
-        
-        # Step 3: Smart single agent selection based on message content
-        selected_agent = self._select_best_agent(message)
-        if selected_agent:
-            print(f"[ROUTER] 🤖 SMART SELECTION: {selected_agent}")
-            agent = self.agents[selected_agent]
-            
-            try:
-                response = await agent.process_request(message, context)
-                responses[selected_agent] = response
-                print(f"[ROUTER] ✅ {selected_agent} responded: {len(response)} chars")
-            except Exception as e:
-                error_msg = f"Error from {selected_agent}: {str(e)}"
-                responses[selected_agent] = error_msg
-                print(f"[ROUTER] ❌ {selected_agent} error: {e}")
+            print(f"[ROUTER] 🚀 Running {len(target_agents)} agents in parallel")
         else:
-            # Default to Messi only if absolutely no other option
-            print(f"[ROUTER] 🎯 DEFAULT to Messi (Requirements Analyst)")
-            try:
-                response = await self.agents["messi"].process_request(message, context)
-                responses["messi"] = response
-                print(f"[ROUTER] ✅ Messi responded: {len(response)} chars")
-            except Exception as e:
-                responses["messi"] = f"Error: {str(e)}"
-                print(f"[ROUTER] ❌ Messi error: {e}")
-        
-        return responses
+            # Direct call, smart selection or the default: a single agent answers
+            print(f"[ROUTER] 🎯 {mode.upper()} → {target_agents[0]}")
+        
+        # Interactive single-agent replies go ahead of team fan-outs and document runs
+        # when agent calls have to queue (see utils.bulkhead)
+        context = {**context, "priority": request_priority(mode, context.get("uploaded_files"))}
+        calls = {agent_key: self.agents[agent_key].process_request(message, context) for agent_key in target_agents}
+        async for result in as_completed(calls):
+            if result.busy:
+                print(f"[ROUTER] 🚦 {result.agent} not run: {result.error}")
+            elif not result.ok:
+                result.response = f"Error from {result.agent}: {str(result.error)}"
+                print(f"[ROUTER] ❌ {result.agent} error: {result.error}")
+            elif not result.response and mode == "team":
+                # Skipped at the deadline - the partial team reply goes out without it
+                print(f"[ROUTER] ⏱️ {result.agent} skipped (deadline)")
+                continue
+            else:
+                print(f"[ROUTER] ✅ {result.agent} responded: {len(result.response)} chars in {result.latency_ms:.0f}ms")
+            yield result
     
     def _select_best_agent(self, message: str) -> Optional[str]:
         """
-        Select the best agent based on message content keywords.
-        This replaces complex LangGraph routing logic.
+        Select the best agent based on message content.
+        Uses the local BM25 intent classifier over each role's vocabulary.
         """
-        message_lower = message.lower()
-        
-        # Keywords for each agent
-        agent_keywords = {
-            "messi": ["requirement", "requirements", "specification", "spec", "user story", "acceptance criteria", "business rule"],
-            "ronaldo": ["architecture", "design", "system", "structure", "component", "module", "pattern", "framework"],
-            "neymar": ["code", "coding", "implement", "development", "programming", "function", "class", "method", "algorithm"],
-            "mbappe": ["test", "testing", "quality", "bug", "issue", "validation", "verification", "qa", "quality assurance"],
-            "benzema": ["deploy", "deployment", "infrastructure", "server", "cloud", "docker", "kubernetes", "devops", "ci/cd"],
-            "modric": ["project", "management", "timeline", "schedule", "milestone", "resource", "planning", "coordination"],
-            "ramos": ["security", "vulnerability", "authentication", "authorization", "encryption", "protection", "secure"]
-        }
-        
-        # Score each agent based on keyword matches
-        scores = {}
-        for agent_key, keywords in agent_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in message_lower)
-            if score > 0:
-                scores[agent_key] = score
-        
-        if scores:
-            best_agent = max(scores, key=scores.get)
-            print(f"[ROUTER] 📊 Keyword scoring: {scores} → {best_agent}")
-            return best_agent
-        
-        return None
\ No newline at end of file
+        prediction = get_intent_classifier().classify(message)
+        if prediction.agent:
+            print(f"[ROUTER] 📊 Intent scores: {dict(prediction.ranked[:3])} → {prediction.agent} (confidence {prediction.confidence:.2f})")
+        return prediction.agent
@@ -5,13 +5,24 @@ Simple WebSocket Handler - Direct message routing without complex workflow manag
 import json
 import asyncio
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from utils.websocket_manager import WebSocketManager
+from utils.websocket_manager import WebSocketManager, AgentStreams
 from utils.session_manager import SessionManager
 from core.simple_agent_router import SimpleAgentRouter
 from models.schemas import UserRequest, AgentMessage
+from utils.deadline import Deadline
 
+# Agent key to display name (Football players)
+AGENT_DISPLAY_NAMES = {
+    "messi": "Messi ⚽ (Requirements Analyst)",
+    "ronaldo": "Ronaldo ⚽ (Software Architect)",
+    "neymar": "Neymar ⚽ (Developer)",
+    "mbappe": "Mbappé ⚽ (QA Tester)",
+    "benzema": "Benzema ⚽ (DevOps Engineer)",
+    "modric": "Modric ⚽ (Project Manager)",
+    "ramos": "Ramos ⚽ (Security Expert)"
+}
 
 class SimpleWebSocketHandler:
     """
@@ -25,7 +36,7 @@ class SimpleWebSocketHandler:
         self.router = SimpleAgentRouter()
         print("[WS-HANDLER] 🚀 SimpleWebSocketHandler initialized")
     
-    async def handle_message(self, session_id: str, message_data: dict) -> None:
+    async def handle_message(self, session_id: str, message_data: dict, deadline: Optional[Deadline] = None) -> None:
         """
         Handle incoming WebSocket message with simple, direct routing.
         No complex state management or workflow orchestration.
@@ -59,31 +70,58 @@ class SimpleWebSocketHandler:
                 "project_context": user_request.context.dict() if user_request.context else {},
                 "conversation_history": [msg.dict() for msg in user_request.history],
                 "uploaded_files": [file.dict() for file in user_request.uploaded_files],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "deadline": deadline or Deadline()
             }
             
+            # Stream each agent's tokens to the client as they arrive. Agents report their
+            # role, the router and display names use the player key.
+            agent_streams = AgentStreams(
+                self.websocket_manager, session_id,
+                label=lambda key: AGENT_DISPLAY_NAMES.get(key, key)
+            )
+            key_for_role = {agent.role: key for key, agent in self.router.agents.items()}
+            context["stream_handler"] = lambda role: agent_streams.handler(key_for_role.get(role, role))
+            
+            # Agents waiting on the bulkhead (too many calls in flight) tell the client where they are in line
+            async def on_queued(role: str, position: int) -> None:
+                agent = AGENT_DISPLAY_NAMES.get(key_for_role.get(role, role), role)
+                await self.websocket_manager.send_status_update(
+                    session_id, "queued", f"{agent} is waiting for capacity (position {position} in queue)",
+                    agent=agent, queue_position=position
+                )
+            context["on_queued"] = on_queued
+            
             print(f"[WS-HANDLER] 🎯 Routing message: '{user_request.request}'")
             print(f"[WS-HANDLER] 👥 Requested agents: {user_request.requested_agents}")
             
-            # Route message using simple router (NO LANGGRAPH)
+            # Route message using simple router (NO LANGGRAPH). Each reply is sent the
+            # moment its agent finishes rather than after the slowest one.
             try:
-                responses = await self.router.route_message(
+                latencies = {}
+                async for result in self.router.iter_responses(
                     message=user_request.request,
                     context=context,
                     requested_agents=user_request.requested_agents
-                )
-                
-                print(f"[WS-HANDLER] ✅ Got {len(responses)} responses: {list(responses.keys())}")
+                ):
+                    if result.busy:
+                        # The agent never ran - tell the client, but nothing goes into history
+                        await self.websocket_manager.send_frame(
+                            session_id, result.error.busy_frame(AGENT_DISPLAY_NAMES.get(result.agent, result.agent))
+                        )
+                        continue
+                    latencies[result.agent] = result.latency_ms
+                    # Close the agent's stream (or send the response if nothing was streamed)
+                    await self._send_agent_response(session_id, result.agent, result.response, user_request,
+                                                    agent_streams, latency_ms=result.latency_ms)
                 
-                # Send each response immediately
-                for agent_key, response in responses.items():
-                    await self._send_agent_response(session_id, agent_key, response, user_request)
+                print(f"[WS-HANDLER] ✅ Got {len(latencies)} responses: {latencies}")
                 
                 # Send completion status
-                agent_names = list(responses.keys())
+                agent_names = list(latencies.keys())
                 completion_msg = f"Completed with responses from: {', '.join(agent_names)}"
                 await self.websocket_manager.send_status_update(
-                    session_id, "completed", completion_msg
+                    session_id, "completed", completion_msg, latencies_ms=latencies
                 )
                 
                 # Update session completion
@@ -95,31 +133,24 @@ class SimpleWebSocketHandler:
             except Exception as routing_error:
                 print(f"[WS-HANDLER] ❌ Routing error: {routing_error}")
                 await self._send_error(session_id, f"Error processing request: {routing_error}")
+            finally:
+                await agent_streams.close_all()
         
         except Exception as e:
             print(f"[WS-HANDLER] ❌ Fatal error handling message: {e}")
             await self._send_error(session_id, f"Internal error: {e}")
     
-    async def _send_agent_response(self, session_id: str, agent_key: str, response: str, user_request: UserRequest) -> None:
+    async def _send_agent_response(self, session_id: str, agent_key: str, response: str, user_request: UserRequest,
+                                   agent_streams: Optional[AgentStreams] = None, latency_ms: float = None) -> None:
         """Send agent response via WebSocket and update session history"""
         try:
-            # Convert agent key to display name (Football players)
-            agent_display_names = {
-                "messi": "Messi ⚽ (Requirements Analyst)",
-                "ronaldo": "Ronaldo ⚽ (Software Architect)", 
-                "neymar": "Neymar ⚽ (Developer)",
-                "mbappe": "Mbappé ⚽ (QA Tester)",
-                "benzema": "Benzema ⚽ (DevOps Engineer)",
-                "modric": "Modric ⚽ (Project Manager)",
-                "ramos": "Ramos ⚽ (Security Expert)"
-            }
-            
-            display_name = agent_display_names.get(agent_key, agent_key)
+            display_name = AGENT_DISPLAY_NAMES.get(agent_key, agent_key)
             
             print(f"[WS-HANDLER] 📤 Sending response from {display_name}: {len(response)} chars")
             
-            # Send via WebSocket
-            await self.websocket_manager.send_agent_response(session_id, display_name, response)
+            # Close the streamed reply with its final text, or send it whole if nothing was streamed
+            if agent_streams is None or not await agent_streams.finish(agent_key, response, latency_ms=latency_ms):
+                await self.websocket_manager.send_agent_response(session_id, display_name, response, latency_ms=latency_ms)
             
             # Add to session history
             message = AgentMessage(
@@ -3,21 +3,40 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import asyncio
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from utils.websocket_manager import WebSocketManager
+from utils.websocket_manager import WebSocketManager, AgentStreams
 from utils.session_manager import SessionManager
-from workflows.sdlc_workflow import SDLCWorkflow
+from utils.completion_cache import get_completion_cache
+from utils.deadline import Deadline
+from utils.delivery_bus import create_delivery
+from utils.bulkhead import BulkheadFull
+from utils.idempotency import get_idempotency_store
+from utils.ws_dispatch import WebSocketDispatcher, readiness as readiness_response
+from models.groq_models import get_groq_manager, get_provider_registry
+from workflows.sdlc_workflow import SDLCWorkflow, request_class
 from models.schemas import UserRequest, AgentMessage
 from routes.github_routes import router as github_router
 
-websocket_manager = WebSocketManager()
+# In-process by default; WS_DELIVERY_BUS=redis lets several workers serve the same sessions
+delivery_registry, delivery_bus = create_delivery()
+websocket_manager = WebSocketManager(registry=delivery_registry, bus=delivery_bus)
 session_manager = SessionManager()
+ws_dispatcher = WebSocketDispatcher(websocket_manager)
+idempotency_store = get_idempotency_store()
+
+# Share completions and finished idempotent requests across workers through the same Redis the sessions use
+if session_manager.redis_available:
+    get_completion_cache().attach_redis(session_manager.redis_client)
+    idempotency_store.attach_redis(session_manager.redis_client)
+
 sdlc_workflow = None  # Pre-initialized at startup for faster responses
+warmup_task = None
 
 def get_sdlc_workflow():
     global sdlc_workflow
@@ -44,17 +63,18 @@ app.include_router(github_router)
 @app.on_event("startup")
 async def startup_event():
     print("FLUX - Where Agents Meet Agile starting up...")
+    await websocket_manager.start_delivery()
     # Pre-initialize workflow to avoid first-request delay
     workflow = get_sdlc_workflow()
     print("[STARTUP] Pre-initialized workflow for faster responses")
     
     # Warm up Groq models for faster first responses
+    global warmup_task
     try:
-        from models.groq_models import GroqModelManager
-        groq_manager = GroqModelManager()
-        import asyncio
-        loop = asyncio.get_event_loop()
-        loop.run_in_executor(None, groq_manager.warm_up_models)
+        groq_manager = get_groq_manager()
+        # Warms every model concurrently in the background; /ready reports 503 until it finishes.
+        # Keep a reference so the task isn't collected
+        warmup_task = asyncio.create_task(groq_manager.warm_up_models())
         print("[STARTUP] Started model warm-up process")
     except Exception as e:
         print(f"[STARTUP] Model warm-up failed: {e}")
@@ -62,6 +82,8 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     print("FLUX - Where Agents Meet Agile shutting down...")
+    await websocket_manager.stop_delivery()
+    await get_provider_registry().aclose()
 
 @app.get("/")
 async def root():
@@ -71,6 +93,178 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness():
+    """Readiness gate for the load balancer: 503 until model warm-up has finished"""
+    return readiness_response()
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for the LLM provider path"""
+    return ws_dispatcher.metrics()
+
+async def run_user_request(session_id: str, user_request: UserRequest, deadline: Deadline = None):
+    """Run one chat request for a session; cancelled on disconnect or supersede"""
+    session_manager.update_session(session_id, {
+        "last_request": user_request.dict(),
+        "project_context": user_request.context.dict() if user_request.context else {}
+    })
+
+    await websocket_manager.send_status_update(session_id, "processing", "Initializing agents...")
+
+    try:
+        print(f"[WS] Received request: {user_request}")
+        print(f"[WS] Requested agents: {user_request.requested_agents}")
+    
+        initial_state = {
+            "user_request": user_request.request,
+            "current_phase": "initial",
+            "agent_outputs": {},
+            "conversation_history": [msg.dict() for msg in user_request.history],
+            "project_context": user_request.context.dict() if user_request.context else {},
+            "uploaded_files": [file.dict() for file in user_request.uploaded_files],
+            "next_agent": "",
+            "final_response": "",
+            "requested_agents": user_request.requested_agents,
+            "called_agent": None,
+            "stream_handler": None,
+            "deadline": deadline
+        }
+        if user_request.requested_agents:
+            initial_state["current_phase"] = "collaboration"
+
+        await websocket_manager.send_status_update(session_id, "processing", "Running agent workflow...")
+        workflow = get_sdlc_workflow()
+    
+        # Track response count for progress updates
+        response_count = 0
+        all_responses = {}  # Track all responses across state updates
+        started = time.perf_counter()
+        # Agents stream tokens as they arrive; the node result then closes each stream
+        agent_streams = AgentStreams(websocket_manager, session_id)
+        initial_state["stream_handler"] = agent_streams.handler
+
+        async def deliver(agent_name: str, response, latency_ms: float = None) -> None:
+            """Send one agent's reply the first time it is seen, from a node result or mid-node"""
+            nonlocal response_count
+            if agent_name in all_responses or not response or not str(response).strip():
+                return
+            all_responses[agent_name] = response
+            response_count += 1
+            if latency_ms is None:
+                latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            print(f"[WS] New response from {agent_name}: {len(str(response))} chars after {latency_ms:.0f}ms")
+
+            # Send immediate status update per agent
+            await websocket_manager.send_status_update(session_id, "processing", f"{agent_name} is responding...")
+
+            # Close the agent's token stream with the final text, or send
+            # the complete response if nothing was streamed (e.g. an agent error)
+            response_str = str(response)
+            if not await agent_streams.finish(agent_name, response_str, latency_ms=latency_ms):
+                await websocket_manager.send_agent_response(session_id, agent_name, response_str, latency_ms=latency_ms)
+
+            # Broadcast collaboration update when new agents join
+            current_active_agents = list(all_responses.keys())
+            if len(current_active_agents) > len(user_request.requested_agents):
+                print(f"[WS] A2A triggered - broadcasting new active agents: {current_active_agents}")
+                await websocket_manager.broadcast_collaboration(session_id, current_active_agents, "active")
+
+            message = AgentMessage(
+                type="agent_response",
+                agent=agent_name,
+                message=response_str,
+                timestamp=datetime.now().isoformat()
+            )
+            session_manager.add_message_to_history(session_id, message.dict())
+
+        # Team runs hand over each reply as it finishes instead of when the whole node returns
+        initial_state["on_agent_response"] = deliver
+
+        async def on_queued(role: str, position: int) -> None:
+            """Agents waiting on the bulkhead report where they are in line"""
+            await websocket_manager.send_status_update(
+                session_id, "queued", f"{role} is waiting for capacity (position {position} in queue)",
+                agent=role, queue_position=position
+            )
+
+        initial_state["on_queued"] = on_queued
+
+        async def on_agent_busy(agent_name: str, error: BulkheadFull) -> None:
+            """A collaborator that got no bulkhead slot: a busy frame, nothing in history"""
+            await websocket_manager.send_frame(session_id, error.busy_frame(agent_name))
+
+        initial_state["on_agent_busy"] = on_agent_busy
+    
+        print(f"[WS] Starting workflow execution with state: {list(initial_state.keys())}")
+        print(f"[WS] 🔍 CRITICAL DEBUG: user_request = '{initial_state.get('user_request')}'")
+        print(f"[WS] 🔍 CRITICAL DEBUG: requested_agents = {initial_state.get('requested_agents')}")
+        print(f"[WS] 🔍 CRITICAL DEBUG: called_agent = {initial_state.get('called_agent')}")
+        try:
+            async for state_update in workflow.workflow.astream(initial_state):
+                current_state = state_update
+                print(f"[WS] State update keys: {list(current_state.keys())}")
+            
+                # LangGraph returns node results, but we need the actual state.
+                # Each node result should contain the updated state
+                for node_name, node_result in current_state.items():
+                    print(f"[WS] Checking node {node_name}, result type: {type(node_result)}")
+                
+                    # The node result IS the updated state for that node
+                    if isinstance(node_result, dict) and "agent_outputs" in node_result:
+                        current_outputs = node_result["agent_outputs"]
+                        print(f"[WS] Found agent_outputs in {node_name}: {list(current_outputs.keys())}")
+                    
+                        for agent_name, response in current_outputs.items():
+                            await deliver(agent_name, response)
+            
+                if len(user_request.requested_agents) > 1:
+                    await websocket_manager.broadcast_collaboration(session_id, user_request.requested_agents, "active")
+    
+        except Exception as workflow_error:
+            print(f"[WS] Workflow execution error: {workflow_error}")
+            print(f"[WS] Workflow error type: {type(workflow_error).__name__}")
+            raise workflow_error
+        finally:
+            await agent_streams.close_all()
+
+        await websocket_manager.send_status_update(
+            session_id, "completed", f"Completed with {response_count} agent responses",
+            latency_ms=round((time.perf_counter() - started) * 1000, 1)
+        )
+        session_manager.update_session(session_id, {
+            "last_completion": datetime.now().isoformat(),
+            "current_phase": current_state.get("current_phase", "completed")
+        })
+    except BulkheadFull as e:
+        # A single-agent node's call got no slot: the agent never ran, so answer busy
+        print(f"[WS] Agent call not run session={session_id}: {e}")
+        await websocket_manager.send_frame(session_id, e.busy_frame())
+    except Exception as e:
+        error_msg = f"Error processing request: {e}"
+        print(f"[WS] Processing error session={session_id}: {error_msg}")
+        print(f"[WS] Error details: {type(e).__name__}: {str(e)}")
+    
+        # Handle specific conversation management scenarios
+        if "Invalid argument" in str(e) or "Errno 22" in str(e):
+            print(f"[WS] Detected conversation management scenario - attempting graceful handling")
+            try:
+                # Try to send a helpful response instead of an error
+                helpful_message = "I understand you want to manage the conversation participants. Let me help coordinate that for you."
+                await websocket_manager.send_agent_response(session_id, "system", helpful_message, "info")
+                await websocket_manager.send_status_update(session_id, "ready", "Ready for your next request")
+                return  # Don't send error, just continue
+            except Exception:
+                pass  # Fall through to error handling
+    
+        import traceback
+        print(f"[WS] Full traceback: {traceback.format_exc()}")
+    
+        # Send user-friendly error message
+        user_friendly_error = "I'm having trouble processing that request. Please try rephrasing or let me know specifically which agents you'd like to work with."
+        await websocket_manager.send_agent_response(session_id, "system", user_friendly_error, "error")
+        await websocket_manager.send_status_update(session_id, "error", "Please try again")
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint with detailed logging and initial ack."""
@@ -78,8 +272,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         print(f"[WS] Incoming connection session={session_id}")
         await websocket_manager.connect(websocket, session_id)
         print(f"[WS] Accepted session={session_id}")
+        # A client reconnecting with ?last_seq=N gets the frames it missed, then the live stream
+        # of any requests that kept running while it was away
+        resume = await ws_dispatcher.resume(websocket, session_id)
         # Immediate ack so frontend can confirm open
-        await websocket_manager.send_status_update(session_id, "connected", "WebSocket connected")
+        await websocket_manager.send_status_update(session_id, "connected", "WebSocket connected", **resume)
 
         session_data = session_manager.get_session(session_id)
         if not session_data:
@@ -104,138 +301,24 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 await websocket_manager.send_agent_response(session_id, "system", f"Invalid JSON: {je}", "error")
                 continue
 
-            try:
-                user_request = UserRequest(**message_data)
-            except Exception as e:
-                await websocket_manager.send_agent_response(session_id, "system", f"Invalid request format: {e}", "error")
-                continue
+            # ws_dispatcher handles pings, retries, supersede, admission and the tracked task;
+            # this entry point only decides how a request is parsed, classified and run
+            def prepare(message):
+                user_request = UserRequest(**message)
+                priority = request_class(user_request.request, user_request.requested_agents, user_request.uploaded_files)
+                return priority, lambda deadline: run_user_request(session_id, user_request, deadline)
 
-            session_manager.update_session(session_id, {
-                "last_request": user_request.dict(),
-                "project_context": user_request.context.dict() if user_request.context else {}
-            })
-
-            await websocket_manager.send_status_update(session_id, "processing", "Initializing agents...")
-
-            try:
-                print(f"[WS] Received request: {user_request}")
-                print(f"[WS] Requested agents: {user_request.requested_agents}")
-                
-                initial_state = {
-                    "user_request": user_request.request,
-                    "current_phase": "initial",
-                    "agent_outputs": {},
-                    "conversation_history": [msg.dict() for msg in user_request.history],
-                    "project_context": user_request.context.dict() if user_request.context else {},
-                    "uploaded_files": [file.dict() for file in user_request.uploaded_files],
-                    "next_agent": "",
-                    "final_response": "",
-                    "requested_agents": user_request.requested_agents,
-                    "called_agent": None
-                }
-                if user_request.requested_agents:
-                    initial_state["current_phase"] = "collaboration"
-
-                await websocket_manager.send_status_update(session_id, "processing", "Running agent workflow...")
-                workflow = get_sdlc_workflow()
-                
-                # Track response count for progress updates
-                response_count = 0
-                all_responses = {}  # Track all responses across state updates
-                
-                print(f"[WS] Starting workflow execution with state: {list(initial_state.keys())}")
-                print(f"[WS] 🔍 CRITICAL DEBUG: user_request = '{initial_state.get('user_request')}'")
-                print(f"[WS] 🔍 CRITICAL DEBUG: requested_agents = {initial_state.get('requested_agents')}")
-                print(f"[WS] 🔍 CRITICAL DEBUG: called_agent = {initial_state.get('called_agent')}")
-                try:
-                    async for state_update in workflow.workflow.astream(initial_state):
-                        current_state = state_update
-                        print(f"[WS] State update keys: {list(current_state.keys())}")
-                        
-                        # LangGraph returns node results, but we need the actual state.
-                        # Each node result should contain the updated state
-                        for node_name, node_result in current_state.items():
-                            print(f"[WS] Checking node {node_name}, result type: {type(node_result)}")
-                            
-                            # The node result IS the updated state for that node
-                            if isinstance(node_result, dict) and "agent_outputs" in node_result:
-                                current_outputs = node_result["agent_outputs"]
-                                print(f"[WS] Found agent_outputs in {node_name}: {list(current_outputs.keys())}")
-                                
-                                for agent_name, response in current_outputs.items():
-                                    if agent_name not in all_responses and response and response.strip():  # New non-empty response
-                                        all_responses[agent_name] = response
-                                        response_count += 1
-                                        print(f"[WS] New response from {agent_name}: {len(str(response))} chars")
-                                        
-                                        # Send immediate status update per agent
-                                        await websocket_manager.send_status_update(session_id, "processing", f"{agent_name} is responding...")
-                                        
-                                        # Send the complete response
-                                        response_str = str(response)
-                                        await websocket_manager.send_agent_response(session_id, agent_name, response_str)
-                                        
-                                        # Broadcast collaboration update when new agents join
-                                        current_active_agents = list(all_responses.keys())
-                                        if len(current_active_agents) > len(user_request.requested_agents):
-                                            print(f"[WS] A2A triggered - broadcasting new active agents: {current_active_agents}")
-                                            await websocket_manager.broadcast_collaboration(session_id, current_active_agents, "active")
-                                        
-                                        message = AgentMessage(
-                                            type="agent_response",
-                                            agent=agent_name,
-                                            message=response_str,
-                                            timestamp=datetime.now().isoformat()
-                                        )
-                                        session_manager.add_message_to_history(session_id, message.dict())
-                        
-                        if len(user_request.requested_agents) > 1:
-                            await websocket_manager.broadcast_collaboration(session_id, user_request.requested_agents, "active")
-                
-                except Exception as workflow_error:
-                    print(f"[WS] Workflow execution error: {workflow_error}")
-                    print(f"[WS] Workflow error type: {type(workflow_error).__name__}")
-                    raise workflow_error
-
-                await websocket_manager.send_status_update(session_id, "completed", f"Completed with {response_count} agent responses")
-                session_manager.update_session(session_id, {
-                    "last_completion": datetime.now().isoformat(),
-                    "current_phase": current_state.get("current_phase", "completed")
-                })
-            except Exception as e:
-                error_msg = f"Error processing request: {e}"
-                print(f"[WS] Processing error session={session_id}: {error_msg}")
-                print(f"[WS] Error details: {type(e).__name__}: {str(e)}")
-                
-                # Handle specific conversation management scenarios
-                if "Invalid argument" in str(e) or "Errno 22" in str(e):
-                    print(f"[WS] Detected conversation management scenario - attempting graceful handling")
-                    try:
-                        # Try to send a helpful response instead of an error
-                        helpful_message = "I understand you want to manage the conversation participants. Let me help coordinate that for you."
-                        await websocket_manager.send_agent_response(session_id, "system", helpful_message, "info")
-                        await websocket_manager.send_status_update(session_id, "ready", "Ready for your next request")
-                        return  # Don't send error, just continue
-                    except Exception:
-                        pass  # Fall through to error handling
-                
-                import traceback
-                print(f"[WS] Full traceback: {traceback.format_exc()}")
-                
-                # Send user-friendly error message
-                user_friendly_error = "I'm having trouble processing that request. Please try rephrasing or let me know specifically which agents you'd like to work with."
-                await websocket_manager.send_agent_response(session_id, "system", user_friendly_error, "error")
-                await websocket_manager.send_status_update(session_id, "error", "Please try again")
+            await ws_dispatcher.dispatch(session_id, message_data, prepare)
     except WebSocketDisconnect:
         print(f"[WS] Disconnect session={session_id}")
-        websocket_manager.disconnect(session_id)
+        await ws_dispatcher.release(websocket, session_id)
     except Exception as fatal:
         print(f"[WS] Fatal error session={session_id}: {fatal}")
         try:
             await websocket_manager.send_agent_response(session_id, "system", f"Fatal error: {fatal}", "error")
         except Exception:
             pass
-        websocket_manager.disconnect(session_id)
+        await ws_dispatcher.release(websocket, session_id)
 
 @app.get("/sessions/{session_id}")
 async def get_session_info(session_id: str):
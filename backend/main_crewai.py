@@ -4,7 +4,8 @@ This is the new main entry point with real autonomous agents
 """
 import os
 import sys
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
@@ -18,6 +19,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.crewai_websocket_handler import get_crewai_handler
 from agents.crewai_agents import get_crewai_system
+from utils.deadline import Deadline
+from utils.admission import get_admission_controller
+from utils.idempotency import get_idempotency_store
 
 # Initialize FastAPI
 app = FastAPI(
@@ -38,6 +42,8 @@ app.add_middleware(
 # Initialize systems
 crewai_handler = get_crewai_handler()
 crewai_system = get_crewai_system()
+admission_controller = get_admission_controller()
+idempotency_store = get_idempotency_store()
 
 print("\n" + "="*80)
 print("🚀 FLUX CrewAI System Starting...")
@@ -75,12 +81,24 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 
                 print(f"\n[MAIN] 📨 Received from {client_id}: {user_message[:100]}")
                 
-                # Process with CrewAI
-                await crewai_handler.process_message(
-                    client_id,
-                    user_message,
-                    uploaded_files
+                # Admission control: when the predicted queue wait is over budget, answer with a
+                # busy frame carrying retry_after instead of letting the request pile up
+                admission = admission_controller.try_admit(
+                    crewai_handler.request_class(user_message, uploaded_files), entry="ws"
                 )
+                if not admission.admitted:
+                    await websocket.send_json(admission.busy_frame())
+                    continue
+                
+                # Process with CrewAI
+                try:
+                    await crewai_handler.process_message(
+                        client_id,
+                        user_message,
+                        uploaded_files
+                    )
+                finally:
+                    admission_controller.release(admission)
                 
             elif message_type == "ping":
                 # Heartbeat
@@ -132,6 +150,17 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Admission control and cross-worker delivery counters"""
+    return {
+        "admission": admission_controller.stats(),
+        "idempotency": idempotency_store.stats(),
+        "delivery": {"registry": crewai_handler.registry.stats(), "bus": crewai_handler.bus.stats()},
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @app.get("/api/agents")
 async def get_agents():
     """Get list of available agents"""
@@ -195,36 +224,76 @@ async def get_agents():
     }
 
 
-@app.post("/api/chat")
-async def chat_endpoint(
-    message: str = Form(...),
-    agent: Optional[str] = Form(None)
-):
-    """
-    REST API chat endpoint for testing
-    """
+async def _answer_chat(message: str, agent: Optional[str]) -> dict:
+    """Status, body and headers for one REST chat request"""
+    # Shed with 503 + Retry-After when the predicted queue wait is over budget
+    admission = admission_controller.try_admit(
+        "direct" if agent and agent in crewai_system.agents else crewai_handler.request_class(message), entry="http"
+    )
+    if not admission.admitted:
+        return {
+            "status": 503,
+            "headers": {"Retry-After": str(admission.retry_after)},
+            "body": admission.busy_frame()
+        }
+    
+    context = {"deadline": Deadline()}
     try:
         if agent and agent in crewai_system.agents:
             # Direct agent call
-            response = await crewai_system.execute_single_agent(agent, message)
-            return {
+            response = await crewai_system.execute_single_agent(agent, message, context)
+            body = {
                 "agent": agent,
                 "response": response,
                 "timestamp": datetime.now().isoformat()
             }
         else:
             # Smart routing
-            responses = await crewai_system.smart_route(message)
-            return {
+            responses = await crewai_system.smart_route(message, context)
+            body = {
                 "responses": responses,
                 "timestamp": datetime.now().isoformat()
             }
+        return {"status": 200, "body": jsonable_encoder(body)}
     
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": str(e)}
-        )
+        return {"status": 500, "body": {"error": str(e)}}
+    finally:
+        admission_controller.release(admission)
+
+
+@app.post("/api/chat")
+async def chat_endpoint(
+    message: str = Form(...),
+    agent: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    REST API chat endpoint for testing.
+    
+    With an Idempotency-Key header, a retry of a request that is still running
+    waits for its response, and a retry of a finished one gets the stored
+    response (marked Idempotent-Replayed) instead of asking the agents again.
+    Server errors are not stored, so retrying those runs the request again.
+    """
+    result, replayed = None, False
+    if idempotency_key:
+        key = f"http:{idempotency_key}"
+        result = await idempotency_store.lookup(key)
+        if result is None:
+            flight = idempotency_store.inflight(key)
+            if flight is not None:
+                result = await idempotency_store.join(flight)
+        replayed = result is not None
+        if result is None:
+            result = await idempotency_store.run(key, _answer_chat(message, agent))
+    else:
+        result = await _answer_chat(message, agent)
+    
+    headers = dict(result.get("headers") or {})
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return JSONResponse(status_code=result["status"], content=result["body"], headers=headers)
 
 
 # ============================================================================
@@ -243,12 +312,14 @@ async def startup_event():
     print("\n" + "✨"*40)
     print("Ready for autonomous agent collaboration!")
     print("✨"*40 + "\n")
+    await crewai_handler.start_delivery()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("\n👋 FLUX CrewAI System shutting down...")
+    await crewai_handler.stop_delivery()
 
 
 # ============================================================================
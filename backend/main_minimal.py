@@ -7,6 +7,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 import os
 
+from core.agent_matcher import AgentMatcher
+
 # Load environment variables
 load_dotenv()
 
@@ -18,8 +20,9 @@ if not GROQ_API_KEY:
 
 # Import Groq client
 try:
-    from groq import Groq
-    groq_client = Groq(api_key=GROQ_API_KEY)
+    from models.groq_models import get_provider_registry
+    # Shared keep-alive pool for api.groq.com
+    groq_client = get_provider_registry().groq_client(GROQ_API_KEY)
 except ImportError:
     print("❌ ERROR: groq library not installed. Run: pip install groq")
     exit(1)
@@ -63,6 +66,17 @@ AGENTS = {
     }
 }
 
+# Agent names, team calls and the hand-off phrases agents use to pull a teammate in
+# ("ask marc", "jess should"), all matched in one scan
+MENTION_MATCHER = AgentMatcher(
+    dict({info["name"].split()[0].lower(): key for key, info in AGENTS.items()}, rob="robt"),
+    lead_ins=("get", "involve", "ask", "work with", "bring in", "recommend"),
+    follow_ups=("should", "can help"),
+    team_words=("everyone", "all agents", "team", "collaborate", "work together",
+                "call your team", "team members", "all of you", "everybody",
+                "discuss", "brainstorm", "meeting", "huddle"),
+)
+
 # Active WebSocket connections
 active_connections = {}
 
@@ -83,33 +97,18 @@ def detect_target_agents(message: str) -> list:
     Enhanced with multi-agent collaboration support.
     """
     message_lower = message.lower()
-    called_agents = []
+    scan = MENTION_MATCHER.scan(message)
     
     print(f"[ROUTE] 🔍 Analyzing message: '{message}'")
     
-    # Check for collaboration keywords
-    collaboration_keywords = [
-        "everyone", "all agents", "team", "collaborate", "work together",
-        "call your team", "team members", "all of you", "everybody",
-        "discuss", "brainstorm", "meeting", "huddle"
-    ]
-    
-    is_collaboration_request = any(keyword in message_lower for keyword in collaboration_keywords)
-    
-    if is_collaboration_request:
+    if scan.team_call:
         print(f"[COLLAB] 🤝 Collaboration request detected - involving all agents")
         return list(AGENTS.keys())  # Return all agents for collaboration
     
     # Check for direct agent calls
-    for agent_key, agent_info in AGENTS.items():
-        if agent_key in message_lower or agent_info["name"].lower() in message_lower:
-            called_agents.append(agent_key)
-            print(f"[ROUTE] ✅ DIRECT: Found '{agent_key}' → {agent_info['name']}")
-    
-    # Special handling for common variations
-    if "rob" in message_lower and "robt" not in called_agents:
-        called_agents.append("robt")
-        print(f"[ROUTE] ✅ ALIAS: 'rob' → Robt (Security Expert)")
+    called_agents = scan.mentions
+    for agent_key in called_agents:
+        print(f"[ROUTE] ✅ DIRECT: Found '{scan.aliases[agent_key]}' → {AGENTS[agent_key]['name']}")
     
     # If no specific agents called and no collaboration, use intelligent routing
     if not called_agents:
@@ -189,7 +188,7 @@ Instructions:
 - Work collaboratively - build on others' ideas and expertise{collaboration_context}"""
 
         # Generate response using Groq
-        response = groq_client.chat.completions.create(
+        response = await groq_client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -237,31 +236,7 @@ def get_team_context(current_agent: str, collaborating_agents: list = None) -> s
 
 def extract_agent_mentions(response: str, current_agent: str) -> list:
     """Extract mentions of other agents from a response"""
-    mentioned_agents = []
-    response_lower = response.lower()
-    
-    # Look for phrases that suggest involving other agents
-    for agent_key, agent_info in AGENTS.items():
-        if agent_key != current_agent:
-            agent_name = agent_info["name"].lower()
-            first_name = agent_name.split()[0]  # Extract first name
-            
-            # Check for direct mentions or role-based suggestions
-            mention_patterns = [
-                f"get {first_name}",
-                f"involve {first_name}",
-                f"ask {first_name}",
-                f"work with {first_name}",
-                f"bring in {first_name}",
-                f"{first_name} should",
-                f"{first_name} can help",
-                f"recommend {first_name}"
-            ]
-            
-            if any(pattern in response_lower for pattern in mention_patterns):
-                mentioned_agents.append(agent_key)
-    
-    return mentioned_agents
+    return [agent_key for agent_key in MENTION_MATCHER.scan(response).addressed if agent_key != current_agent]
 
 async def send_websocket_message(websocket: WebSocket, message_type: str, data: dict):
     """Send message via WebSocket"""
@@ -282,6 +257,10 @@ async def startup_event():
     print("✅ No LangGraph complexity!")
     print("✅ No caching issues!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_provider_registry().aclose()
+
 @app.get("/")
 async def root():
     return {
@@ -11,14 +11,30 @@ load_dotenv()
 
 from utils.websocket_manager import WebSocketManager
 from utils.session_manager import SessionManager
+from utils.completion_cache import get_completion_cache
+from utils.delivery_bus import create_delivery
+from utils.idempotency import get_idempotency_store
+from utils.ws_dispatch import WebSocketDispatcher, readiness as readiness_response
+from models.groq_models import get_groq_manager, get_provider_registry
 from core.simple_websocket_handler import SimpleWebSocketHandler
 from routes.github_routes import router as github_router
 
 # Initialize managers
-websocket_manager = WebSocketManager()
+# In-process by default; WS_DELIVERY_BUS=redis lets several workers serve the same sessions
+delivery_registry, delivery_bus = create_delivery()
+websocket_manager = WebSocketManager(registry=delivery_registry, bus=delivery_bus)
 session_manager = SessionManager()
+ws_dispatcher = WebSocketDispatcher(websocket_manager)
+idempotency_store = get_idempotency_store()
+warmup_task = None
+
 ws_handler = SimpleWebSocketHandler(websocket_manager, session_manager)
 
+# Share completions and finished idempotent requests across workers through the same Redis the sessions use
+if session_manager.redis_available:
+    get_completion_cache().attach_redis(session_manager.redis_client)
+    idempotency_store.attach_redis(session_manager.redis_client)
+
 app = FastAPI(title="FLUX - Simple Multi-Agent System")
 
 # Add CORS middleware
@@ -38,10 +54,22 @@ async def startup_event():
     print("🚀 FLUX - Simple Multi-Agent System starting up...")
     print("✅ No LangGraph workflow caching issues!")
     print("✅ Direct agent routing enabled!")
+    await websocket_manager.start_delivery()
+
+    # Warms every model concurrently in the background; /ready reports 503 until it finishes.
+    # Keep a reference so the task isn't collected
+    global warmup_task
+    try:
+        warmup_task = asyncio.create_task(get_groq_manager().warm_up_models())
+        print("[STARTUP] Started model warm-up process")
+    except Exception as e:
+        print(f"[STARTUP] Model warm-up failed: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("👋 FLUX - Simple Multi-Agent System shutting down...")
+    await websocket_manager.stop_delivery()
+    await get_provider_registry().aclose()
 
 @app.get("/")
 async def root():
@@ -60,6 +88,16 @@ async def health_check():
         "system": "simple_multi_agent"
     }
 
+@app.get("/ready")
+async def readiness():
+    """Readiness gate for the load balancer: 503 until model warm-up has finished"""
+    return readiness_response()
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for the LLM provider path"""
+    return ws_dispatcher.metrics()
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """
@@ -75,9 +113,13 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         # Accept connection
         await websocket_manager.connect(websocket, session_id)
         
+        # A client reconnecting with ?last_seq=N gets the frames it missed, then the live stream
+        # of any requests that kept running while it was away
+        resume = await ws_dispatcher.resume(websocket, session_id)
+        
         # Send immediate connection confirmation
         await websocket_manager.send_status_update(
-            session_id, "connected", "Connected to Simple Multi-Agent System"
+            session_id, "connected", "Connected to Simple Multi-Agent System", **resume
         )
         
         # Initialize or load session
@@ -104,8 +146,15 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     )
                     continue
                 
-                # Handle message using simple handler (NO LANGGRAPH)
-                await ws_handler.handle_message(session_id, message_data)
+                # Handle message using simple handler (NO LANGGRAPH), run as a tracked task
+                # so a disconnect or superseding request can cancel it
+                def prepare(message):
+                    priority = ws_handler.router.request_class(
+                        str(message.get("request", "")), message.get("requested_agents"), message.get("uploaded_files")
+                    )
+                    return priority, lambda deadline: ws_handler.handle_message(session_id, message, deadline)
+
+                await ws_dispatcher.dispatch(session_id, message_data, prepare)
                 
             except WebSocketDisconnect:
                 print(f"[WS] 👋 Client disconnected: {session_id}")
@@ -126,8 +175,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         print(f"[WS] ❌ Fatal WebSocket error: {e}")
     
     finally:
-        # Clean up connection
-        websocket_manager.disconnect(session_id)
+        # Clean up connection; requests keep running for WS_RESUME_GRACE in case the client reconnects
+        await ws_dispatcher.release(websocket, session_id)
         print(f"[WS] 🧹 Cleaned up connection: {session_id}")
 
 # Session management endpoints
@@ -1,11 +1,413 @@
 # models/groq_models.py
-from groq import Groq
-from typing import Dict, Any, List, Optional
+from groq import AsyncGroq, RateLimitError
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, Callable
+import asyncio
+import importlib.util
+import math
 import os
+import re
 import time
 import json
+from collections import deque
 from functools import lru_cache
 
+import httpx
+
+from utils.completion_cache import get_completion_cache, FlightAborted
+from utils.task_tracker import get_task_tracker
+from utils.deadline import Deadline
+
+# Per-model (requests per minute, tokens per minute). Override with GROQ_RATE_LIMITS,
+# e.g. GROQ_RATE_LIMITS='{"llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000}}'
+DEFAULT_RATE_LIMITS = {
+    "llama-3.1-8b-instant": (30, 6000),
+    "llama-3.3-70b-versatile": (30, 12000),
+    "openai/gpt-oss-120b": (30, 8000),
+    "openai/gpt-oss-20b": (30, 8000),
+    "meta-llama/llama-guard-4-12b": (30, 15000),
+}
+FALLBACK_RATE_LIMIT = (30, 6000)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request would have to wait longer than the scheduler allows for model capacity"""
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough prompt size in tokens (about four characters per token plus per-message overhead)"""
+    return sum(len(str(m.get("content", ""))) // 4 + 4 for m in messages)
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset/retry durations like '2m59.56s', '7.66s', '120ms' or '3' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class TokenBucket:
+    """Continuously refilling bucket; capacity is one minute's allowance"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: float) -> None:
+        """Align with the server's view from x-ratelimit-* headers when it is stricter than ours"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class ModelScheduler:
+    """
+    FIFO admission for one model, gated by request and token buckets.
+
+    Callers queue on a lock so the head of the line sleeps until both buckets
+    can cover it; anyone whose predicted wait exceeds max_wait is rejected
+    straight away with RateLimitTimeout instead of piling up.
+    """
+
+    def __init__(self, model: str, rpm: float, tpm: float, max_wait: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_wait = max_wait
+        self._lock = asyncio.Lock()
+        self._blocked_until = 0.0
+
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    async def acquire(self, estimated_tokens: int, max_wait: float = None) -> float:
+        """Wait for capacity and reserve it; returns seconds spent waiting"""
+        budget = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._lock.acquire(), timeout=max(budget, 0.001))
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitTimeout(f"{self.model} queue did not clear within {budget:.1f}s")
+            try:
+                while True:
+                    wait = max(
+                        self._blocked_until - time.monotonic(),
+                        self.requests.time_until(1),
+                        self.tokens.time_until(estimated_tokens),
+                    )
+                    if wait <= 0:
+                        break
+                    if time.monotonic() - start + wait > budget:
+                        self.rejected += 1
+                        raise RateLimitTimeout(f"{self.model} is rate limited for another {wait:.1f}s")
+                    await asyncio.sleep(wait)
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+            finally:
+                self._lock.release()
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Return the unused part of a reservation once the real size is known"""
+        if actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """Hold the whole queue after a 429"""
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or 1.0))
+
+    def observe_headers(self, headers) -> None:
+        if headers is None:
+            return
+        try:
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                bucket.sync(float(remaining))
+                reset_in = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if float(remaining) <= 0 and reset_in:
+                    # Server window is exhausted - hold the queue until it says it resets
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + reset_in)
+        except (TypeError, ValueError) as e:
+            print(f"[GROQ] Ignoring malformed rate-limit headers for {self.model}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.capacity,
+            "tpm": self.tokens.capacity,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+        }
+
+
+class RequestScheduler:
+    """Holds one ModelScheduler per upstream model, shared by every GroqModelManager"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = None, max_wait: float = None):
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        override = os.getenv("GROQ_RATE_LIMITS")
+        if override:
+            try:
+                for model, cfg in json.loads(override).items():
+                    self.limits[model] = (cfg.get("rpm", FALLBACK_RATE_LIMIT[0]), cfg.get("tpm", FALLBACK_RATE_LIMIT[1]))
+            except (ValueError, AttributeError) as e:
+                print(f"[GROQ] Ignoring invalid GROQ_RATE_LIMITS: {e}")
+        if limits:
+            self.limits.update(limits)
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("GROQ_RATE_LIMIT_MAX_WAIT", 20))
+        self.retries = int(os.getenv("GROQ_RATE_LIMIT_RETRIES", 2))
+        self._models: Dict[str, ModelScheduler] = {}
+
+    def for_model(self, model: str) -> ModelScheduler:
+        scheduler = self._models.get(model)
+        if scheduler is None:
+            rpm, tpm = self.limits.get(model, FALLBACK_RATE_LIMIT)
+            scheduler = ModelScheduler(model, rpm, tpm, self.max_wait)
+            self._models[model] = scheduler
+        return scheduler
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: scheduler.stats() for model, scheduler in self._models.items()}
+
+
+_scheduler_instance = None
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get or create the process-wide request scheduler"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = RequestScheduler()
+    return _scheduler_instance
+
+
+class LatencyTracker:
+    """
+    Time-to-first-token samples per model plus hedging outcomes per role.
+
+    The hedge deadline for a model is its recent p95 TTFT (scaled and clamped);
+    until enough samples exist a fixed default is used.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = float(os.getenv("GROQ_HEDGE_DEFAULT_DELAY", 3.0))
+        self.min_delay = float(os.getenv("GROQ_HEDGE_MIN_DELAY", 0.5))
+        self.max_delay = float(os.getenv("GROQ_HEDGE_MAX_DELAY", 10.0))
+        self.multiplier = float(os.getenv("GROQ_HEDGE_MULTIPLIER", 1.0))
+        self._ttft: Dict[str, deque] = {}
+        self._roles: Dict[str, Dict[str, Any]] = {}
+
+    def record_ttft(self, model: str, seconds: float) -> None:
+        samples = self._ttft.get(model)
+        if samples is None:
+            samples = self._ttft[model] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, model: str, pct: float) -> Optional[float]:
+        samples = self._ttft.get(model)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[max(0, math.ceil(pct * len(ordered)) - 1)]  # Nearest-rank
+
+    def hedge_delay(self, model: str) -> float:
+        samples = self._ttft.get(model)
+        if samples is None or len(samples) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, self.percentile(model, 0.95) * self.multiplier))
+
+    def record_outcome(self, role: str, winner: str, primary: str, hedged: bool, failed_over: bool) -> None:
+        stats = self._roles.setdefault(role, {
+            "requests": 0, "hedged": 0, "failovers": 0, "primary_wins": 0, "fallback_wins": {},
+        })
+        stats["requests"] += 1
+        stats["hedged"] += int(hedged)
+        stats["failovers"] += int(failed_over)
+        if winner == primary:
+            stats["primary_wins"] += 1
+        else:
+            stats["fallback_wins"][winner] = stats["fallback_wins"].get(winner, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for model, samples in self._ttft.items():
+            models[model] = {
+                "samples": len(samples),
+                "ttft_p50": round(self.percentile(model, 0.50), 3),
+                "ttft_p95": round(self.percentile(model, 0.95), 3),
+                "hedge_delay": round(self.hedge_delay(model), 3),
+            }
+        roles = {}
+        for role, stats in self._roles.items():
+            roles[role] = dict(stats, hedge_rate=round(stats["hedged"] / stats["requests"], 4) if stats["requests"] else 0.0)
+        return {"models": models, "roles": roles}
+
+
+_latency_instance = None
+
+def get_latency_tracker() -> LatencyTracker:
+    """Get or create the process-wide latency tracker"""
+    global _latency_instance
+    if _latency_instance is None:
+        _latency_instance = LatencyTracker()
+    return _latency_instance
+
+
+GROQ_BASE_URL = "https://api.groq.com"
+
+# Connection pool tuning for upstream providers. PROVIDER_HTTP2 is "auto" (on when the
+# optional h2 package is installed), "1" or "0".
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", 100))
+PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", 20))
+PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", 60))
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", 60))
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", 5))
+PROVIDER_HTTP2 = os.getenv("PROVIDER_HTTP2", "auto").lower()
+
+# Upper bound on startup warm-up; models still warming after this are reported as failed
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 30))
+
+
+class ProviderRegistry:
+    """
+    Process-wide upstream clients.
+
+    Holds one keep-alive connection pool per base URL and one SDK client per
+    (base URL, API key) on top of it, so every agent, router, workflow and entry
+    point reuses warm TCP/TLS connections instead of opening its own.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive: int = None,
+                 keepalive_expiry: float = None, http2: bool = None):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive or PROVIDER_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry or PROVIDER_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(PROVIDER_TIMEOUT, connect=PROVIDER_CONNECT_TIMEOUT)
+        if http2 is None:
+            http2 = PROVIDER_HTTP2 in ("1", "true", "on") or (
+                PROVIDER_HTTP2 == "auto" and importlib.util.find_spec("h2") is not None
+            )
+        self.http2 = http2
+        self._pools: Dict[str, httpx.AsyncClient] = {}
+        self._clients: Dict[Tuple[str, str], AsyncGroq] = {}
+        self._sync_client: Optional[httpx.Client] = None
+
+    def pool(self, base_url: str = GROQ_BASE_URL) -> httpx.AsyncClient:
+        """Shared async connection pool for an upstream base URL"""
+        base_url = base_url.rstrip("/")
+        pool = self._pools.get(base_url)
+        if pool is None or pool.is_closed:
+            pool = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+            self._pools[base_url] = pool
+            print(f"[PROVIDER] Opened pool for {base_url} (max={self.limits.max_connections}, "
+                  f"keepalive={self.limits.max_keepalive_connections}, http2={self.http2})")
+        return pool
+
+    def groq_client(self, api_key: str = None, base_url: str = None) -> AsyncGroq:
+        """Shared AsyncGroq client on top of the pool for its base URL"""
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        base_url = (base_url or os.getenv("GROQ_BASE_URL") or GROQ_BASE_URL).rstrip("/")
+        key = (base_url, api_key)
+        client = self._clients.get(key)
+        if client is None or client._client.is_closed:
+            client = AsyncGroq(api_key=api_key, base_url=base_url, http_client=self.pool(base_url))
+            self._clients[key] = client
+        return client
+
+    def sync_http_client(self) -> httpx.Client:
+        """Shared blocking pool for libraries that call providers from worker threads (CrewAI/litellm)"""
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._sync_client
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "pools": sorted(url for url, pool in self._pools.items() if not pool.is_closed),
+            "clients": len(self._clients),
+        }
+
+    async def aclose(self) -> None:
+        """Close every pool; called on application shutdown"""
+        for pool in self._pools.values():
+            await pool.aclose()
+        if self._sync_client is not None:
+            self._sync_client.close()
+        self._pools.clear()
+        self._clients.clear()
+        self._sync_client = None
+
+
+_provider_registry = None
+
+def get_provider_registry() -> ProviderRegistry:
+    """Get or create the process-wide provider registry"""
+    global _provider_registry
+    if _provider_registry is None:
+        _provider_registry = ProviderRegistry()
+    return _provider_registry
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    return _parse_duration(headers.get("retry-after")) or _parse_duration(headers.get("x-ratelimit-reset-requests"))
+
+
 class GroqModelManager:
     def __init__(self):
         # Ensure environment variables are loaded
@@ -15,11 +417,22 @@ class GroqModelManager:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
-        self.client = Groq(api_key=api_key)
+        # Shared client and keep-alive pool, reused by every manager in the process
+        self.client = get_provider_registry().groq_client(api_key)
         
-        # Response cache for common queries (simple in-memory cache)
-        self._cache = {}
-        self._cache_ttl = 300  # 5 minutes
+        # Completion cache shared by every manager in the process (LRU + TTL + single-flight)
+        self._cache = get_completion_cache()
+
+        # Per-model token buckets shared by every manager, since several roles map to the same model
+        self._scheduler = get_request_scheduler()
+
+        # TTFT history drives the hedge deadline; outcomes are kept to tune the mappings below
+        self._latency = get_latency_tracker()
+        self.hedging_enabled = os.getenv("GROQ_HEDGING", "1") != "0"
+
+        # Per-model warm-up outcome, reported by /ready
+        self._warmup: Dict[str, Dict[str, Any]] = {}
+        self._warmup_done = asyncio.Event()
 
         # Different models for different SDLC roles - Using 5 unique text generation models (Whisper excluded as it's audio-only)
         self.model_mapping = {
@@ -32,28 +445,48 @@ class GroqModelManager:
             "security_expert": "llama-3.3-70b-versatile"               # Security analysis and recommendations (reusing for expertise)
         }
 
-    def _get_cache_key(self, role: str, messages: List[Dict], temperature: float) -> str:
-        """Generate cache key for request"""
-        # Simple cache key based on role and last user message
-        if messages and len(messages) > 1:
-            user_msg = messages[-1].get('content', '')[:100]  # First 100 chars
-            return f"{role}_{hash(user_msg)}_{temperature}"
-        return None
+        # Models tried after the primary: hedged against it when its first token is late,
+        # or failed over to when it errors before streaming. Override with GROQ_FALLBACK_MODELS.
+        self.fallback_mapping = {
+            "requirements_analyst": ["llama-3.1-8b-instant"],
+            "software_architect": ["llama-3.3-70b-versatile"],
+            "developer": ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+            "qa_tester": ["llama-3.1-8b-instant"],
+            "devops_engineer": ["llama-3.1-8b-instant"],
+            "project_manager": ["llama-3.3-70b-versatile"],
+            "security_expert": ["llama-3.1-8b-instant"]
+        }
+        override = os.getenv("GROQ_FALLBACK_MODELS")
+        if override:
+            try:
+                self.fallback_mapping.update(json.loads(override))
+            except ValueError as e:
+                print(f"[GROQ] Ignoring invalid GROQ_FALLBACK_MODELS: {e}")
 
-    def _is_cache_valid(self, timestamp: float) -> bool:
-        """Check if cached response is still valid"""
-        return time.time() - timestamp < self._cache_ttl
+    def _get_cache_key(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Generate cache key for request from the model and the full prompt"""
+        return self._cache.make_key(model, messages, temperature, max_tokens)
 
-    async def get_completion(self, role: str, messages: list, temperature: float = 0.7, use_cache: bool = False):
-        model = self.model_mapping.get(role, "llama-3.1-8b-instant")
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        return self._scheduler.stats()
+
+    def get_latency_stats(self) -> Dict[str, Any]:
+        return self._latency.stats()
+
+    async def get_completion(self, role: str, messages: list, temperature: float = 0.7, max_tokens: int = 1024, model: str = None):
+        """Open the raw upstream stream; caching, rate limits and hedging live in stream_completion"""
+        model = model or self.model_mapping.get(role, "llama-3.1-8b-instant")
         
         try:
             print(f"[GROQ] Requesting completion for {role} using {model}")
-            completion = self.client.chat.completions.create(
+            completion = await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=1024,  # Reduced from 4096 to avoid token limit errors
+                max_tokens=max_tokens,  # The prompt assembler's output budget, capped by the request deadline
                 stream=True  # Always use streaming for better perceived performance
             )
             
@@ -62,25 +495,278 @@ class GroqModelManager:
             print(f"[GROQ] Error for {role} with {model}: {e}")
             raise
 
-    def warm_up_models(self):
-        """Pre-warm models with simple requests for faster first responses"""
-        print("[WARMUP] Starting model warm-up...")
-        warm_up_messages = [
+    async def stream_completion(self, role: str, messages: list, temperature: float = 0.7, max_tokens: int = 1024, use_cache: bool = False,
+                                deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """Yield content deltas as they arrive without blocking the event loop.
+
+        If the consuming task is cancelled the upstream HTTP stream is closed
+        immediately so the connection and remaining tokens are released.
+
+        With use_cache, a cached completion is yielded as a single delta, and an
+        identical request that is already streaming is awaited instead of being
+        sent upstream a second time. The key names the role's primary model, so
+        a reply a fallback model won is shared with waiters but not cached.
+
+        A request deadline bounds how long the call may queue for rate-limit capacity.
+        """
+        if not use_cache:
+            async for delta in self._stream_upstream(role, messages, temperature, max_tokens, deadline):
+                yield delta
+            return
+
+        model = self.model_mapping.get(role, "llama-3.1-8b-instant")
+        key = self._get_cache_key(model, messages, temperature, max_tokens)
+
+        while True:
+            cached = await self._cache.lookup(key)
+            if cached is not None:
+                print(f"[GROQ] Cache hit for {role} using {model}")
+                yield cached
+                return
+            flight = self._cache.inflight(key)
+            if flight is None:
+                break
+            try:
+                shared = await asyncio.shield(flight)
+            except FlightAborted:
+                continue  # Leader failed or was cancelled - try to lead ourselves
+            print(f"[GROQ] Joined in-flight completion for {role} using {model}")
+            yield shared
+            return
+
+        self._cache.start_flight(key)
+        chunks = []
+        served = []
+        try:
+            async for delta in self._stream_upstream(role, messages, temperature, max_tokens, deadline,
+                                                     on_model=served.append):
+                chunks.append(delta)
+                yield delta
+        except BaseException as e:
+            self._cache.abort_flight(key, e)
+            raise
+        self._cache.finish_flight(key, "".join(chunks), store=served == [model])
+
+    async def _stream_upstream(self, role: str, messages: list, temperature: float, max_tokens: int,
+                               deadline: Optional[Deadline] = None,
+                               on_model: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+        """Stream from the role's model chain; on_model is told which model answers before its first delta"""
+        primary = self.model_mapping.get(role, "llama-3.1-8b-instant")
+        chain = [primary] + [m for m in self.fallback_mapping.get(role, []) if m != primary]
+        if len(chain) == 1 or not self.hedging_enabled:
+            if on_model is not None:
+                on_model(primary)
+            async for delta in self._stream_model(role, primary, messages, temperature, max_tokens, deadline):
+                yield delta
+            return
+
+        async for delta in self._hedged_stream(role, chain, messages, temperature, max_tokens, deadline, on_model):
+            yield delta
+
+    async def _hedged_stream(self, role: str, chain: List[str], messages: list, temperature: float, max_tokens: int,
+                             deadline: Optional[Deadline] = None,
+                             on_model: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+        """Race the fallback model against a primary whose first token is late.
+
+        The primary gets until its p95 time-to-first-token; after that the same
+        prompt is sent to the first fallback and whichever produces a token first
+        streams the reply while the other is cancelled. Errors before the first
+        token fail over down the chain.
+        """
+        primary = chain[0]
+        pending_models = list(chain[1:])
+        contenders: Dict[asyncio.Task, Tuple[str, Any]] = {}
+        hedged = failed_over = False
+        last_error: Optional[BaseException] = None
+
+        def launch(model: str) -> None:
+            stream = self._stream_model(role, model, messages, temperature, max_tokens, deadline)
+            contenders[asyncio.ensure_future(stream.__anext__())] = (model, stream)
+
+        async def discard(task: asyncio.Task, stream) -> None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+            await stream.aclose()
+
+        launch(primary)
+        hedge_at = time.monotonic() + self._latency.hedge_delay(primary)
+        winner = None
+        try:
+            while winner is None:
+                timeout = None
+                if not hedged and pending_models:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(list(contenders), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    model = pending_models.pop(0)
+                    print(f"[GROQ] Hedging {role}: no first token from {primary} yet, also trying {model}")
+                    launch(model)
+                    continue
+
+                for task in done:
+                    model, stream = contenders.pop(task)
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = (task, model, stream)
+                        break
+                    last_error = error
+                    print(f"[GROQ] {model} failed before first token for {role}: {error}")
+
+                if winner is None and not contenders:
+                    if not pending_models:
+                        raise last_error
+                    failed_over = True
+                    launch(pending_models.pop(0))
+        except BaseException:
+            for task, (_, stream) in list(contenders.items()):
+                await discard(task, stream)
+            raise
+
+        for task, (_, stream) in list(contenders.items()):
+            await discard(task, stream)
+
+        task, model, stream = winner
+        self._latency.record_outcome(role, model, primary, hedged, failed_over)
+        if model != primary:
+            print(f"[GROQ] {model} won the race for {role} over {primary}")
+        if on_model is not None:
+            on_model(model)
+
+        try:
+            if task.exception() is None:
+                yield task.result()
+                async for delta in stream:
+                    yield delta
+        finally:
+            await stream.aclose()
+
+    async def _stream_model(self, role: str, model: str, messages: list, temperature: float, max_tokens: int,
+                            deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        scheduler = self._scheduler.for_model(model)
+        reserved = estimate_tokens(messages) + max_tokens
+
+        attempt = 0
+        while True:
+            # Never queue for capacity past the request deadline
+            max_wait = None
+            if deadline is not None:
+                max_wait = min(self._scheduler.max_wait, deadline.remaining())
+            waited = await scheduler.acquire(reserved, max_wait=max_wait)
+            if waited > 0.05:
+                print(f"[GROQ] {role} waited {waited:.2f}s for {model} capacity")
+            try:
+                started = time.monotonic()
+                completion = await self.get_completion(role, messages, temperature, max_tokens=max_tokens, model=model)
+                break
+            except RateLimitError as e:
+                scheduler.settle(reserved, 0)
+                scheduler.penalize(_retry_after(e))
+                attempt += 1
+                if attempt > self._scheduler.retries:
+                    raise
+                print(f"[GROQ] 429 from {model}, requeueing {role} (attempt {attempt})")
+            except BaseException:
+                # Timeouts, 5xx, connection errors and hedge cancellations never start a stream
+                scheduler.settle(reserved, 0)
+                raise
+
+        response = getattr(completion, "response", None)
+        scheduler.observe_headers(response.headers if response is not None else None)
+        generated = 0
+        aborted = False
+        try:
+            async for chunk in completion:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta
+                    if delta is not None and delta.content:
+                        if not generated:
+                            self._latency.record_ttft(model, time.monotonic() - started)
+                        generated += len(delta.content)
+                        yield delta.content
+        except (asyncio.CancelledError, GeneratorExit):
+            aborted = True
+            raise
+        finally:
+            if not generated:
+                # Cancelled or empty before the first token: the wait so far is a lower bound on TTFT
+                self._latency.record_ttft(model, time.monotonic() - started)
+            scheduler.settle(reserved, reserved - max_tokens + generated // 4)
+            if aborted:
+                get_task_tracker().record_aborted_stream(reserved - max_tokens, generated // 4)
+            await completion.close()
+
+    async def warm_up_models(self, timeout: float = None) -> Dict[str, Any]:
+        """Warm every distinct model concurrently and record cold/warm latency for /ready"""
+        timeout = WARMUP_TIMEOUT if timeout is None else timeout
+        models = sorted(set(self.model_mapping.values()))
+        for model in models:
+            self._warmup.setdefault(model, {"state": "pending", "cold_ms": None, "warm_ms": None, "error": None})
+        print(f"[WARMUP] Warming {len(models)} models concurrently...")
+        started = time.monotonic()
+        try:
+            # The cold calls run in parallel, so each opens its own keep-alive connection in the shared pool
+            await asyncio.wait_for(asyncio.gather(*(self._warm_up_model(m) for m in models)), timeout=timeout)
+        except asyncio.TimeoutError:
+            for model in models:
+                if self._warmup[model]["state"] in ("pending", "warming"):
+                    self._warmup[model].update(state="failed", error=f"timed out after {timeout:.0f}s")
+        self._warmup_done.set()
+        status = self.warmup_status()
+        print(f"[WARMUP] Finished in {time.monotonic() - started:.2f}s: {status['status']}")
+        return status
+
+    async def _warm_up_model(self, model: str) -> None:
+        state = self._warmup[model]
+        state["state"] = "warming"
+        messages = [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": "Hello"}
         ]
-        
-        for role in ["requirements_analyst", "software_architect", "developer"]:
-            try:
-                # Fire and forget warm-up requests
-                model = self.model_mapping.get(role, "llama-3.1-8b-instant")
-                self.client.chat.completions.create(
+        try:
+            # First call pays for DNS, TLS and the model's cold path; the second shows the warm latency
+            for phase in ("cold_ms", "warm_ms"):
+                await self._scheduler.for_model(model).acquire(estimate_tokens(messages) + 1)
+                call_started = time.monotonic()
+                await self.client.chat.completions.create(
                     model=model,
-                    messages=warm_up_messages,
+                    messages=messages,
                     temperature=0.1,
-                    max_tokens=10,
+                    max_tokens=1,
                     stream=False
                 )
-                print(f"[WARMUP] Warmed up {role}")
-            except Exception as e:
-                print(f"[WARMUP] Failed to warm up {role}: {e}")
\ No newline at end of file
+                state[phase] = round((time.monotonic() - call_started) * 1000, 1)
+            state["state"] = "ready"
+            print(f"[WARMUP] Warmed up {model} (cold {state['cold_ms']}ms, warm {state['warm_ms']}ms)")
+        except Exception as e:
+            state.update(state="failed", error=str(e))
+            print(f"[WARMUP] Failed to warm up {model}: {e}")
+
+    def is_ready(self) -> bool:
+        """Warm-up has finished; models that failed to warm are reported but don't hold the instance back"""
+        return self._warmup_done.is_set()
+
+    def warmup_status(self) -> Dict[str, Any]:
+        models = {model: dict(self._warmup.get(model, {"state": "pending", "cold_ms": None, "warm_ms": None, "error": None}))
+                  for model in sorted(set(self.model_mapping.values()))}
+        if not self.is_ready():
+            status = "warming"
+        elif all(m["state"] == "ready" for m in models.values()):
+            status = "ready"
+        else:
+            status = "degraded"
+        return {"ready": self.is_ready(), "status": status, "models": models}
+
+
+_manager_instance = None
+
+def get_groq_manager() -> GroqModelManager:
+    """Get or create the process-wide model manager shared by every agent and entry point"""
+    global _manager_instance
+    if _manager_instance is None:
+        _manager_instance = GroqModelManager()
+    return _manager_instance
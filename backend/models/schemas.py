@@ -29,6 +29,9 @@ class UserRequest(BaseModel):
     requested_agents: List[str] = []
     history: List[AgentMessage] = []
     uploaded_files: List[UploadedFile] = []
+    supersede: bool = False  # Cancel this session's running requests before starting
+    request_id: Optional[str] = None  # Echoed on every frame for this request; assigned by the server if missing
+    idempotency_key: Optional[str] = None  # Retries with the same key replay the first run instead of repeating it
 
 class SDLCState(BaseModel):
     user_request: str
@@ -3,6 +3,13 @@ import asyncio
 import websockets
 import json
 import time
+import urllib.request
+
+from utils.wire_protocol import get_codec
+
+# Subprotocols to compare; None is a legacy client that offers none (JSON text frames)
+PROTOCOLS = [None, "flux.json.deflate", "flux.msgpack"]
+SERVER = "localhost:8000"
 
 async def performance_test():
     """Test WebSocket response times with different message types"""
@@ -30,34 +37,53 @@ async def performance_test():
     
     results = []
     
-    for test in test_messages:
-        print(f"\\n🧪 Testing: {test['name']}")
+    for protocol, test in [(p, t) for p in PROTOCOLS for t in test_messages]:
+        print(f"\\n🧪 Testing: {test['name']} over {protocol or 'legacy json'}")
+        codec = get_codec(protocol)
         
         try:
             start_time = time.time()
+            wire_bytes = 0
+            frames = 0
             
-            async with websockets.connect('ws://localhost:8000/ws/perf_test_session') as websocket:
+            async with websockets.connect(f'ws://{SERVER}/ws/perf_test_session',
+                                          subprotocols=[protocol] if protocol else None) as websocket:
                 # Send test message
                 await websocket.send(json.dumps(test['payload']))
                 print(f"📤 Sent request at {time.time() - start_time:.2f}s")
                 
                 first_response_time = None
                 response_count = 0
+                streams = {}  # message_id -> agent name
+                agent_ttft = {}  # agent -> seconds from request to first streamed token
                 
                 # Collect responses
                 while True:
                     try:
                         response = await asyncio.wait_for(websocket.recv(), timeout=30.0)
-                        data = json.loads(response)
+                        frames += 1
+                        wire_bytes += len(response) if isinstance(response, bytes) else len(response.encode())
+                        data = codec.decode(response)
                         
                         if first_response_time is None:
                             first_response_time = time.time() - start_time
                             print(f"⚡ First response at {first_response_time:.2f}s")
                         
-                        if data.get('type') == 'agent_response':
+                        if data.get('type') == 'agent_response_start':
+                            streams[data.get('message_id')] = data.get('agent', 'unknown')
+                        
+                        elif data.get('type') == 'agent_response_delta':
+                            agent = streams.get(data.get('message_id'), data.get('agent', 'unknown'))
+                            if agent not in agent_ttft:
+                                agent_ttft[agent] = time.time() - start_time
+                                print(f"💬 {agent} first token at {agent_ttft[agent]:.2f}s")
+                        
+                        elif data.get('type') in ('agent_response', 'agent_response_end'):
                             response_count += 1
                             agent = data.get('agent', 'unknown')
                             elapsed = time.time() - start_time
+                            # Unstreamed replies: the whole message is the first token
+                            agent_ttft.setdefault(agent, elapsed)
                             print(f"🤖 {agent} responded at {elapsed:.2f}s")
                         
                         elif data.get('type') == 'status_update':
@@ -68,9 +94,13 @@ async def performance_test():
                                 
                                 results.append({
                                     'test': test['name'],
+                                    'protocol': protocol or 'legacy json',
+                                    'frames': frames,
+                                    'wire_bytes': wire_bytes,
                                     'first_response': first_response_time,
                                     'total_time': total_time,
-                                    'response_count': response_count
+                                    'response_count': response_count,
+                                    'agent_ttft': agent_ttft
                                 })
                                 break
                             else:
@@ -90,11 +120,26 @@ async def performance_test():
     print("🏆 PERFORMANCE TEST RESULTS")
     print("="*60)
     for result in results:
-        print(f"Test: {result['test']}")
+        print(f"Test: {result['test']} ({result['protocol']})")
+        print(f"  Bytes on the wire: {result['wire_bytes']} in {result['frames']} frames "
+              f"({result['wire_bytes'] / max(result['frames'], 1):.0f} per frame)")
         print(f"  First Response: {result['first_response']:.2f}s")
         print(f"  Total Time: {result['total_time']:.2f}s") 
         print(f"  Responses: {result['response_count']}")
+        for agent, ttft in sorted(result['agent_ttft'].items(), key=lambda item: item[1]):
+            print(f"  Time to first token - {agent}: {ttft:.2f}s")
         print()
 
+    # Server-side encode cost per frame, per protocol (cumulative since the server started)
+    try:
+        with urllib.request.urlopen(f"http://{SERVER}/metrics", timeout=5) as response:
+            protocols = json.loads(response.read())["websocket"]["protocols"]
+        print("Server CPU per message:")
+        for name, counters in protocols.items():
+            print(f"  {name}: {counters['encode_us_per_frame']}µs to encode, "
+                  f"{counters['bytes_per_frame']} bytes per frame over {counters['frames']} frames")
+    except Exception as e:
+        print(f"❌ Could not read server metrics: {e}")
+
 if __name__ == "__main__":
     asyncio.run(performance_test())
\ No newline at end of file
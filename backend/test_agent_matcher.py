@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass agent mention matcher and the routers built on it
+"""
+
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from core.agent_matcher import AgentMatcher
+from core.simple_agent_router import SimpleAgentRouter
+from workflows.sdlc_workflow import AGENT_MATCHER
+
+
+def test_greeting_wins_over_earlier_mentions():
+    scan = AGENT_MATCHER.scan("About the security review - hi Marc, can you and Alex look?")
+    assert scan.greeted == "software_architect"
+    assert scan.mentions == ["software_architect", "developer"]
+    assert scan.role_mentions == ["security_expert"]
+    assert scan.first == "software_architect"
+
+
+def test_names_only_match_whole_words():
+    scan = AGENT_MATCHER.scan("There is a problem with the install, recall the alexandrite build")
+    assert scan.mentions == [] and not scan.team_call
+    assert AGENT_MATCHER.scan("@alex can you take this?").mentions == ["developer"]
+    assert AGENT_MATCHER.scan("ping Sarah   Chen").aliases["requirements_analyst"] == "sarah   chen"
+
+
+def test_team_calls_and_team_greetings():
+    assert AGENT_MATCHER.scan("Hello everyone!").team_greeting
+    assert AGENT_MATCHER.scan("hi all").team_call
+    assert not AGENT_MATCHER.scan("all requirements are listed").team_call
+    scan = AGENT_MATCHER.scan("Can the team review this?")
+    assert scan.team_call and not scan.team_greeting
+
+
+def test_dismissals_are_scoped_to_their_sentence():
+    scan = AGENT_MATCHER.scan("Thanks Marc, that helps. Alex, please continue.")
+    assert scan.dismissed == ["software_architect"]
+    assert scan.mentions == ["software_architect", "developer"]
+
+
+def test_hand_overs_and_exclusive_requests():
+    scan = AGENT_MATCHER.scan("I would like to talk to the architect about caching")
+    assert scan.addressed == ["software_architect"] and scan.exclusive
+    scan = AGENT_MATCHER.scan("bring in Jess and Dave")
+    assert scan.addressed == ["qa_tester"] and not scan.exclusive
+
+    matcher = AgentMatcher({"jess": "jess", "marc": "marc"}, lead_ins=("ask",), follow_ups=("should",))
+    assert matcher.scan("Let's ask Marc first; Jess should verify it").addressed == ["marc", "jess"]
+
+
+def test_router_detection_uses_one_scan():
+    router = SimpleAgentRouter()
+    assert router.detect_called_agent("Hey Ronaldo, ask Messi too") == "ronaldo"
+    assert router.detect_called_agent("What do you think, Mbappé?") == "mbappe"
+    assert router.detect_called_agent("plan the billing service") is None
+    assert router.detect_team_call("Hey everyone")
+    assert not router.detect_team_call("steam engine")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_greeting_wins_over_earlier_mentions,
+        test_names_only_match_whole_words,
+        test_team_calls_and_team_greetings,
+        test_dismissals_are_scoped_to_their_sentence,
+        test_hand_overs_and_exclusive_requests,
+        test_router_detection_uses_one_scan,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All agent matcher tests passed")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Tests for the global, per-session and per-role bulkheads around agent calls
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import utils.bulkhead as bulkhead_module
+from utils.bulkhead import Bulkhead, BulkheadFull, request_priority
+from core.simple_agent_router import SimpleAgentRouter
+from core.simple_websocket_handler import SimpleWebSocketHandler
+from utils.session_manager import SessionManager
+from workflows.sdlc_workflow import SDLCWorkflow
+from test_streaming import TokenManager, make_manager
+
+
+async def hold(bulkhead: Bulkhead, role: str, session_id: str, release: asyncio.Event, log: list, **kwargs):
+    async with bulkhead.slot(role, session_id, **kwargs):
+        log.append(f"{session_id}:{role}")
+        await release.wait()
+
+
+def test_per_session_cap_does_not_block_other_sessions():
+    async def run():
+        bulkhead = Bulkhead(max_concurrent=10, per_session=2, per_role=10)
+        release, log = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(bulkhead, role, "greedy", release, log)) for role in ("a", "b", "c")]
+        await asyncio.sleep(0.01)
+        assert log == ["greedy:a", "greedy:b"] and bulkhead.stats()["waiting"] == 1
+
+        # Another session walks straight past the greedy session's queued call
+        other = asyncio.create_task(hold(bulkhead, "c", "polite", release, log))
+        await asyncio.sleep(0.01)
+        assert log[-1] == "polite:c"
+
+        release.set()
+        await asyncio.gather(*tasks, other)
+        assert log[-1] == "greedy:c"
+        stats = bulkhead.stats()
+        assert stats["active"] == 0 and stats["queued"] == 1 and stats["admitted"] == 4
+
+    asyncio.run(run())
+
+
+def test_per_role_cap():
+    async def run():
+        bulkhead = Bulkhead(max_concurrent=10, per_session=10, per_role=1)
+        release, log = asyncio.Event(), []
+        first = asyncio.create_task(hold(bulkhead, "developer", "s1", release, log))
+        second = asyncio.create_task(hold(bulkhead, "developer", "s2", release, log))
+        third = asyncio.create_task(hold(bulkhead, "qa_tester", "s3", release, log))
+        await asyncio.sleep(0.01)
+        assert log == ["s1:developer", "s3:qa_tester"]
+        release.set()
+        await asyncio.gather(first, second, third)
+        assert log[-1] == "s2:developer"
+
+    asyncio.run(run())
+
+
+def test_queue_positions_are_reported_as_calls_move_up():
+    async def run():
+        bulkhead = Bulkhead(max_concurrent=1, per_session=10, per_role=10)
+        release, log, positions = asyncio.Event(), [], []
+
+        def reporter(name):
+            async def on_queued(position):
+                positions.append((name, position))
+            return on_queued
+
+        running = asyncio.create_task(hold(bulkhead, "a", "s1", asyncio.Event(), log))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(hold(bulkhead, "a", f"s{i}", release, log, on_queued=reporter(f"s{i}")))
+                   for i in (2, 3)]
+        await asyncio.sleep(0.01)
+        assert positions == [("s2", 1), ("s3", 2)]
+
+        running.cancel()
+        await asyncio.sleep(0.01)
+        assert log == ["s1:a", "s2:a"]
+        await asyncio.sleep(bulkhead_module.BULKHEAD_STATUS_INTERVAL + 0.1)
+        assert positions[-1] == ("s3", 1)  # Moved up once s2 got the slot
+        release.set()
+        await asyncio.gather(*waiting)
+        assert log == ["s1:a", "s2:a", "s3:a"]
+
+    asyncio.run(run())
+
+
+def test_full_queue_and_timeouts_fail_fast():
+    async def run():
+        bulkhead = Bulkhead(max_concurrent=1, per_session=10, per_role=10, max_queue=1)
+        release, log = asyncio.Event(), []
+        running = asyncio.create_task(hold(bulkhead, "a", "s1", release, log))
+        await asyncio.sleep(0.01)
+
+        try:
+            await bulkhead.acquire("a", "s2", timeout=0.05)
+            assert False, "should time out"
+        except BulkheadFull:
+            pass
+
+        queued = asyncio.create_task(hold(bulkhead, "a", "s3", release, log))
+        await asyncio.sleep(0.01)
+        try:
+            await bulkhead.acquire("a", "s4")
+            assert False, "queue is full"
+        except BulkheadFull:
+            pass
+
+        # A cancelled waiter leaves the queue without leaking a slot
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        await running
+        stats = bulkhead.stats()
+        assert stats["rejected"] == 1 and stats["timed_out"] == 1
+        assert stats["active"] == 0 and stats["waiting"] == 0
+
+    asyncio.run(run())
+
+
+def test_direct_calls_jump_team_work_and_sessions_take_turns():
+    async def run():
+        bulkhead = Bulkhead(max_concurrent=1, per_session=10, per_role=10)
+        gate, log = asyncio.Event(), []
+        running = asyncio.create_task(hold(bulkhead, "a", "s0", gate, log))
+        await asyncio.sleep(0.01)
+
+        done = asyncio.Event()
+        done.set()
+        waiting = [asyncio.create_task(hold(bulkhead, f"t{i}", "busy", done, log, priority="team")) for i in range(3)]
+        waiting.append(asyncio.create_task(hold(bulkhead, "t0", "other", done, log, priority="team")))
+        await asyncio.sleep(0.01)
+        waiting.append(asyncio.create_task(hold(bulkhead, "d", "direct", done, log, priority="direct")))
+        await asyncio.sleep(0.01)
+
+        gate.set()
+        await asyncio.gather(running, *waiting)
+        # The direct call goes first, then the busy session's team calls take turns with the other session's
+        assert log == ["s0:a", "direct:d", "busy:t0", "other:t0", "busy:t1", "busy:t2"]
+
+    asyncio.run(run())
+
+
+def test_request_priority_classes():
+    assert request_priority("direct") == "direct"
+    assert request_priority("default") == "smart"
+    assert request_priority("team") == "team"
+    assert request_priority("collaboration", [{"name": "spec.pdf"}]) == "document"
+
+
+def test_agents_queue_and_report_position_through_context():
+    async def run():
+        previous = bulkhead_module._bulkhead_instance
+        bulkhead_module._bulkhead_instance = Bulkhead(max_concurrent=2, per_session=10, per_role=10)
+        try:
+            router = SimpleAgentRouter()
+            for agent in router.agents.values():
+                agent._groq_manager = TokenManager(["ok"] * 5)
+            queued = []
+
+            async def on_queued(role, position):
+                queued.append((role, position))
+
+            responses = await router.route_message("Hey everyone, quick check", {"on_queued": on_queued})
+            assert len(responses) == 7 and all(r == "ok ok ok ok ok" for r in responses.values())
+            assert sorted(position for _, position in queued)[:5] == [1, 2, 3, 4, 5]
+            assert bulkhead_module._bulkhead_instance.stats()["peak_waiting"] == 5
+
+            # No room to queue: those agents never run and give no reply, without failing the team
+            bulkhead_module._bulkhead_instance = Bulkhead(max_concurrent=1, per_session=10, per_role=10, max_queue=0)
+            results = [r async for r in router.iter_responses("Hello team", {})]
+            busy = [r for r in results if r.busy]
+            assert len(busy) == 6 and all(r.response is None for r in busy)
+            assert busy[0].error.busy_frame()["type"] == "busy" and busy[0].error.retry_after >= 1
+            responses = await router.route_message("Hello team", {})
+            assert list(responses.values()) == ["ok ok ok ok ok"]
+        finally:
+            bulkhead_module._bulkhead_instance = previous
+
+    asyncio.run(run())
+
+
+def test_busy_agents_get_a_busy_frame_and_stay_out_of_history():
+    async def run():
+        previous = bulkhead_module._bulkhead_instance
+        bulkhead_module._bulkhead_instance = Bulkhead(max_concurrent=1, per_session=10, per_role=10, max_queue=0)
+        try:
+            manager, socket = make_manager()
+            sessions = SessionManager()
+            sessions.create_session("s1")
+            handler = SimpleWebSocketHandler(manager, sessions)
+            for agent in handler.router.agents.values():
+                agent._groq_manager = TokenManager(["ok"])
+            await handler.handle_message("s1", {"request": "Hello team, thoughts?"})
+
+            busy = [f for f in socket.frames if f["type"] == "busy"]
+            replies = [f for f in socket.frames if f["type"] == "agent_response_end"]
+            assert len(busy) == 6 and len(replies) == 1
+            assert [m["message"] for m in sessions.get_session("s1")["conversation_history"]] == ["ok"]
+
+            # A workflow team run hands busy collaborators to on_agent_busy and keeps them out of agent_outputs
+            workflow = SDLCWorkflow()
+            for agent in workflow.agents.values():
+                agent._groq_manager = TokenManager(["ok"])
+            reported = []
+
+            async def on_agent_busy(agent, error):
+                reported.append(error.busy_frame(agent)["agent"])
+
+            state = {"user_request": "Review this together", "requested_agents": ["developer", "qa_tester"],
+                     "agent_outputs": {}, "project_context": {}, "uploaded_files": [], "on_agent_busy": on_agent_busy}
+            state.update(workflow._route_entry_point(state))
+            state = await workflow._multi_agent_collaboration(state)
+            assert len(state["agent_outputs"]) == 1 and len(reported) == 1
+            assert set(state["agent_outputs"]) | set(reported) == {"developer", "qa_tester"}
+        finally:
+            bulkhead_module._bulkhead_instance = previous
+
+    asyncio.run(run())
+
+
+def test_workflow_nodes_use_the_class_decided_at_entry():
+    async def run():
+        workflow = SDLCWorkflow()
+        priorities = {}
+        for role, agent in workflow.agents.items():
+            async def process_request(request, context, role=role):
+                priorities[role] = context["priority"]
+                return "ok"
+            agent.process_request = process_request
+
+        state = {"user_request": "Hi Sara, design the billing system", "requested_agents": [], "agent_outputs": {},
+                 "project_context": {}, "uploaded_files": []}
+        state.update(workflow._route_entry_point(state))
+        await workflow._analyze_requirements(state)
+        assert priorities["requirements_analyst"] == "direct"
+
+        # A node reached by content routing takes the entry class, not the direct weight
+        await workflow._design_architecture({**state, "called_agent": None, "request_class": "smart"})
+        assert priorities["software_architect"] == "smart"
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_per_session_cap_does_not_block_other_sessions,
+        test_per_role_cap,
+        test_queue_positions_are_reported_as_calls_move_up,
+        test_full_queue_and_timeouts_fail_fast,
+        test_direct_calls_jump_team_work_and_sessions_take_turns,
+        test_request_priority_classes,
+        test_agents_queue_and_report_position_through_context,
+        test_busy_agents_get_a_busy_frame_and_stay_out_of_history,
+        test_workflow_nodes_use_the_class_decided_at_entry,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All bulkhead tests passed")
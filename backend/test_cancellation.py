@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for per-session request cancellation on disconnect and supersede
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.completion_cache import CompletionCache
+from utils.task_tracker import get_task_tracker
+from core.simple_agent_router import SimpleAgentRouter
+from test_completion_cache import CountingCompletions, make_manager
+
+LONG_REPLY = " ".join(["token"] * 200)
+
+
+def make_router():
+    manager = make_manager(CompletionCache(max_entries=10, max_bytes=100_000, ttl=60))
+    manager.client.chat.completions = CountingCompletions(LONG_REPLY)
+    router = SimpleAgentRouter()
+    for agent in router.agents.values():
+        agent._groq_manager = manager
+    return router
+
+
+def test_disconnect_cancels_team_fan_out_and_counts_waste():
+    async def run():
+        tracker = get_task_tracker()
+        before = tracker.stats()
+        router = make_router()
+        task = tracker.spawn("sess-disconnect", router.route_message("Hey everyone, plan the billing service", {}))
+        await asyncio.sleep(0.2)
+        assert tracker.active("sess-disconnect") == 1
+
+        cancelled = await tracker.cancel("sess-disconnect", "disconnect")
+        assert cancelled == 1 and task.cancelled()
+        assert tracker.active("sess-disconnect") == 0
+
+        after = tracker.stats()
+        assert after["cancelled"].get("disconnect", 0) == before["cancelled"].get("disconnect", 0) + 1
+        assert after["aborted_streams"] - before["aborted_streams"] == len(router.agents)
+        assert after["wasted_prompt_tokens"] > before["wasted_prompt_tokens"]
+        assert after["wasted_completion_tokens"] > before["wasted_completion_tokens"]
+
+    asyncio.run(run())
+
+
+def test_requests_run_in_order_until_superseded():
+    async def run():
+        tracker = get_task_tracker()
+        order = []
+
+        async def request(name, seconds):
+            order.append(f"{name} start")
+            await asyncio.sleep(seconds)
+            order.append(f"{name} end")
+
+        first = tracker.spawn("sess-order", request("first", 0.05))
+        second = tracker.spawn("sess-order", request("second", 0.01), after=first)
+        await second
+        assert order == ["first start", "first end", "second start", "second end"]
+
+        order.clear()
+        slow = tracker.spawn("sess-order", request("slow", 5))
+        queued = tracker.spawn("sess-order", request("queued", 0.01), after=slow)
+        await asyncio.sleep(0.01)
+        assert await tracker.cancel("sess-order", "supersede") == 2
+        assert slow.cancelled() and queued.cancelled()
+        assert order == ["slow start"]  # The queued request never started
+
+    asyncio.run(run())
+
+
+def test_unrelated_cancellation_is_not_counted_as_waste():
+    async def run():
+        tracker = get_task_tracker()
+        before = tracker.stats()["aborted_streams"]
+        router = make_router()
+        # A plain task (e.g. a losing hedge) torn down outside a session cancel
+        task = asyncio.create_task(router.agents["messi"].process_request("requirements please", {}))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert tracker.stats()["aborted_streams"] == before
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_disconnect_cancels_team_fan_out_and_counts_waste,
+        test_requests_run_in_order_until_superseded,
+        test_unrelated_cancellation_is_not_counted_as_waste,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All cancellation tests passed")
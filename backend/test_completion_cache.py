@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the completion cache: LRU/TTL/byte eviction and single-flight coalescing
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.completion_cache import CompletionCache
+from models.groq_models import GroqModelManager
+
+MESSAGES = [
+    {"role": "system", "content": "You are Messi."},
+    {"role": "user", "content": "Request: list the requirements for a todo app"},
+]
+
+
+class CountingCompletions:
+    """Fake chat.completions endpoint that streams a fixed reply slowly"""
+
+    def __init__(self, reply: str = "Here are the requirements"):
+        self.calls = 0
+        self.reply = reply
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return FakeStream(self.reply.split(" "))
+
+
+class FakeStream:
+    def __init__(self, words):
+        self.words = words
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, word in enumerate(self.words):
+            await asyncio.sleep(0.02)
+            content = word if i == 0 else " " + word
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    async def close(self):
+        pass
+
+
+def make_manager(cache: CompletionCache):
+    manager = GroqModelManager()
+    manager._cache = cache
+    manager.client = SimpleNamespace(chat=SimpleNamespace(completions=CountingCompletions()))
+    return manager
+
+
+async def collect(manager, **kwargs) -> str:
+    parts = []
+    async for delta in manager.stream_completion("requirements_analyst", MESSAGES, **kwargs):
+        parts.append(delta)
+    return "".join(parts)
+
+
+def test_key_covers_full_prompt():
+    a = CompletionCache.make_key("m", [{"role": "user", "content": "x" * 100 + "a"}], 0.7, 1024)
+    b = CompletionCache.make_key("m", [{"role": "user", "content": "x" * 100 + "b"}], 0.7, 1024)
+    assert a != b
+    assert a != CompletionCache.make_key("m", [{"role": "user", "content": "x" * 100 + "a"}], 0.7, 512)
+    assert a != CompletionCache.make_key("other", [{"role": "user", "content": "x" * 100 + "a"}], 0.7, 1024)
+
+
+def test_lru_and_byte_eviction():
+    cache = CompletionCache(max_entries=2, max_bytes=10_000, ttl=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # a is now most recent
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+    small = CompletionCache(max_entries=100, max_bytes=40, ttl=60)
+    small.put("k1", "x" * 20)
+    small.put("k2", "y" * 20)
+    assert small.get("k1") is None and small.get("k2") == "y" * 20
+    small.put("huge", "z" * 100)  # larger than the whole budget - never stored
+    assert small.get("huge") is None and small.get("k2") == "y" * 20
+    assert small.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = CompletionCache(max_entries=10, max_bytes=10_000, ttl=0.05)
+    cache.put("a", "1")
+    assert cache.get("a") == "1"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_repeat_request_served_from_cache():
+    async def run():
+        cache = CompletionCache(max_entries=10, max_bytes=10_000, ttl=60)
+        manager = make_manager(cache)
+        first = await collect(manager, use_cache=True)
+        second = await collect(manager, use_cache=True)
+        assert first == second == "Here are the requirements"
+        assert manager.client.chat.completions.calls == 1
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_identical_requests_share_one_upstream_call():
+    async def run():
+        cache = CompletionCache(max_entries=10, max_bytes=10_000, ttl=60)
+        manager = make_manager(cache)
+        results = await asyncio.gather(*[collect(manager, use_cache=True) for _ in range(5)])
+        assert set(results) == {"Here are the requirements"}
+        assert manager.client.chat.completions.calls == 1
+        assert cache.stats()["coalesced"] == 4
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_hands_over_to_waiter():
+    async def run():
+        cache = CompletionCache(max_entries=10, max_bytes=10_000, ttl=60)
+        manager = make_manager(cache)
+        leader = asyncio.create_task(collect(manager, use_cache=True))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(collect(manager, use_cache=True))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "Here are the requirements"
+        assert manager.client.chat.completions.calls == 2
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_key_covers_full_prompt,
+        test_lru_and_byte_eviction,
+        test_ttl_expiry,
+        test_repeat_request_served_from_cache,
+        test_concurrent_identical_requests_share_one_upstream_call,
+        test_cancelled_leader_hands_over_to_waiter,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All completion cache tests passed")
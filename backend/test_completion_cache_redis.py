@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared Redis completion tier across workers.
+
+Uses fakeredis when installed, otherwise a local Redis on REDIS_HOST/REDIS_PORT.
+Each "worker" gets its own in-process CompletionCache and GroqModelManager, as
+separate uvicorn processes would, and they only share the Redis server.
+"""
+
+import asyncio
+import os
+
+import redis
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.completion_cache import CompletionCache, RedisCompletionCache
+from test_completion_cache import MESSAGES, collect, make_manager
+
+
+def redis_client_factory():
+    """Return a callable that opens clients onto one shared Redis server"""
+    try:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        return lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+    except ImportError:
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            decode_responses=True,
+            socket_connect_timeout=1,
+        )
+        client.ping()
+        client.flushdb()
+        return lambda: redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            decode_responses=True,
+        )
+
+
+def make_worker(new_client):
+    cache = CompletionCache(max_entries=10, max_bytes=100_000, ttl=60)
+    cache.attach_redis(new_client(), ttl=60)
+    return make_manager(cache), cache
+
+
+async def wait_for_shared_store(cache: CompletionCache):
+    for _ in range(100):
+        if cache.shared.stores:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("completion was never written to Redis")
+
+
+class BrokenRedis:
+    def get(self, key):
+        raise redis.ConnectionError("connection refused")
+
+    def setex(self, key, ttl, value):
+        raise redis.ConnectionError("connection refused")
+
+
+def test_payload_round_trip_is_compressed():
+    text = "The system shall allow users to create tasks. " * 50
+    payload = RedisCompletionCache.encode(text)
+    assert len(payload) < len(text) / 4
+    assert RedisCompletionCache.decode(payload) == text
+
+
+def test_cross_worker_hit_and_promotion():
+    async def run():
+        new_client = redis_client_factory()
+        worker_a, cache_a = make_worker(new_client)
+        worker_b, cache_b = make_worker(new_client)
+
+        first = await collect(worker_a, use_cache=True)
+        await wait_for_shared_store(cache_a)
+
+        second = await collect(worker_b, use_cache=True)
+        assert first == second
+        assert worker_a.client.chat.completions.calls == 1
+        assert worker_b.client.chat.completions.calls == 0, "worker B should be served from Redis"
+        assert cache_b.shared.hits == 1
+
+        # Promoted into worker B's local tier - no further Redis read
+        third = await collect(worker_b, use_cache=True)
+        assert third == first
+        assert cache_b.hits == 1 and cache_b.shared.hits == 1
+
+        key = cache_a.make_key(worker_a.model_mapping["requirements_analyst"], MESSAGES, 0.7, 1024)
+        assert 0 < new_client().ttl("completion:" + key) <= 60
+
+    asyncio.run(run())
+
+
+def test_falls_back_to_memory_when_redis_down():
+    async def run():
+        cache = CompletionCache(max_entries=10, max_bytes=100_000, ttl=60)
+        cache.attach_redis(BrokenRedis())
+        manager = make_manager(cache)
+
+        assert await collect(manager, use_cache=True) == "Here are the requirements"
+        await asyncio.sleep(0.05)
+        assert await collect(manager, use_cache=True) == "Here are the requirements"
+        assert manager.client.chat.completions.calls == 1
+        assert cache.shared.redis_available is False
+        assert cache.stats()["redis"]["errors"] >= 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_payload_round_trip_is_compressed,
+        test_cross_worker_hit_and_promotion,
+        test_falls_back_to_memory_when_redis_down,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All Redis completion cache tests passed")
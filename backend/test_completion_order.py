@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for delivering team replies in completion order instead of after the slowest agent
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.fan_out import as_completed
+from utils.session_manager import SessionManager
+from core.simple_agent_router import SimpleAgentRouter
+from core.simple_websocket_handler import SimpleWebSocketHandler
+from workflows.sdlc_workflow import AGENT_MATCHER, SDLCWorkflow
+from test_streaming import RecordingSocket, TokenManager, make_manager
+
+# Words per agent reply; TokenManager streams one word every 10ms
+REPLY_WORDS = {"messi": 3, "ronaldo": 30, "neymar": 12, "mbappe": 6, "benzema": 20, "modric": 9, "ramos": 25}
+
+
+async def sleepy(seconds: float, value: str = "done"):
+    await asyncio.sleep(seconds)
+    return value
+
+
+def give_replies(agents: dict, words_by_key: dict):
+    for key, agent in agents.items():
+        agent._groq_manager = TokenManager([key] * words_by_key[key])
+
+
+def test_as_completed_yields_fastest_first_with_latency():
+    async def run():
+        results = [r async for r in as_completed({"slow": sleepy(0.1), "fast": sleepy(0.01), "broken": sleepy(0.05, None)})]
+        assert [r.agent for r in results] == ["fast", "broken", "slow"]
+        assert results[0].latency_ms < results[2].latency_ms
+        assert 90 <= results[2].latency_ms < 500
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        failed = [r async for r in as_completed({"bad": fail()})][0]
+        assert not failed.ok and str(failed.error) == "boom"
+
+    asyncio.run(run())
+
+
+def test_stopping_early_cancels_the_rest():
+    async def run():
+        slow = asyncio.Event()
+
+        async def never_finishes():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                slow.set()
+
+        results = as_completed({"fast": sleepy(0.01), "slow": never_finishes()})
+        first = await results.__anext__()
+        assert first.agent == "fast"
+        await results.aclose()
+        assert slow.is_set()
+
+    asyncio.run(run())
+
+
+def test_router_yields_team_replies_as_they_finish():
+    async def run():
+        router = SimpleAgentRouter()
+        give_replies(router.agents, REPLY_WORDS)
+        order = [r.agent async for r in router.iter_responses("Hey everyone, how should we start?", {})]
+        assert order == sorted(REPLY_WORDS, key=REPLY_WORDS.get)
+
+        responses = await router.route_message("Hi Messi", {})
+        assert responses == {"messi": "messi messi messi"}
+
+    asyncio.run(run())
+
+
+def test_handler_sends_each_reply_before_the_slowest_finishes():
+    async def run():
+        manager, socket = make_manager()
+        handler = SimpleWebSocketHandler(manager, SessionManager())
+        give_replies(handler.router.agents, REPLY_WORDS)
+        await handler.handle_message("s1", {"request": "Hello team, thoughts?"})
+
+        ends = [f for f in socket.frames if f["type"] == "agent_response_end"]
+        assert [f["message"].split()[0] for f in ends] == sorted(REPLY_WORDS, key=REPLY_WORDS.get)
+        assert all(f["latency_ms"] > 0 for f in ends)
+        # Messi's reply went out while Ronaldo (the slowest) was still streaming
+        first_end = socket.frames.index(ends[0])
+        ronaldo_deltas = [i for i, f in enumerate(socket.frames)
+                          if f["type"] == "agent_response_delta" and f["delta"].strip().startswith("ronaldo")]
+        assert first_end < ronaldo_deltas[-1]
+
+        completed = socket.frames[-1]
+        assert completed["status"] == "completed" and set(completed["latencies_ms"]) == set(REPLY_WORDS)
+
+    asyncio.run(run())
+
+
+def test_workflow_collaboration_reports_each_reply_early():
+    async def run():
+        workflow = SDLCWorkflow()
+        words = {"developer": 30, "qa_tester": 3}
+        for role, agent in workflow.agents.items():
+            agent._groq_manager = TokenManager([role] * words.get(role, 1))
+
+        delivered = []
+
+        async def on_agent_response(agent_id, response, latency_ms):
+            delivered.append((agent_id, latency_ms))
+
+        state = await workflow._multi_agent_collaboration({
+            "user_request": "Let's review the release plan",
+            "mention_scan": AGENT_MATCHER.scan("let's review the release plan"),
+            "requested_agents": ["developer", "qa_tester"],
+            "agent_outputs": {},
+            "project_context": {},
+            "on_agent_response": on_agent_response,
+        })
+        assert [agent for agent, _ in delivered] == ["qa_tester", "developer"]
+        assert delivered[0][1] < delivered[1][1]
+        assert set(state["agent_outputs"]) == {"developer", "qa_tester"}
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_as_completed_yields_fastest_first_with_latency,
+        test_stopping_early_cancels_the_rest,
+        test_router_yields_team_replies_as_they_finish,
+        test_handler_sends_each_reply_before_the_slowest_finishes,
+        test_workflow_collaboration_reports_each_reply_early,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All completion order tests passed")
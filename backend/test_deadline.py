@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for request deadlines: max_tokens sizing, partial replies and skipped optional agents
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.completion_cache import CompletionCache
+from utils.deadline import Deadline
+from core.simple_agent_router import SimpleAgentRouter
+from test_completion_cache import CountingCompletions, make_manager
+
+LONG_REPLY = " ".join(f"word{i}" for i in range(200))  # ~4s at the fake stream's pace
+
+
+def make_router(cache: CompletionCache = None):
+    manager = make_manager(cache or CompletionCache(max_entries=10, max_bytes=100_000, ttl=60))
+    manager.client.chat.completions = CountingCompletions(LONG_REPLY)
+    router = SimpleAgentRouter()
+    for agent in router.agents.values():
+        agent._groq_manager = manager
+    return router, manager
+
+
+def test_max_tokens_shrinks_near_deadline():
+    roomy = Deadline(60)
+    assert roomy.cap_max_tokens(1024) == 1024
+    assert roomy.allows_optional()
+
+    tight = Deadline(3)
+    assert 64 <= tight.cap_max_tokens(1024) < 1024
+    assert not tight.allows_optional()
+
+    gone = Deadline(0)
+    assert gone.expired() and gone.cap_max_tokens(1024) == 64
+
+
+def test_agent_returns_partial_reply_at_deadline():
+    async def run():
+        cache = CompletionCache(max_entries=10, max_bytes=100_000, ttl=60)
+        router, _ = make_router(cache)
+        start = time.perf_counter()
+        reply = await router.agents["messi"].process_request("list requirements", {"deadline": Deadline(0.3)})
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.6
+        assert reply.startswith("word0") and "word199" not in reply
+        # A cut-off reply must not be served to the next request from the cache
+        assert cache.stats()["stores"] == 0
+
+    asyncio.run(run())
+
+
+def test_team_call_skips_optional_agents_when_short_on_time():
+    async def run():
+        router, manager = make_router()
+        responses = await router.route_message("Hey everyone, what about security?", {"deadline": Deadline(2)})
+        assert list(responses) == ["ramos"]
+        assert manager.client.chat.completions.calls == 1
+
+    asyncio.run(run())
+
+
+def test_expired_deadline_returns_partial_team_results():
+    async def run():
+        router, manager = make_router()
+        responses = await router.route_message("plan it", {"deadline": Deadline(0)}, requested_agents=["messi", "ronaldo"])
+        assert responses == {}
+        assert manager.client.chat.completions.calls == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_max_tokens_shrinks_near_deadline,
+        test_agent_returns_partial_reply_at_deadline,
+        test_team_call_skips_optional_agents_when_short_on_time,
+        test_expired_deadline_returns_partial_team_results,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All deadline tests passed")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for delivering WebSocket frames to sessions connected to another worker
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import fakeredis
+
+from utils.delivery_bus import RedisConnectionRegistry, create_delivery
+from utils.websocket_manager import WebSocketManager
+from test_streaming import RecordingSocket
+
+
+def make_worker(server, worker_id: str) -> WebSocketManager:
+    client = fakeredis.aioredis.FakeRedis(server=server)
+    registry, bus = create_delivery("redis", client, worker_id)
+    return WebSocketManager(registry=registry, bus=bus)
+
+
+async def attach(manager: WebSocketManager, session_id: str) -> RecordingSocket:
+    socket = RecordingSocket()
+    manager.active_connections[session_id] = socket
+    await manager.registry.register(session_id)
+    return socket
+
+
+async def settle(socket: RecordingSocket, count: int):
+    for _ in range(100):
+        if len(socket.frames) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_any_worker_reaches_a_session_on_another():
+    async def run():
+        server = fakeredis.FakeServer()
+        owner, other = make_worker(server, "w1"), make_worker(server, "w2")
+        await owner.start_delivery()
+        await other.start_delivery()
+        socket = await attach(owner, "s1")
+
+        await other.send_status_update("s1", "processing", "Messi is responding...")
+        stream = await other.open_stream("s1", "Messi")
+        await stream.push("Hello")
+        await stream.end("Hello")
+        await other.send_agent_response("s1", "Ronaldo", "Looks good", latency_ms=12.5)
+        await settle(socket, 5)
+
+        assert [f["type"] for f in socket.frames] == [
+            "status_update", "agent_response_start", "agent_response_delta", "agent_response_end", "agent_response"]
+        assert socket.frames[2]["delta"] == "Hello" and socket.frames[4]["latency_ms"] == 12.5
+        assert other.stats()["forwarded"] == 5 and owner.bus.stats()["received"] == 5
+        await owner.stop_delivery()
+        await other.stop_delivery()
+
+    asyncio.run(run())
+
+
+def test_reconnect_elsewhere_keeps_the_newer_claim():
+    async def run():
+        server = fakeredis.FakeServer()
+        first, second, sender = (make_worker(server, w) for w in ("w1", "w2", "w3"))
+        for worker in (first, second):
+            await worker.start_delivery()
+        sender.registry.cache_seconds = 0
+        await attach(first, "s1")
+        socket = await attach(second, "s1")  # The client reconnected to w2...
+        first.disconnect("s1")                # ...before w1 noticed the old socket closing
+        await asyncio.sleep(0.01)
+
+        await sender.send_agent_response("s1", "Messi", "Still here")
+        await settle(socket, 1)
+        assert socket.frames[0]["message"] == "Still here"
+        for worker in (first, second):
+            await worker.stop_delivery()
+
+    asyncio.run(run())
+
+
+def test_dead_owner_counts_as_unreachable():
+    async def run():
+        server = fakeredis.FakeServer()
+        sender = make_worker(server, "w2")
+        registry = RedisConnectionRegistry(fakeredis.aioredis.FakeRedis(server=server), "w1")
+        await registry.register("s1")  # w1 claimed the session, then died without a listener
+
+        await sender.send_agent_response("s1", "Messi", "Anyone there?")
+        stats = sender.stats()
+        assert stats["forwarded"] == 0 and stats["unreachable"] == 1
+
+    asyncio.run(run())
+
+
+def test_single_process_default_forwards_nothing():
+    async def run():
+        manager = WebSocketManager()
+        await manager.start_delivery()
+        await manager.send_agent_response("nobody", "Messi", "Hello?")
+        stats = manager.stats()
+        assert stats["bus"]["backend"] == "local" and stats["forwarded"] == 0 and stats["unreachable"] == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_any_worker_reaches_a_session_on_another,
+        test_reconnect_elsewhere_keeps_the_newer_claim,
+        test_dead_owner_counts_as_unreachable,
+        test_single_process_default_forwards_nothing,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All delivery bus tests passed")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged requests and latency-based model fallback in GroqModelManager
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from models.groq_models import LatencyTracker, RequestScheduler
+from test_completion_cache import MESSAGES, make_manager
+from utils.completion_cache import CompletionCache
+
+
+class ModelStream:
+    def __init__(self, model, first_token, words, log):
+        self.model = model
+        self.first_token = first_token
+        self.words = words
+        self.log = log
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self.first_token)
+        for word in self.words:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))])
+            await asyncio.sleep(0.01)
+
+    async def close(self):
+        self.closed = True
+        self.log.append(("closed", self.model))
+
+
+class PerModelCompletions:
+    """Each model answers with its own name after a configured first-token delay"""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.log = []
+        self.streams = {}
+
+    async def create(self, model, **kwargs):
+        self.log.append(("create", model))
+        if model in self.failing:
+            raise RuntimeError(f"{model} unavailable")
+        stream = ModelStream(model, self.delays[model], [model, " done"], self.log)
+        self.streams[model] = stream
+        return stream
+
+
+def hedging_manager(delays, failing=(), hedge_delay=0.1):
+    manager = make_manager(CompletionCache())
+    manager._scheduler = RequestScheduler(max_wait=5)
+    manager._latency = LatencyTracker()
+    manager._latency.default_delay = hedge_delay
+    manager.model_mapping = {"developer": "slow-model"}
+    manager.fallback_mapping = {"developer": ["fast-model", "last-model"]}
+    manager.client = SimpleNamespace(chat=SimpleNamespace(completions=PerModelCompletions(delays, failing)))
+    return manager
+
+
+async def collect(manager) -> str:
+    return "".join([d async for d in manager.stream_completion("developer", MESSAGES)])
+
+
+def test_fast_primary_is_not_hedged():
+    async def run():
+        manager = hedging_manager({"slow-model": 0.01, "fast-model": 0.01, "last-model": 0.01})
+        assert await collect(manager) == "slow-model done"
+        assert manager.client.chat.completions.log.count(("create", "fast-model")) == 0
+        assert manager.get_latency_stats()["roles"]["developer"]["hedged"] == 0
+
+    asyncio.run(run())
+
+
+def test_late_primary_is_hedged_and_loser_cancelled():
+    async def run():
+        manager = hedging_manager({"slow-model": 1.0, "fast-model": 0.05, "last-model": 0.05})
+        start = time.monotonic()
+        assert await collect(manager) == "fast-model done"
+        assert time.monotonic() - start < 0.5
+        completions = manager.client.chat.completions
+        assert completions.streams["slow-model"].closed, "losing stream must be closed"
+        roles = manager.get_latency_stats()["roles"]["developer"]
+        assert roles["hedged"] == 1 and roles["fallback_wins"] == {"fast-model": 1}
+        assert roles["hedge_rate"] == 1.0
+
+    asyncio.run(run())
+
+
+def test_primary_can_still_win_after_hedge():
+    async def run():
+        manager = hedging_manager({"slow-model": 0.15, "fast-model": 1.0, "last-model": 0.05})
+        assert await collect(manager) == "slow-model done"
+        assert manager.client.chat.completions.streams["fast-model"].closed
+        roles = manager.get_latency_stats()["roles"]["developer"]
+        assert roles["hedged"] == 1 and roles["primary_wins"] == 1
+
+    asyncio.run(run())
+
+
+def test_errors_fail_over_down_the_chain():
+    async def run():
+        manager = hedging_manager(
+            {"slow-model": 0.01, "fast-model": 0.01, "last-model": 0.01},
+            failing={"slow-model", "fast-model"},
+        )
+        assert await collect(manager) == "last-model done"
+        assert manager.get_latency_stats()["roles"]["developer"]["failovers"] == 1
+
+    asyncio.run(run())
+
+
+def test_fallback_reply_is_not_cached_under_the_primary_model():
+    async def run():
+        manager = hedging_manager({"slow-model": 1.0, "fast-model": 0.05, "last-model": 0.05})
+        assert "".join([d async for d in manager.stream_completion("developer", MESSAGES, use_cache=True)]) == "fast-model done"
+        assert manager.get_cache_stats()["entries"] == 0
+
+        manager.client.chat.completions.delays["slow-model"] = 0.01
+        assert "".join([d async for d in manager.stream_completion("developer", MESSAGES, use_cache=True)]) == "slow-model done"
+        assert manager.get_cache_stats()["entries"] == 1
+
+    asyncio.run(run())
+
+
+def test_hedge_delay_follows_p95():
+    tracker = LatencyTracker(min_samples=5)
+    for seconds in [0.2] * 18 + [1.5, 1.6]:
+        tracker.record_ttft("m", seconds)
+    assert tracker.hedge_delay("m") == 1.5
+    assert LatencyTracker().hedge_delay("unknown") == LatencyTracker().default_delay
+
+
+if __name__ == "__main__":
+    tests = [
+        test_fast_primary_is_not_hedged,
+        test_late_primary_is_hedged_and_loser_cancelled,
+        test_primary_can_still_win_after_hedge,
+        test_errors_fail_over_down_the_chain,
+        test_fallback_reply_is_not_cached_under_the_primary_model,
+        test_hedge_delay_follows_p95,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All hedging tests passed")
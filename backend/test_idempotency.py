@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for idempotency keys on retried chat requests
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+from utils.idempotency import IdempotencyStore
+from test_streaming import make_manager, TokenManager
+
+
+def test_http_retry_attaches_then_replays():
+    async def run():
+        store = IdempotencyStore(ttl=60)
+        store.attach_redis(fakeredis.FakeRedis(decode_responses=True))
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return {"status": 200, "body": {"response": "Ship it"}}
+
+        async def retry():
+            await asyncio.sleep(0.005)
+            return await store.join(store.inflight("k1"))
+
+        first, attached = await asyncio.gather(store.run("k1", answer()), retry())
+        assert first == attached and len(calls) == 1
+        assert (await store.lookup("k1"))["body"] == {"response": "Ship it"}
+
+        # Another worker sharing the Redis answers the retry too
+        other = IdempotencyStore(ttl=60)
+        other.redis_client = store.redis_client
+        assert (await other.lookup("k1"))["body"] == {"response": "Ship it"}
+
+        async def failing():
+            return {"status": 500, "body": {"error": "provider down"}}
+
+        await store.run("k2", failing())
+        assert await store.lookup("k2") is None
+        assert store.stats()["attached"] == 1 and store.stats()["replayed"] == 1 and store.stats()["not_stored"] == 1
+
+    asyncio.run(run())
+
+
+def test_websocket_retry_replays_recorded_frames():
+    async def run():
+        manager, socket = make_manager()
+        store = IdempotencyStore(ttl=60)
+        halfway = asyncio.Event()
+
+        async def request():
+            await manager.send_status_update("s1", "processing", "Messi is responding...")
+            stream = await manager.open_stream("s1", "Messi")
+            await stream.push("Ship")
+            halfway.set()
+            await asyncio.sleep(0.01)
+            await stream.end("Ship it")
+            await manager.send_status_update("s1", "completed", "Done")
+
+        flight = store.begin("s1:k1")
+        task = asyncio.create_task(store.record(flight, request()))
+        await halfway.wait()
+        assert [f["type"] for f in await store.recorded("s1:k1")] == ["status_update", "agent_response_start"]
+        await task
+
+        socket.frames.clear()
+        await manager.replay("s1", await store.recorded("s1:k1"))
+        assert [f["type"] for f in socket.frames] == [
+            "status_update", "agent_response_start", "agent_response_end", "status_update"]
+        assert all(f["replayed"] for f in socket.frames) and socket.frames[2]["message"] == "Ship it"
+
+        # A run that ended in an error frame is run again on retry
+        async def broken():
+            await manager.send_agent_response("s1", "system", "Provider unavailable", "error")
+
+        await store.record(store.begin("s1:k2"), broken())
+        assert await store.recorded("s1:k2") is None
+
+    asyncio.run(run())
+
+
+def test_websocket_retry_does_not_run_the_agents_again():
+    import main_simple
+
+    agents = main_simple.ws_handler.router.agents
+    previous = {key: agent._groq_manager for key, agent in agents.items()}
+    for agent in agents.values():
+        agent._groq_manager = TokenManager(["word"] * 3)
+    started = main_simple.idempotency_store.started
+    try:
+        client = TestClient(main_simple.app)
+        with client.websocket_connect("/ws/idempotent-session") as ws:
+            assert ws.receive_json()["status"] == "connected"
+            frames = []
+            for _ in range(2):
+                ws.send_json({"request": "Hi Messi, quick one", "request_id": "r1", "idempotency_key": "retry-me"})
+                while True:
+                    frames.append(ws.receive_json())
+                    if frames[-1].get("status") == "completed":
+                        break
+        replayed = [f for f in frames if f.get("replayed")]
+        original = [f for f in frames if not f.get("replayed") and f["type"] != "agent_response_delta"]
+        assert [f["type"] for f in replayed] == [f["type"] for f in original]
+        assert main_simple.idempotency_store.started == started + 1
+    finally:
+        for key, agent in agents.items():
+            agent._groq_manager = previous[key]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_http_retry_attaches_then_replays,
+        test_websocket_retry_replays_recorded_frames,
+        test_websocket_retry_does_not_run_the_agents_again,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All idempotency tests passed")
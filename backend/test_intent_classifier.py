@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the local BM25 intent classifier used to pick an agent without the LLM
+"""
+
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from core.intent_classifier import IntentClassifier, get_intent_classifier
+from core.simple_agent_router import SimpleAgentRouter
+
+
+def test_whole_words_and_stems_only():
+    classifier = get_intent_classifier()
+    assert classifier.classify("Is this a designated parking area?").agent is None
+    assert classifier.classify("We are deploying the services tonight").agent == "benzema"
+    assert classifier.classify("Two deployments failed").agent == "benzema"
+
+
+def test_ranked_agents_and_confidence():
+    classifier = get_intent_classifier()
+    prediction = classifier.classify("Write unit tests for the payment module and check coverage")
+    assert prediction.agent == "mbappe" and prediction.confident
+    assert [agent for agent, _ in prediction.ranked][0] == "mbappe"
+
+    # Two roles asked for equally: low confidence, both shortlisted for the LLM/team to sort out
+    mixed = classifier.classify("design the architecture and write the deployment pipeline with docker")
+    assert {"ronaldo", "benzema"} <= set(mixed.shortlist())
+
+    nothing = classifier.classify("what do you think?")
+    assert nothing.agent is None and nothing.confidence == 0.0 and not nothing.confident
+
+
+def test_ties_are_not_confident():
+    classifier = IntentClassifier({"a": {"shared": 2, "alpha": 2}, "b": {"shared": 2, "beta": 2}})
+    prediction = classifier.classify("the shared thing")
+    assert prediction.confidence == 0.0 and not prediction.confident
+    assert classifier.classify("alpha please").agent == "a"
+
+
+def test_router_uses_classifier_for_content_routing():
+    router = SimpleAgentRouter()
+    assert router._select_best_agent("Set up Terraform for staging") == "benzema"
+    assert router._select_best_agent("the designated driver") is None
+
+
+if __name__ == "__main__":
+    tests = [
+        test_whole_words_and_stems_only,
+        test_ranked_agents_and_confidence,
+        test_ties_are_not_confident,
+        test_router_uses_classifier_for_content_routing,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All intent classifier tests passed")
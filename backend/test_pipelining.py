@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for concurrent per-session requests tagged with a request_id
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+from utils.task_tracker import SessionTaskTracker
+from test_streaming import make_manager, TokenManager
+
+
+def test_session_runs_requests_side_by_side_up_to_the_limit():
+    async def run():
+        tracker = SessionTaskTracker()
+        running, gate = [], asyncio.Event()
+
+        async def request(name):
+            running.append(name)
+            await gate.wait()
+
+        tasks = [tracker.spawn("s1", request(f"r{i}"), request_id=f"r{i}", limit=2) for i in range(4)]
+        await asyncio.sleep(0.01)
+        assert running == ["r0", "r1"] and tracker.active("s1") == 4
+
+        # A request cancelled while waiting for a slot never starts
+        tasks[3].cancel()
+        gate.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert running == ["r0", "r1", "r2"] and tracker.active("s1") == 0
+
+    asyncio.run(run())
+
+
+def test_every_frame_carries_its_request_id():
+    async def run():
+        manager, socket = make_manager()
+        tracker = SessionTaskTracker()
+
+        async def request(name, words):
+            await manager.send_status_update("s1", "processing", f"{name} working")
+            stream = await manager.open_stream("s1", name)
+            for word in words:
+                await stream.push(word)
+                await asyncio.sleep(0.005)
+            await stream.end()
+            await manager.send_agent_response("s1", name, "done")
+
+        await asyncio.gather(tracker.spawn("s1", request("Messi", ["a", "b", "c"]), request_id="first"),
+                             tracker.spawn("s1", request("Neymar", ["x", "y"]), request_id="second"))
+        by_request = {}
+        for frame in socket.frames:
+            by_request.setdefault(frame["request_id"], []).append(frame)
+        assert set(by_request) == {"first", "second"}
+        for request_id, agent in (("first", "Messi"), ("second", "Neymar")):
+            frames = by_request[request_id]
+            assert frames[0]["status"] == "processing"  # Not coalesced away by the other request's status
+            assert {f.get("agent") for f in frames[1:]} == {agent}
+            assert frames[-1]["type"] == "agent_response"
+
+    asyncio.run(run())
+
+
+def test_second_request_and_ping_do_not_wait_for_the_first():
+    import main_simple
+
+    agents = main_simple.ws_handler.router.agents
+    previous = {key: agent._groq_manager for key, agent in agents.items()}
+    for key, agent in agents.items():
+        agent._groq_manager = TokenManager(["word"] * (5 if key == "messi" else 40))
+    try:
+        client = TestClient(main_simple.app)
+        with client.websocket_connect("/ws/pipelined-session") as ws:
+            assert ws.receive_json()["status"] == "connected"
+            ws.send_json({"request": "Hey everyone, plan the billing service", "request_id": "team-run"})
+            ws.send_json({"type": "ping"})
+            ws.send_json({"request": "Hi Messi, quick one"})
+
+            frames, completed = [], set()
+            while len(completed) < 2:
+                frame = ws.receive_json()
+                frames.append(frame)
+                if frame.get("status") == "completed":
+                    completed.add(frame["request_id"])
+
+        types = [f["type"] for f in frames]
+        assert types.index("pong") < min(i for i, f in enumerate(frames) if f.get("status") == "completed")
+        server_id = next(rid for rid in completed if rid != "team-run")
+        assert {f["request_id"] for f in frames if f["type"] != "pong"} == {"team-run", server_id}
+        # The direct question finished while the team run was still going
+        finished = [f["request_id"] for f in frames if f.get("status") == "completed"]
+        assert finished == [server_id, "team-run"]
+    finally:
+        for key, agent in agents.items():
+            agent._groq_manager = previous[key]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_session_runs_requests_side_by_side_up_to_the_limit,
+        test_every_frame_carries_its_request_id,
+        test_second_request_and_ping_do_not_wait_for_the_first,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All pipelining tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for token-budgeted prompt assembly
+"""
+
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from agents.prompt_assembly import PromptAssembler, MODEL_CONTEXT_WINDOWS
+
+SYSTEM = "You are Messi, a requirements analyst."
+
+
+def make_file(name: str, content: str, file_type: str = "text/plain"):
+    return {"id": name, "name": name, "type": file_type, "size": len(content), "content": content, "uploadedAt": ""}
+
+
+def test_context_is_not_dumped_as_repr():
+    context = {
+        "projectName": "Todo",
+        "technology": "React",
+        "timestamp": "2024-01-01T00:00:00",
+        "direct_call": True,
+        "uploaded_files": [make_file("spec.txt", "UNIQUE-SPEC-CONTENT")],
+    }
+    prompt = PromptAssembler("requirements_analyst", "llama-3.1-8b-instant").build(SYSTEM, "List requirements", context)
+    user = prompt.messages[1]["content"]
+    assert user.count("UNIQUE-SPEC-CONTENT") == 1
+    assert "timestamp" not in user and "direct_call" not in user
+    assert "projectName: Todo" in user
+    assert user.endswith("Request: List requirements")
+
+
+def test_duplicate_uploads_rendered_once():
+    spec = make_file("spec.txt", "same body")
+    prompt = PromptAssembler("developer", "llama-3.3-70b-versatile").build(SYSTEM, "Build it", {"uploaded_files": [spec, dict(spec)]})
+    assert prompt.messages[1]["content"].count("same body") == 1
+
+
+def test_large_inputs_fit_role_budget():
+    context = {
+        "uploaded_files": [make_file("a.txt", "line of spec\n" * 20000), make_file("b.txt", "more spec\n" * 20000)],
+        "conversation_history": [{"agent": "user", "message": f"turn {i} " + "x" * 400} for i in range(200)],
+        "previous_responses": {"developer": "d" * 30000, "qa_tester": "q" * 30000},
+    }
+    assembler = PromptAssembler("qa_tester", "llama-3.1-8b-instant")
+    prompt = assembler.build(SYSTEM, "Review", context)
+    assert prompt.prompt_tokens <= assembler.input_budget
+    assert prompt.sections["documents"] > prompt.sections["history"] > 0
+    assert prompt.sections["team"] > 0
+    assert prompt.truncated
+    # The most recent history survives, the oldest is dropped
+    user = prompt.messages[1]["content"]
+    assert "turn 199" in user and "turn 0 " not in user
+
+
+def test_unused_share_is_redistributed():
+    context = {"uploaded_files": [make_file("big.txt", "word " * 40000)]}
+    assembler = PromptAssembler("developer", "llama-3.3-70b-versatile")
+    prompt = assembler.build(SYSTEM, "Summarize", context)
+    # With no history or team responses, documents get nearly the whole budget
+    assert prompt.sections["documents"] > assembler.input_budget * 0.9
+
+
+def test_max_tokens_fits_context_window():
+    small = PromptAssembler("developer", "unknown-model", input_budget=100000)
+    assert small.context_window not in MODEL_CONTEXT_WINDOWS.values() or small.context_window == 8192
+    prompt = small.build(SYSTEM, "x " * 20000, {})
+    assert prompt.max_tokens >= 64
+    assert prompt.max_tokens < 1024
+
+    roomy = PromptAssembler("developer", "llama-3.3-70b-versatile").build(SYSTEM, "hi", {})
+    assert roomy.max_tokens == 1024
+
+
+def test_budget_override_from_env():
+    os.environ["PROMPT_BUDGETS"] = '{"developer": 1234}'
+    try:
+        assert PromptAssembler("developer", "llama-3.3-70b-versatile").input_budget == 1234
+    finally:
+        del os.environ["PROMPT_BUDGETS"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_context_is_not_dumped_as_repr,
+        test_duplicate_uploads_rendered_once,
+        test_large_inputs_fit_role_budget,
+        test_unused_share_is_redistributed,
+        test_max_tokens_fits_context_window,
+        test_budget_override_from_env,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All prompt assembly tests passed")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared provider registry and process-wide model manager
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from models.groq_models import ProviderRegistry, get_groq_manager, get_provider_registry
+from core.simple_agent_router import SimpleAgentRouter
+from workflows.sdlc_workflow import SDLCWorkflow
+
+
+def test_clients_share_one_pool_per_base_url():
+    registry = ProviderRegistry(max_connections=8, max_keepalive=4, http2=False)
+    first = registry.groq_client("key-a")
+    assert registry.groq_client("key-a") is first
+    other_key = registry.groq_client("key-b")
+    assert other_key is not first and other_key._client is first._client
+    elsewhere = registry.groq_client("key-a", base_url="https://proxy.example.com")
+    assert elsewhere._client is not first._client
+
+    stats = registry.stats()
+    assert stats["pools"] == ["https://api.groq.com", "https://proxy.example.com"]
+    assert stats["max_connections"] == 8 and stats["clients"] == 3
+    assert registry.sync_http_client() is registry.sync_http_client()
+
+
+def test_router_and_workflow_agents_share_the_manager():
+    manager = get_groq_manager()
+    assert manager.client is get_provider_registry().groq_client()
+    router = SimpleAgentRouter()
+    workflow = SDLCWorkflow()
+    agents = list(router.agents.values()) + list(workflow.agents.values())
+    assert all(agent.groq_manager is manager for agent in agents)
+
+
+def test_closed_pools_are_reopened():
+    async def run():
+        registry = ProviderRegistry(http2=False)
+        client = registry.groq_client("key-a")
+        await registry.aclose()
+        assert client._client.is_closed and registry.stats()["pools"] == []
+        reopened = registry.groq_client("key-a")
+        assert not reopened._client.is_closed
+        await registry.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_clients_share_one_pool_per_base_url,
+        test_router_and_workflow_agents_share_the_manager,
+        test_closed_pools_are_reopened,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All provider registry tests passed")
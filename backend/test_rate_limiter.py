@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-model token-bucket scheduler in models/groq_models.py
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import httpx
+from groq import RateLimitError
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from models.groq_models import ModelScheduler, RateLimitTimeout, RequestScheduler
+from test_completion_cache import FakeStream, MESSAGES, collect, make_manager
+from utils.completion_cache import CompletionCache
+
+
+def rate_limit_error(retry_after: str) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class FlakyCompletions:
+    """Returns 429 for the first N calls, then streams normally"""
+
+    def __init__(self, failures: int, retry_after: str = "0.2"):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise rate_limit_error(self.retry_after)
+        return FakeStream(["ok"])
+
+
+def test_burst_is_smoothed_not_rejected():
+    async def run():
+        scheduler = ModelScheduler("m", rpm=6000, tpm=600, max_wait=2)  # 10 tokens/s refill
+        assert await scheduler.acquire(600) < 0.05  # Full minute allowance available up front
+        waited = await scheduler.acquire(5)
+        assert 0.4 <= waited <= 0.8, waited
+
+    asyncio.run(run())
+
+
+def test_rejects_when_predicted_wait_exceeds_budget():
+    async def run():
+        scheduler = ModelScheduler("m", rpm=6000, tpm=600, max_wait=0.5)
+        await scheduler.acquire(600)
+        start = time.monotonic()
+        try:
+            await scheduler.acquire(100)
+        except RateLimitTimeout:
+            assert time.monotonic() - start < 0.1, "rejection should be immediate"
+            assert scheduler.stats()["rejected"] == 1
+        else:
+            raise AssertionError("expected RateLimitTimeout")
+
+    asyncio.run(run())
+
+
+def test_queue_is_fifo_per_model():
+    async def run():
+        scheduler = ModelScheduler("m", rpm=6000, tpm=600, max_wait=5)
+        await scheduler.acquire(600)
+        order = []
+
+        async def request(i):
+            await scheduler.acquire(2)
+            order.append(i)
+
+        await asyncio.gather(*[request(i) for i in range(5)])
+        assert order == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_rate_limit_headers_hold_the_queue():
+    async def run():
+        scheduler = ModelScheduler("m", rpm=6000, tpm=60000, max_wait=2)
+        scheduler.observe_headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "300ms"})
+        waited = await scheduler.acquire(10)
+        assert waited >= 0.25, waited
+
+    asyncio.run(run())
+
+
+def test_429_is_retried_after_retry_after():
+    async def run():
+        manager = make_manager(CompletionCache())
+        manager._scheduler = RequestScheduler(max_wait=5)
+        manager.client = SimpleNamespace(chat=SimpleNamespace(completions=FlakyCompletions(failures=1)))
+        start = time.monotonic()
+        assert await collect(manager) == "ok"
+        assert time.monotonic() - start >= 0.2
+        assert manager.client.chat.completions.calls == 2
+        model = manager.model_mapping["requirements_analyst"]
+        assert manager.get_rate_limit_stats()[model]["throttled"] == 1
+
+    asyncio.run(run())
+
+
+class FailingCompletions:
+    """Fails every call the way a timeout or 5xx does"""
+
+    async def create(self, **kwargs):
+        raise httpx.ConnectError("connection refused")
+
+
+def test_failed_call_returns_its_reservation():
+    async def run():
+        manager = make_manager(CompletionCache())
+        manager._scheduler = RequestScheduler(max_wait=5)
+        manager.client = SimpleNamespace(chat=SimpleNamespace(completions=FailingCompletions()))
+        manager.hedging_enabled = False
+        tokens = manager._scheduler.for_model(manager.model_mapping["requirements_analyst"]).tokens
+        for _ in range(3):
+            try:
+                await collect(manager)
+            except httpx.ConnectError:
+                pass
+            else:
+                raise AssertionError("expected the connection error to propagate")
+        assert tokens.level > tokens.capacity - 1, tokens.level
+
+    asyncio.run(run())
+
+
+def test_shared_model_roles_share_one_bucket():
+    scheduler = RequestScheduler()
+    manager = make_manager(CompletionCache())
+    architect = manager.model_mapping["software_architect"]
+    pm = manager.model_mapping["project_manager"]
+    assert architect == pm
+    assert scheduler.for_model(architect) is scheduler.for_model(pm)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_burst_is_smoothed_not_rejected,
+        test_rejects_when_predicted_wait_exceeds_budget,
+        test_queue_is_fifo_per_model,
+        test_rate_limit_headers_hold_the_queue,
+        test_429_is_retried_after_retry_after,
+        test_failed_call_returns_its_reservation,
+        test_shared_model_roles_share_one_bucket,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All rate limiter tests passed")
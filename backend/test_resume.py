@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for resuming a session's frames after the WebSocket reconnects
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.replay_buffer import ReplayBuffer
+from utils.task_tracker import SessionTaskTracker
+from utils.websocket_manager import WebSocketManager
+from test_streaming import RecordingSocket
+
+
+class AcceptingSocket(RecordingSocket):
+    scope = {"subprotocols": []}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+
+def test_buffer_is_capped_per_session_and_globally():
+    buffer = ReplayBuffer(max_bytes=2000, max_total_bytes=3000)
+    for session_id in ("old", "new"):
+        buffer.attach(session_id)
+    for i in range(20):
+        buffer.add("old", {"type": "agent_response", "message": "x" * 100})
+    frames, complete = buffer.since("old", 0)
+    assert not complete and frames[-1]["frame_seq"] == 20 and buffer.stats()["bytes"] <= 2000
+    frames, complete = buffer.since("old", frames[0]["frame_seq"] - 1)
+    assert complete
+
+    # The least recently active session gives up frames first once the global cap is reached
+    old_frames = len(buffer.since("old", 0)[0])
+    for i in range(10):
+        buffer.add("new", {"type": "agent_response", "message": "y" * 100})
+    assert buffer.stats()["bytes"] <= 3000
+    frames, complete = buffer.since("new", 0)
+    assert complete and len(frames) == 10
+    assert 0 < len(buffer.since("old", 0)[0]) < old_frames
+
+    # A session that dropped is forgotten once the grace period is over
+    buffer.grace = 0
+    buffer.detach("new")
+    assert buffer.stats()["sessions"] == 1 and buffer.since("new", 10) == ([], False)
+
+
+def test_reconnect_replays_missed_frames_before_live_ones():
+    async def run():
+        manager = WebSocketManager()
+        first = AcceptingSocket()
+        await manager.connect(first, "s1")
+        await manager.send_status_update("s1", "processing", "Messi is responding...")
+        stream = await manager.open_stream("s1", "Messi")
+        await stream.push("Hello")
+        await stream.flush()
+        last_seen = first.frames[-1]["frame_seq"]
+        manager.disconnect("s1", first)
+
+        # The reply goes on while the client is away
+        await stream.push(" there")
+        await stream.end()
+        await manager.send_agent_response("s1", "Ronaldo", "Agreed")
+
+        second = AcceptingSocket()
+        await manager.connect(second, "s1")
+        manager.disconnect("s1", first)  # The old socket's late cleanup leaves the new one alone
+        replayed, complete = await manager.resume("s1", last_seen)
+        await manager.send_status_update("s1", "completed", "Done")
+        await asyncio.sleep(0.01)
+
+        assert (replayed, complete) == (3, True)
+        assert [f["type"] for f in second.frames] == [
+            "agent_response_delta", "agent_response_end", "agent_response", "status_update"]
+        assert [f["frame_seq"] for f in second.frames] == list(range(last_seen + 1, last_seen + 5))
+        assert second.frames[1]["message"] == "Hello there"
+
+    asyncio.run(run())
+
+
+def test_dropped_session_requests_run_on_through_the_grace_period():
+    async def run():
+        tracker = SessionTaskTracker()
+        reply = asyncio.Event()
+
+        async def request():
+            await asyncio.sleep(0.05)
+            reply.set()
+
+        tracker.spawn("s1", request())
+        await tracker.cancel_after("s1", 0.02)
+        assert tracker.reclaim("s1")  # Reconnected in time
+        await asyncio.sleep(0.08)
+        assert reply.is_set()
+
+        reply.clear()
+        task = tracker.spawn("s1", request())
+        await tracker.cancel_after("s1", 0.02)
+        await asyncio.sleep(0.08)
+        assert task.cancelled() and not reply.is_set()
+        assert tracker.stats()["reclaimed"] == 1 and tracker.stats()["cancelled"] == {"disconnect": 1}
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_buffer_is_capped_per_session_and_globally,
+        test_reconnect_replays_missed_frames_before_live_ones,
+        test_dropped_session_requests_run_on_through_the_grace_period,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All resume tests passed")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-connection outbound queue in WebSocketManager
+"""
+
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+from utils.websocket_manager import WebSocketManager
+from utils.wire_protocol import get_codec
+
+
+class StalledSocket:
+    """Socket that holds every write until the test lets it through"""
+
+    def __init__(self):
+        self.frames = []
+        self.gate = asyncio.Event()
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        await self.gate.wait()
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+
+class BrokenSocket:
+    async def send_text(self, text: str):
+        raise RuntimeError("connection reset")
+
+
+def make_manager(socket, **kwargs):
+    manager = WebSocketManager(**kwargs)
+    manager.active_connections["s1"] = socket
+    return manager
+
+
+def test_slow_socket_does_not_block_the_producer():
+    async def run():
+        socket = StalledSocket()
+        manager = make_manager(socket)
+        start = time.perf_counter()
+        for i in range(50):
+            await manager.send_agent_response("s1", "Messi", f"reply {i}")
+        assert time.perf_counter() - start < 0.5
+        assert socket.frames == [] and manager.queue_depth("s1") == 49  # One write is in flight
+
+        socket.gate.set()
+        await asyncio.sleep(0.01)
+        assert [f["message"] for f in socket.frames] == [f"reply {i}" for i in range(50)]
+        assert manager.stats()["frames_sent"] == 50 and manager.queue_depth("s1") == 0
+
+    asyncio.run(run())
+
+
+def test_only_the_latest_processing_status_is_kept():
+    async def run():
+        socket = StalledSocket()
+        manager = make_manager(socket)
+        await manager.send_status_update("s1", "connected", "WebSocket connected")
+        await manager.send_status_update("s1", "processing", "Initializing agents...")
+        await manager.send_agent_response("s1", "Messi", "Done")
+        await manager.send_status_update("s1", "processing", "Neymar is responding...")
+        await manager.send_status_update("s1", "queued", agent="Neymar", queue_position=3)
+        await manager.send_status_update("s1", "queued", agent="Neymar", queue_position=2)
+        await manager.send_status_update("s1", "processing", "Mbappe is responding...")
+        await manager.broadcast_collaboration("s1", ["Messi"], "active")
+        await manager.broadcast_collaboration("s1", ["Messi", "Neymar"], "active")
+
+        socket.gate.set()
+        await asyncio.sleep(0.01)
+        summary = [(f["type"], f.get("status") or f.get("message"), f.get("details") or f.get("queue_position"))
+                   for f in socket.frames]
+        assert summary == [
+            ("status_update", "connected", "WebSocket connected"),
+            ("agent_response", "Done", None),
+            ("status_update", "queued", 2),
+            ("status_update", "processing", "Mbappe is responding..."),
+            ("collaboration_update", "active", None),
+        ]
+        assert socket.frames[-1]["agents"] == ["Messi", "Neymar"]
+        assert manager.stats()["coalesced"] == 4
+
+    asyncio.run(run())
+
+
+def test_client_that_stays_behind_loses_deltas_then_is_closed():
+    async def run():
+        socket = StalledSocket()
+        manager = make_manager(socket, max_queue=3)
+        await manager.send_frame("s1", {"type": "agent_response_start", "message_id": "m"})
+        for seq in (1, 2, 3):
+            await manager.send_frame("s1", {"type": "agent_response_delta", "message_id": "m", "seq": seq})
+        await manager.send_frame("s1", {"type": "agent_response_end", "message_id": "m", "message": "full"})
+        assert manager.queue_depth("s1") == 1 and manager.stats()["dropped_deltas"] == 3
+
+        await manager.send_agent_response("s1", "Messi", "one")
+        await manager.send_agent_response("s1", "Messi", "two")
+        await manager.send_agent_response("s1", "Messi", "three")  # Nothing left to drop
+        await asyncio.sleep(0.01)
+        assert socket.closed_with == 1013 and "s1" not in manager.active_connections
+        assert manager.stats()["slow_clients_closed"] == 1
+
+        await manager.send_agent_response("s1", "Messi", "after close")  # Quietly ignored
+        assert manager.stats()["queued_frames"] == 0
+
+    asyncio.run(run())
+
+
+def test_stuck_write_closes_the_client_on_the_next_frame():
+    async def run():
+        socket = StalledSocket()
+        manager = make_manager(socket, send_timeout=0.05)
+        await manager.send_status_update("s1", "connected")
+        await asyncio.sleep(0.1)
+        await manager.send_agent_response("s1", "Messi", "hello?")
+        await asyncio.sleep(0.01)
+        assert socket.closed_with == 1013 and "s1" not in manager.active_connections
+
+    asyncio.run(run())
+
+
+def test_broken_socket_is_dropped_without_raising():
+    async def run():
+        manager = make_manager(BrokenSocket())
+        await manager.broadcast_collaboration("s1", ["Messi"], "active")
+        await asyncio.sleep(0.01)
+        assert "s1" not in manager.active_connections
+        assert manager.stats()["send_errors"] == 1
+        await manager.broadcast_collaboration("s1", ["Messi"], "active")
+
+    asyncio.run(run())
+
+
+def test_clients_negotiate_binary_frames():
+    import main_simple
+
+    client = TestClient(main_simple.app)
+    with client.websocket_connect("/ws/binary-session", subprotocols=["flux.nope", "flux.msgpack"]) as ws:
+        assert ws.accepted_subprotocol == "flux.msgpack"
+        frame = get_codec("flux.msgpack").decode(ws.receive_bytes())
+        assert frame["type"] == "status_update" and frame["status"] == "connected"
+    with client.websocket_connect("/ws/legacy-session") as ws:
+        assert ws.accepted_subprotocol is None
+        assert ws.receive_json()["status"] == "connected"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_slow_socket_does_not_block_the_producer,
+        test_only_the_latest_processing_status_is_kept,
+        test_client_that_stays_behind_loses_deltas_then_is_closed,
+        test_stuck_write_closes_the_client_on_the_next_frame,
+        test_broken_socket_is_dropped_without_raising,
+        test_clients_negotiate_binary_frames,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All send queue tests passed")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the Redis session layout - a hash per session plus a capped history list
+"""
+
+import json
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import fakeredis
+
+from utils.session_manager import SessionManager, SESSION_HISTORY_MAX, SESSION_TTL_SECONDS
+
+
+def make_store():
+    return SessionManager(redis_client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def message(i: int) -> dict:
+    return {"type": "agent_response", "agent": "Messi", "message": f"reply {i}", "timestamp": "2025-01-01T00:00:00"}
+
+
+def test_history_is_a_capped_list_beside_the_session_hash():
+    store = make_store()
+    assert store.redis_available
+    assert store.create_session("s1", {"current_phase": "planning"})
+    for i in range(SESSION_HISTORY_MAX + 5):
+        assert store.add_message_to_history("s1", message(i))
+    assert store.update_session("s1", {"project_context": {"projectName": "Billing"}})
+
+    client = store.redis_client
+    assert client.type("session:s1") == "hash" and client.type("session_history:s1") == "list"
+    assert client.llen("session_history:s1") == SESSION_HISTORY_MAX
+    assert 0 < client.ttl("session:s1") <= SESSION_TTL_SECONDS and 0 < client.ttl("session_history:s1") <= SESSION_TTL_SECONDS
+
+    session = store.get_session("s1")
+    assert [m["message"] for m in session["conversation_history"]][0] == "reply 5"
+    assert session["current_phase"] == "planning" and session["project_context"] == {"projectName": "Billing"}
+    assert store.get_active_sessions() == ["s1"]
+
+    # Replacing the history through update_session replaces the list
+    assert store.update_session("s1", {"conversation_history": [message(99)]})
+    assert [m["message"] for m in store.get_session("s1")["conversation_history"]] == ["reply 99"]
+
+    assert store.delete_session("s1") and store.get_session("s1") is None
+    assert client.keys("*") == []
+
+
+def test_writes_to_a_missing_session_leave_nothing_behind():
+    store = make_store()
+    assert not store.add_message_to_history("ghost", message(1))
+    assert not store.update_session("ghost", {"current_phase": "design"})
+    assert store.redis_client.keys("*") == []
+
+    # A session deleted after it had history isn't brought back by a later write
+    store.create_session("s1")
+    assert store.add_message_to_history("s1", message(1))
+    assert store.redis_client.delete("session:s1", "session_history:s1") == 2
+    assert not store.add_message_to_history("s1", message(2))
+    assert not store.update_session("s1", {"conversation_history": [message(3)]})
+    assert store.redis_client.keys("*") == []
+
+
+def test_legacy_json_sessions_are_migrated_on_read():
+    store = make_store()
+    legacy = {"created_at": "2025-01-01T00:00:00", "conversation_history": [message(1)], "current_phase": "testing"}
+    store.redis_client.setex("session:old", 3600, json.dumps(legacy))
+
+    session = store.get_session("old")
+    assert session["current_phase"] == "testing" and session["conversation_history"] == [message(1)]
+    assert store.redis_client.type("session:old") == "hash"
+    assert store.add_message_to_history("old", message(2))
+    assert len(store.get_session("old")["conversation_history"]) == 2
+
+
+def test_memory_fallback_keeps_the_same_cap():
+    store = SessionManager.__new__(SessionManager)
+    store.redis_available, store.memory_storage = False, {}
+    store.create_session("s1")
+    for i in range(SESSION_HISTORY_MAX + 3):
+        store.add_message_to_history("s1", message(i))
+    history = store.get_session("s1")["conversation_history"]
+    assert len(history) == SESSION_HISTORY_MAX and history[0]["message"] == "reply 3"
+    assert not store.add_message_to_history("ghost", message(1))
+
+
+if __name__ == "__main__":
+    tests = [
+        test_history_is_a_capped_list_beside_the_session_hash,
+        test_writes_to_a_missing_session_leave_nothing_behind,
+        test_legacy_json_sessions_are_migrated_on_read,
+        test_memory_fallback_keeps_the_same_cap,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All session store tests passed")
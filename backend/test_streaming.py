@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental agent reply streaming over the WebSocket protocol
+"""
+
+import asyncio
+import json
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.websocket_manager import WebSocketManager, AgentResponseStream, AgentStreams
+from agents.requirements_analyst import RequirementsAnalyst
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append(json.loads(text))
+
+
+def make_manager():
+    manager = WebSocketManager()
+    socket = RecordingSocket()
+    manager.active_connections["s1"] = socket
+    return manager, socket
+
+
+class TokenManager:
+    """Provider stub that streams one word at a time"""
+
+    model_mapping = {}
+
+    def __init__(self, words):
+        self.words = words
+
+    async def stream_completion(self, **kwargs):
+        for i, word in enumerate(self.words):
+            await asyncio.sleep(0.01)
+            yield word if i == 0 else " " + word
+
+
+def test_small_deltas_are_coalesced_by_size():
+    async def run():
+        manager, socket = make_manager()
+        stream = AgentResponseStream(manager, "s1", "Messi", flush_interval=10, flush_chars=10)
+        await stream.start()
+        for _ in range(25):
+            await stream.push("ab")
+        final = await stream.end()
+        types = [f["type"] for f in socket.frames]
+        assert types[0] == "agent_response_start" and types[-1] == "agent_response_end"
+        deltas = [f for f in socket.frames if f["type"] == "agent_response_delta"]
+        assert len(deltas) == 5
+        assert "".join(d["delta"] for d in deltas) == final == "ab" * 25
+        assert [d["seq"] for d in deltas] == [1, 2, 3, 4, 5]
+        assert len({f["message_id"] for f in socket.frames}) == 1
+
+    asyncio.run(run())
+
+
+def test_trailing_delta_flushed_after_interval():
+    async def run():
+        manager, socket = make_manager()
+        stream = AgentResponseStream(manager, "s1", "Messi", flush_interval=0.02, flush_chars=1000)
+        await stream.start()
+        await stream.push("Hello")
+        await stream.push(" world")
+        assert len(socket.frames) == 1  # only the start frame so far
+        await asyncio.sleep(0.05)
+        assert socket.frames[-1]["type"] == "agent_response_delta"
+        assert socket.frames[-1]["delta"] == "Hello world"
+        await stream.end("Hello world")
+        assert socket.frames[-1]["message"] == "Hello world"
+        assert socket.frames[-1]["ttft_ms"] is not None
+
+    asyncio.run(run())
+
+
+def test_agent_streams_tokens_and_returns_full_text():
+    async def run():
+        manager, socket = make_manager()
+        agent_streams = AgentStreams(manager, "s1", label=lambda key: key.title())
+        agent = RequirementsAnalyst()
+        agent._groq_manager = TokenManager(["Here", "are", "the", "requirements"])
+        result = await agent.process_request("List requirements", {"stream_handler": agent_streams.handler})
+        assert result == "Here are the requirements"
+        assert socket.frames[0]["type"] == "agent_response_start"
+        assert socket.frames[0]["agent"] == "Requirements_Analyst"
+        assert await agent_streams.finish("requirements_analyst", result)
+        assert socket.frames[-1]["type"] == "agent_response_end"
+        assert socket.frames[-1]["message"] == result
+        streamed = "".join(f["delta"] for f in socket.frames if f["type"] == "agent_response_delta")
+        assert streamed == result
+        # Nothing streamed for an agent that never ran, so callers fall back to agent_response
+        assert not await agent_streams.finish("developer", "x")
+
+    asyncio.run(run())
+
+
+def test_failing_client_does_not_break_agent():
+    async def run():
+        def broken_handler(role):
+            async def on_token(delta):
+                raise RuntimeError("socket closed")
+            return on_token
+
+        agent = RequirementsAnalyst()
+        agent._groq_manager = TokenManager(["still", "answers"])
+        result = await agent.process_request("hi", {"stream_handler": broken_handler})
+        assert result == "still answers"
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_small_deltas_are_coalesced_by_size,
+        test_trailing_delta_flushed_after_interval,
+        test_agent_streams_tokens_and_returns_full_text,
+        test_failing_client_does_not_break_agent,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All streaming tests passed")
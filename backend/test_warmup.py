@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for concurrent model warm-up and the readiness status behind /ready
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from utils.completion_cache import CompletionCache
+from test_completion_cache import make_manager
+
+
+class WarmupCompletions:
+    """First call per model is slow (cold), later calls are fast; one model can be made to fail"""
+
+    def __init__(self, cold=0.2, warm=0.01, failing=()):
+        self.cold, self.warm, self.failing = cold, warm, set(failing)
+        self.calls = []
+
+    async def create(self, model, **kwargs):
+        if model in self.failing:
+            raise RuntimeError("model unavailable")
+        await asyncio.sleep(self.warm if model in self.calls else self.cold)
+        self.calls.append(model)
+        return SimpleNamespace(choices=[])
+
+
+def make_warmup_manager(**kwargs):
+    manager = make_manager(CompletionCache(max_entries=10, max_bytes=100_000, ttl=60))
+    manager.client.chat.completions = WarmupCompletions(**kwargs)
+    return manager
+
+
+def test_models_warm_concurrently_with_cold_and_warm_latency():
+    async def run():
+        manager = make_warmup_manager()
+        models = set(manager.model_mapping.values())
+        assert not manager.is_ready() and manager.warmup_status()["status"] == "warming"
+
+        start = time.perf_counter()
+        status = await manager.warm_up_models()
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.2 * 2  # concurrent, not 0.2s per model
+        assert sorted(manager.client.chat.completions.calls) == sorted(list(models) * 2)
+
+        assert status["ready"] and status["status"] == "ready"
+        assert set(status["models"]) == models
+        for model in status["models"].values():
+            assert model["state"] == "ready"
+            assert model["cold_ms"] > model["warm_ms"]
+
+    asyncio.run(run())
+
+
+def test_failed_or_slow_models_degrade_but_do_not_block_readiness():
+    async def run():
+        manager = make_warmup_manager(cold=5, failing={"openai/gpt-oss-20b"})
+        status = await manager.warm_up_models(timeout=0.1)
+        assert status["ready"] and status["status"] == "degraded"
+        assert status["models"]["openai/gpt-oss-20b"]["error"] == "model unavailable"
+        assert status["models"]["llama-3.1-8b-instant"]["error"].startswith("timed out")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_models_warm_concurrently_with_cold_and_warm_latency,
+        test_failed_or_slow_models_degrade_but_do_not_block_readiness,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n🎉 All warm-up tests passed")
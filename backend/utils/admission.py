@@ -0,0 +1,144 @@
+# utils/admission.py
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict
+
+from utils.bulkhead import PRIORITY_WEIGHTS, DEFAULT_PRIORITY
+
+# Chat requests the backend can work on at once before new ones start queuing
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", 8))
+# Shed a request when its predicted queue wait is longer than this
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 10))
+# Throughput is measured over the completions of the last this many seconds
+ADMISSION_WINDOW = float(os.getenv("ADMISSION_WINDOW", 60))
+# Assumed request duration until enough requests have completed to measure it
+ADMISSION_DEFAULT_SERVICE_SECONDS = float(os.getenv("ADMISSION_DEFAULT_SERVICE_SECONDS", 8))
+ADMISSION_MIN_SAMPLES = 5
+RETRY_AFTER_MAX = 120
+
+
+@dataclass
+class Admission:
+    """Outcome of an admission check; admitted requests must be released when they finish"""
+    admitted: bool
+    priority: str
+    predicted_wait: float
+    retry_after: int = 0
+    entry: str = ""
+    started: float = field(default_factory=time.monotonic)
+    released: bool = False
+
+    def busy_frame(self) -> Dict[str, Any]:
+        """Structured reply for a shed request, sent instead of running it"""
+        return {
+            "type": "busy",
+            "retry_after": self.retry_after,
+            "predicted_wait": round(self.predicted_wait, 1),
+            "priority": self.priority,
+            "details": f"The team is at capacity right now. Please retry in {self.retry_after}s.",
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+class AdmissionController:
+    """
+    Admission control at the chat entry points (WebSocket messages and /api/chat).
+
+    Queue wait is predicted from live numbers: requests already in flight that
+    rank at or above the new one's class (direct calls jump team work in the
+    bulkhead, so they only queue behind each other), less the capacity, divided
+    by measured throughput. Until enough requests have completed, throughput
+    is assumed from ADMISSION_DEFAULT_SERVICE_SECONDS. Requests whose predicted
+    wait exceeds the budget are shed straight away with a retry-after instead
+    of piling up until the client gives up.
+    """
+
+    def __init__(self, capacity: int = None, max_wait: float = None, window: float = None):
+        self.capacity = capacity or ADMISSION_CAPACITY
+        self.max_wait = ADMISSION_MAX_WAIT if max_wait is None else max_wait
+        self.window = window or ADMISSION_WINDOW
+
+        self.in_flight: Dict[str, int] = {}
+        self._completions: Deque[float] = deque()
+        self._service_times: Deque[float] = deque(maxlen=200)
+
+        self.admitted = 0
+        self.shed: Dict[str, Dict[str, int]] = {}  # entry point -> priority -> count
+
+    def throughput(self) -> float:
+        """
+        Requests completed per second: the measured completion rate, or capacity over the
+        mean request duration (Little's law) when that is higher - a quiet window undercounts
+        what the backend can do, and a busy one is what it just did.
+        """
+        now = time.monotonic()
+        while self._completions and self._completions[0] < now - self.window:
+            self._completions.popleft()
+        if len(self._service_times) < ADMISSION_MIN_SAMPLES:
+            return self.capacity / ADMISSION_DEFAULT_SERVICE_SECONDS
+        service = sum(self._service_times) / len(self._service_times)
+        estimate = self.capacity / max(service, 0.001)
+        if len(self._completions) >= ADMISSION_MIN_SAMPLES:
+            measured = len(self._completions) / max(now - self._completions[0], 1.0)
+            return max(measured, estimate)
+        return estimate
+
+    def predict_wait(self, priority: str = None) -> float:
+        """Seconds a new request of this class would queue before it starts"""
+        weight = PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS[DEFAULT_PRIORITY])
+        ahead = sum(n for p, n in self.in_flight.items() if PRIORITY_WEIGHTS.get(p, 0) >= weight)
+        queued = ahead + 1 - self.capacity
+        return queued / self.throughput() if queued > 0 else 0.0
+
+    def try_admit(self, priority: str = None, entry: str = "ws", max_wait: float = None) -> Admission:
+        priority = priority if priority in PRIORITY_WEIGHTS else DEFAULT_PRIORITY
+        budget = self.max_wait if max_wait is None else max_wait
+        wait = self.predict_wait(priority)
+        if wait > budget:
+            by_entry = self.shed.setdefault(entry, {})
+            by_entry[priority] = by_entry.get(priority, 0) + 1
+            retry_after = min(RETRY_AFTER_MAX, max(1, math.ceil(wait - budget)))
+            print(f"[ADMISSION] Shedding {priority} request at {entry}: predicted wait {wait:.1f}s > {budget:.1f}s")
+            return Admission(False, priority, wait, retry_after, entry)
+        self.in_flight[priority] = self.in_flight.get(priority, 0) + 1
+        self.admitted += 1
+        return Admission(True, priority, wait, 0, entry)
+
+    def release(self, admission: Admission) -> None:
+        """Record an admitted request as finished (safe to call more than once)"""
+        if not admission.admitted or admission.released:
+            return
+        admission.released = True
+        self.in_flight[admission.priority] -= 1
+        if not self.in_flight[admission.priority]:
+            del self.in_flight[admission.priority]
+        now = time.monotonic()
+        self._completions.append(now)
+        self._service_times.append(now - admission.started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "max_wait_seconds": self.max_wait,
+            "in_flight": sum(self.in_flight.values()),
+            "in_flight_by_class": dict(self.in_flight),
+            "throughput_per_second": round(self.throughput(), 3),
+            "predicted_wait_seconds": {p: round(self.predict_wait(p), 2) for p in PRIORITY_WEIGHTS},
+            "admitted": self.admitted,
+            "shed": sum(n for by_class in self.shed.values() for n in by_class.values()),
+            "shed_by_entry": {entry: dict(by_class) for entry, by_class in self.shed.items()},
+        }
+
+
+_admission_instance = None
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create the process-wide admission controller"""
+    global _admission_instance
+    if _admission_instance is None:
+        _admission_instance = AdmissionController()
+    return _admission_instance
@@ -0,0 +1,264 @@
+# utils/bulkhead.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Agent calls running at once across the whole process
+BULKHEAD_MAX_CONCURRENT = int(os.getenv("BULKHEAD_MAX_CONCURRENT", 32))
+# ...for any one session: one full team fan-out, so calling the whole team again queues behind yourself
+BULKHEAD_PER_SESSION = int(os.getenv("BULKHEAD_PER_SESSION", 7))
+# ...for any one agent role, so one popular agent can't crowd the others out
+BULKHEAD_PER_ROLE = int(os.getenv("BULKHEAD_PER_ROLE", 8))
+# Calls allowed to wait for a slot; beyond this they are rejected straight away
+BULKHEAD_MAX_QUEUE = int(os.getenv("BULKHEAD_MAX_QUEUE", 64))
+# Longest a call waits for a slot (less if the request deadline is sooner)
+BULKHEAD_MAX_WAIT = float(os.getenv("BULKHEAD_MAX_WAIT", 30))
+# How often a queued call re-reports its position while it waits
+BULKHEAD_STATUS_INTERVAL = 1.0
+
+# Share of freed slots each request class gets while several are waiting. Direct and
+# smart-selected single-agent replies are interactive; team fan-outs and document runs
+# are batch work that soaks up whatever capacity the interactive calls leave idle.
+PRIORITY_WEIGHTS = {"direct": 8, "smart": 4, "team": 2, "document": 1}
+DEFAULT_PRIORITY = "smart"
+
+
+def request_priority(route: str, uploaded_files: list = None) -> str:
+    """Request class for a routing decision (direct / smart / default / team / collaboration)"""
+    if route in ("team", "collaboration"):
+        return "document" if uploaded_files else "team"
+    return route if route in PRIORITY_WEIGHTS else DEFAULT_PRIORITY
+
+
+class BulkheadFull(Exception):
+    """Raised when an agent call can't get a slot: the wait queue is full or the wait ran out"""
+
+    def __init__(self, message: str, role: str = "", priority: str = DEFAULT_PRIORITY, retry_after: int = 1):
+        super().__init__(message)
+        self.role = role
+        self.priority = priority
+        self.retry_after = retry_after
+
+    def busy_frame(self, agent: str = None) -> Dict[str, Any]:
+        """Structured reply for an agent call that never ran, sent instead of an agent response"""
+        agent = agent or self.role
+        return {
+            "type": "busy",
+            "agent": agent,
+            "retry_after": self.retry_after,
+            "priority": self.priority,
+            "details": f"{agent} is at capacity right now ({self}). Please retry in {self.retry_after}s.",
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+class _Waiter:
+    __slots__ = ("session_id", "role", "priority", "tag", "future")
+
+    def __init__(self, session_id: Optional[str], role: str, priority: str, tag: Tuple[float, int]):
+        self.session_id = session_id
+        self.role = role
+        self.priority = priority
+        self.tag = tag  # (virtual finish time, arrival number) - arrival order breaks ties
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class Bulkhead:
+    """
+    Concurrency limits for agent calls: one global cap, one per session and one
+    per role, with a bounded priority wait queue in front of them.
+
+    A call runs once all three limits have room. Otherwise it waits in line, and
+    whenever a slot frees up every queued call that now fits is admitted - a
+    call blocked only by its own session's cap doesn't hold up other sessions.
+    When the queue is full, or a call has waited max_wait (or its deadline), it
+    fails fast with BulkheadFull rather than letting latency collapse for everyone.
+
+    The line is ordered by weighted fair queuing: each waiter gets a virtual
+    finish tag of 1/weight past the later of "now" and its own session's last
+    tag in that class. Interactive classes get most freed slots, a session
+    queuing seven team calls takes turns with other sessions' team calls, and
+    nothing starves because the virtual clock keeps advancing.
+    """
+
+    def __init__(self, max_concurrent: int = None, per_session: int = None, per_role: int = None,
+                 max_queue: int = None, max_wait: float = None, weights: Dict[str, float] = None):
+        self.max_concurrent = max_concurrent or BULKHEAD_MAX_CONCURRENT
+        self.per_session = per_session or BULKHEAD_PER_SESSION
+        self.per_role = per_role or BULKHEAD_PER_ROLE
+        self.max_queue = BULKHEAD_MAX_QUEUE if max_queue is None else max_queue
+        self.max_wait = BULKHEAD_MAX_WAIT if max_wait is None else max_wait
+        self.weights = weights or PRIORITY_WEIGHTS
+
+        self.active = 0
+        self.by_session: Dict[str, int] = {}
+        self.by_role: Dict[str, int] = {}
+        self._queue: List[_Waiter] = []
+        self._virtual_time = 0.0
+        self._last_tag: Dict[Tuple[Optional[str], str], float] = {}
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.peak_queue = 0
+        self.class_waits: Dict[str, Deque[float]] = {}
+
+    def _fits(self, session_id: Optional[str], role: str) -> bool:
+        return (self.active < self.max_concurrent
+                and self.by_role.get(role, 0) < self.per_role
+                and (session_id is None or self.by_session.get(session_id, 0) < self.per_session))
+
+    def _take(self, session_id: Optional[str], role: str) -> None:
+        self.active += 1
+        self.by_role[role] = self.by_role.get(role, 0) + 1
+        if session_id is not None:
+            self.by_session[session_id] = self.by_session.get(session_id, 0) + 1
+
+    def _wake(self) -> None:
+        """Hand freed slots to queued calls that fit, lowest finish tag first"""
+        for waiter in sorted(self._queue, key=lambda w: w.tag):
+            if self.active >= self.max_concurrent:
+                break
+            if waiter.future.done():
+                self._queue.remove(waiter)
+            elif self._fits(waiter.session_id, waiter.role):
+                self._queue.remove(waiter)
+                self._take(waiter.session_id, waiter.role)
+                self._virtual_time = max(self._virtual_time, waiter.tag[0])
+                waiter.future.set_result(True)
+        # Sessions whose last tag the clock has passed are back to a clean slate
+        for key in [k for k, tag in self._last_tag.items() if tag <= self._virtual_time]:
+            del self._last_tag[key]
+
+    def position(self, waiter: _Waiter) -> int:
+        """1-based place in the wait queue"""
+        return sum(1 for w in self._queue if w.tag <= waiter.tag)
+
+    async def acquire(self, role: str, session_id: Optional[str] = None, timeout: float = None,
+                      on_queued: Callable[[int], Awaitable[Any]] = None, priority: str = None) -> float:
+        """
+        Take a slot for one agent call, waiting in line if needed; returns seconds waited.
+        on_queued(position) is awaited when the call has to queue and again as it moves up.
+        """
+        priority = priority if priority in self.weights else DEFAULT_PRIORITY
+        if self._fits(session_id, role):
+            self._take(session_id, role)
+            self.admitted += 1
+            self._record_wait(priority, 0.0)
+            return 0.0
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFull(f"{len(self._queue)} agent calls already waiting", role, priority,
+                               self._retry_after(priority))
+
+        start = time.monotonic()
+        budget = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        key = (session_id, priority)
+        tag = max(self._virtual_time, self._last_tag.get(key, 0.0)) + 1.0 / self.weights[priority]
+        self._last_tag[key] = tag
+        self.queued += 1
+        waiter = _Waiter(session_id, role, priority, (tag, self.queued))
+        self._queue.append(waiter)
+        self.peak_queue = max(self.peak_queue, len(self._queue))
+
+        reported = None
+        try:
+            while not waiter.future.done():
+                position = self.position(waiter)
+                if on_queued is not None and position != reported:
+                    reported = position
+                    try:
+                        await on_queued(position)
+                    except Exception as e:
+                        print(f"[BULKHEAD] Could not report queue position: {e}")
+                    if waiter.future.done():
+                        break
+                left = budget - (time.monotonic() - start)
+                if left <= 0:
+                    self.timed_out += 1
+                    raise BulkheadFull(f"no {role} slot free within {budget:.1f}s", role, priority,
+                                       self._retry_after(priority))
+                await asyncio.wait({waiter.future}, timeout=min(left, BULKHEAD_STATUS_INTERVAL))
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(role, session_id)  # Admitted just as we gave up or were cancelled
+            else:
+                waiter.future.cancel()
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+            raise
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self._record_wait(priority, waited)
+        return waited
+
+    def _record_wait(self, priority: str, waited: float) -> None:
+        self.class_waits.setdefault(priority, deque(maxlen=500)).append(waited)
+
+    def wait_percentile(self, priority: str, pct: float) -> float:
+        """Seconds waited for a slot by recent calls of one class"""
+        samples = sorted(self.class_waits.get(priority, ()))
+        return samples[min(len(samples) - 1, int(len(samples) * pct))] if samples else 0.0
+
+    def _retry_after(self, priority: str) -> int:
+        """Whole seconds a rejected call should wait before retrying: its class's recent p95 wait"""
+        return max(1, math.ceil(self.wait_percentile(priority, 0.95)))
+
+    def release(self, role: str, session_id: Optional[str] = None) -> None:
+        self.active -= 1
+        self.by_role[role] -= 1
+        if not self.by_role[role]:
+            del self.by_role[role]
+        if session_id is not None:
+            self.by_session[session_id] -= 1
+            if not self.by_session[session_id]:
+                del self.by_session[session_id]
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, role: str, session_id: Optional[str] = None, timeout: float = None,
+                   on_queued: Callable[[int], Awaitable[Any]] = None, priority: str = None):
+        await self.acquire(role, session_id, timeout, on_queued, priority)
+        try:
+            yield
+        finally:
+            self.release(role, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "per_session": self.per_session,
+            "per_role": self.per_role,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "active_by_role": dict(self.by_role),
+            "active_sessions": len(self.by_session),
+            "waiting": len(self._queue),
+            "peak_waiting": self.peak_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": round(self.total_wait / self.queued, 3) if self.queued else 0.0,
+            "waiting_by_class": {p: sum(1 for w in self._queue if w.priority == p) for p in self.weights},
+            "p95_wait_seconds_by_class": {p: round(self.wait_percentile(p, 0.95), 3) for p in self.class_waits},
+        }
+
+
+_bulkhead_instance = None
+
+def get_bulkhead() -> Bulkhead:
+    """Get or create the process-wide agent call bulkhead"""
+    global _bulkhead_instance
+    if _bulkhead_instance is None:
+        _bulkhead_instance = Bulkhead()
+    return _bulkhead_instance
@@ -0,0 +1,266 @@
+# utils/completion_cache.py
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FlightAborted(Exception):
+    """Raised to requests waiting on an in-flight completion whose leader failed or was cancelled"""
+
+
+class RedisCompletionCache:
+    """
+    Shared second cache tier so completions are reused across uvicorn workers.
+
+    Values are zlib-compressed and base64-wrapped so they can live on the same
+    decode_responses client the SessionManager opens. Any Redis failure marks the
+    tier unavailable for a short back-off, during which lookups fall through to the
+    in-process tier and upstream, the same way SessionManager degrades to memory.
+    """
+
+    def __init__(self, redis_client, ttl: float = None, prefix: str = "completion:", retry_interval: float = 30.0):
+        self.redis_client = redis_client
+        self.ttl = int(ttl or float(os.getenv("COMPLETION_CACHE_REDIS_TTL", 3600)))
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.redis_available = True
+        self._retry_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+        self.bytes_stored = 0
+
+    @staticmethod
+    def encode(value: str) -> str:
+        return base64.b64encode(zlib.compress(value.encode("utf-8"), 6)).decode("ascii")
+
+    @staticmethod
+    def decode(payload) -> str:
+        if isinstance(payload, str):
+            payload = payload.encode("ascii")
+        return zlib.decompress(base64.b64decode(payload)).decode("utf-8")
+
+    def _usable(self) -> bool:
+        if self.redis_available:
+            return True
+        if time.time() >= self._retry_at:
+            self.redis_available = True  # Back-off elapsed, probe Redis again
+            return True
+        return False
+
+    def _mark_failed(self, error: Exception) -> None:
+        self.errors += 1
+        self.redis_available = False
+        self._retry_at = time.time() + self.retry_interval
+        print(f"[CACHE] Redis tier unavailable, using memory only for {self.retry_interval:.0f}s: {error}")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._usable():
+            return None
+        try:
+            payload = self.redis_client.get(self.prefix + key)
+        except Exception as e:
+            self._mark_failed(e)
+            return None
+        if payload is None:
+            self.misses += 1
+            return None
+        try:
+            value = self.decode(payload)
+        except Exception as e:
+            print(f"[CACHE] Dropping undecodable Redis entry {key[:12]}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if not self._usable():
+            return
+        payload = self.encode(value)
+        try:
+            self.redis_client.setex(self.prefix + key, self.ttl, payload)
+        except Exception as e:
+            self._mark_failed(e)
+            return
+        self.stores += 1
+        self.bytes_stored += len(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.redis_available,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "bytes_stored": self.bytes_stored,
+        }
+
+
+class CompletionCache:
+    """
+    In-process cache of finished LLM completions.
+
+    Entries are keyed on a digest of (model, full messages, temperature, max_tokens),
+    evicted LRU-first once either the entry or byte budget is exceeded, and expire
+    after a TTL. Identical concurrent requests share one upstream call through
+    single-flight registration: the first caller leads, the rest wait for its result.
+
+    An optional Redis tier (attach_redis) is consulted on local misses; hits there
+    are promoted into the local tier and new completions are written to both.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None):
+        self.max_entries = max_entries or int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", 512))
+        self.max_bytes = max_bytes or int(os.getenv("COMPLETION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+        self.ttl = ttl or float(os.getenv("COMPLETION_CACHE_TTL", 300))
+
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.shared: Optional[RedisCompletionCache] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.stores = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int) -> str:
+        """Digest of everything that determines the completion"""
+        payload = json.dumps(
+            [model, messages, temperature, max_tokens],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def attach_redis(self, redis_client, ttl: float = None) -> None:
+        """Enable the shared Redis tier on top of the in-process one"""
+        self.shared = RedisCompletionCache(redis_client, ttl=ttl)
+        print("[CACHE] Redis completion tier enabled")
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Check the local tier, then the shared tier, promoting shared hits locally"""
+        value = self.get(key)
+        if value is not None or self.shared is None:
+            return value
+        value = await asyncio.to_thread(self.shared.get, key)
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value, size = entry
+        if time.time() - stored_at >= self.ttl:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Never let one response flush the whole cache
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.time(), value, size)
+        self._bytes += size
+        self.stores += 1
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    # Single-flight coalescing
+
+    def inflight(self, key: str) -> Optional[asyncio.Future]:
+        """Future for an identical request already running, counted as a coalesced wait"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def start_flight(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def finish_flight(self, key: str, value: str, store: bool = True) -> None:
+        """Hand the value to waiting callers, and cache it unless store is False"""
+        future = self._inflight.pop(key, None)
+        if value and store:
+            self.put(key, value)
+            if self.shared is not None:
+                # Write-behind so the caller's stream isn't held up by Redis
+                asyncio.get_running_loop().run_in_executor(None, self.shared.put, key, value)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def abort_flight(self, key: str, error: BaseException) -> None:
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(FlightAborted(str(error) or type(error).__name__))
+            future.exception()  # Mark retrieved so an unwatched flight doesn't log a warning
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "stores": self.stores,
+            "inflight": len(self._inflight),
+            "redis": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+# Process-wide instance shared by every GroqModelManager
+_cache_instance = None
+
+def get_completion_cache() -> CompletionCache:
+    """Get or create the process-wide completion cache"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = CompletionCache()
+    return _cache_instance
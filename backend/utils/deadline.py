@@ -0,0 +1,67 @@
+# utils/deadline.py
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+# Whole-request budget, set at the WebSocket/HTTP entry point
+DEFAULT_REQUEST_BUDGET = float(os.getenv("REQUEST_DEADLINE_SECONDS", 45))
+# Conservative generation speed used to size max_tokens near the deadline
+DEADLINE_TOKENS_PER_SECOND = float(os.getenv("DEADLINE_TOKENS_PER_SECOND", 200))
+# Time reserved for the first token before any generation happens
+FIRST_TOKEN_RESERVE = float(os.getenv("DEADLINE_FIRST_TOKEN_RESERVE", 1.5))
+# Optional agents and rounds are only started with at least this much time left
+OPTIONAL_WORK_MIN_SECONDS = float(os.getenv("DEADLINE_OPTIONAL_MIN_SECONDS", 8))
+MIN_COMPLETION_TOKENS = 64
+
+
+class Deadline:
+    """
+    Request-scoped time budget.
+
+    Created once where a request enters (WebSocket message, HTTP call) and passed
+    down in the agent context as context["deadline"]. Agents use it to shrink
+    max_tokens and cut generation short, the router and workflow use it to skip
+    optional agents and rounds, and callers keep whatever partial results were
+    collected when it runs out.
+    """
+
+    def __init__(self, budget: float = None):
+        self.budget = DEFAULT_REQUEST_BUDGET if budget is None else budget
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget
+
+    @staticmethod
+    def from_context(context: Optional[Dict[str, Any]]) -> Optional["Deadline"]:
+        return (context or {}).get("deadline")
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, seconds: float) -> bool:
+        """Whether work expected to take `seconds` still fits"""
+        return self.remaining() >= seconds
+
+    def allows_optional(self) -> bool:
+        return self.allows(OPTIONAL_WORK_MIN_SECONDS)
+
+    def cap_max_tokens(self, max_tokens: int) -> int:
+        """Shrink max_tokens so generation can finish before the deadline"""
+        budget = int((self.remaining() - FIRST_TOKEN_RESERVE) * DEADLINE_TOKENS_PER_SECOND)
+        return max(MIN_COMPLETION_TOKENS, min(max_tokens, budget))
+
+    async def run(self, awaitable: Awaitable[Any], default: Any = None) -> Any:
+        """Await within the remaining budget; on expiry cancel it and return `default`"""
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget:.1f}s, remaining={self.remaining():.1f}s)"
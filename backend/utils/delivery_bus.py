@@ -0,0 +1,256 @@
+# utils/delivery_bus.py
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.wire_protocol import dumps_json
+
+# "local" keeps every session on the worker it connected to (single process);
+# "redis" lets any uvicorn worker send frames to a session connected to another one
+WS_DELIVERY_BUS = os.getenv("WS_DELIVERY_BUS", "local")
+# How long a worker's claim on a session lasts in Redis without being renewed by a reconnect
+WS_OWNER_TTL = int(os.getenv("WS_OWNER_TTL", 3600))
+# Owner lookups are cached this long so a streamed reply doesn't ask Redis for every delta
+WS_OWNER_CACHE_SECONDS = float(os.getenv("WS_OWNER_CACHE_SECONDS", 2.0))
+
+Deliver = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LocalConnectionRegistry:
+    """Which worker holds each session's socket - in one process, always this one"""
+
+    def __init__(self, worker_id: str = None):
+        self.worker_id = worker_id or default_worker_id()
+        self.sessions: Dict[str, str] = {}
+
+    async def register(self, session_id: str) -> None:
+        self.sessions[session_id] = self.worker_id
+
+    def unregister(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+    async def owner(self, session_id: str) -> Optional[str]:
+        return self.sessions.get(session_id)
+
+    def forget(self, session_id: str) -> None:
+        """Drop any cached owner, e.g. after a publish found nobody listening"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "worker_id": self.worker_id, "sessions": len(self.sessions)}
+
+
+class RedisConnectionRegistry(LocalConnectionRegistry):
+    """
+    Session owners kept in Redis as <prefix>owner:<session_id> -> worker id.
+
+    A worker claims a session on connect and releases it on disconnect only if
+    the claim is still its own, so a client that reconnected to another worker
+    keeps the newer claim. Claims expire after WS_OWNER_TTL in case a worker
+    dies without cleaning up.
+    """
+
+    def __init__(self, redis_client, worker_id: str = None, prefix: str = "ws:", ttl: int = None,
+                 cache_seconds: float = None):
+        super().__init__(worker_id)
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.ttl = ttl or WS_OWNER_TTL
+        self.cache_seconds = WS_OWNER_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        self._cache: Dict[str, Tuple[Optional[str], float]] = {}
+
+        self.lookups = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}owner:{session_id}"
+
+    async def register(self, session_id: str) -> None:
+        await super().register(session_id)
+        try:
+            await self.redis_client.set(self._key(session_id), self.worker_id, ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"[BUS] Could not register session {session_id}: {e}")
+
+    def unregister(self, session_id: str) -> None:
+        super().unregister(session_id)
+        try:
+            asyncio.get_running_loop().create_task(self._release(session_id))
+        except RuntimeError:
+            pass  # No loop left (shutdown) - the claim expires on its own
+
+    async def _release(self, session_id: str) -> None:
+        try:
+            key = self._key(session_id)
+            owner = await self.redis_client.get(key)
+            if owner is not None and _text(owner) == self.worker_id and session_id not in self.sessions:
+                await self.redis_client.delete(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"[BUS] Could not release session {session_id}: {e}")
+
+    async def owner(self, session_id: str) -> Optional[str]:
+        if session_id in self.sessions:
+            return self.worker_id
+        cached = self._cache.get(session_id)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_seconds:
+            self.cache_hits += 1
+            return cached[0]
+        self.lookups += 1
+        try:
+            owner = await self.redis_client.get(self._key(session_id))
+        except Exception as e:
+            self.errors += 1
+            print(f"[BUS] Owner lookup failed for {session_id}: {e}")
+            return None
+        owner = _text(owner) if owner is not None else None
+        if len(self._cache) > 10000:
+            self._cache.clear()
+        self._cache[session_id] = (owner, time.monotonic())
+        return owner
+
+    def forget(self, session_id: str) -> None:
+        self._cache.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "backend": "redis", "lookups": self.lookups,
+                "cache_hits": self.cache_hits, "errors": self.errors}
+
+
+class LocalDeliveryBus:
+    """Frames for sessions on other workers - in one process there are none, so nothing is forwarded"""
+
+    name = "local"
+
+    def __init__(self, worker_id: str = None):
+        self.worker_id = worker_id or default_worker_id()
+        self.published = 0
+        self.received = 0
+        self.undeliverable = 0
+        self.errors = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, worker_id: str, session_id: str, data: Dict[str, Any]) -> bool:
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "worker_id": self.worker_id, "published": self.published,
+                "received": self.received, "undeliverable": self.undeliverable, "errors": self.errors}
+
+
+class RedisDeliveryBus(LocalDeliveryBus):
+    """
+    Redis pub/sub between workers: each worker subscribes to its own channel,
+    <prefix>worker:<worker id>, and frames for a session owned elsewhere are
+    published there as {"session": ..., "frame": ...}. One channel per worker
+    rather than per session keeps subscriptions flat however many sessions
+    connect. Frames travel unencoded; the owning worker encodes them with the
+    client's negotiated protocol.
+    """
+
+    name = "redis"
+
+    def __init__(self, redis_client, worker_id: str = None, prefix: str = "ws:"):
+        super().__init__(worker_id)
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def channel(self, worker_id: str) -> str:
+        return f"{self.prefix}worker:{worker_id}"
+
+    async def start(self, deliver: Deliver) -> None:
+        if self._listener is not None:
+            return
+        self._pubsub = self.redis_client.pubsub()
+        await self._pubsub.subscribe(self.channel(self.worker_id))
+        self._listener = asyncio.create_task(self._listen(deliver))
+        print(f"[BUS] Worker {self.worker_id} listening on {self.channel(self.worker_id)}")
+
+    async def _listen(self, deliver: Deliver) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"[BUS] Subscription error, retrying: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            self.received += 1
+            try:
+                envelope = json.loads(message["data"])
+                if not await deliver(envelope["session"], envelope["frame"]):
+                    self.undeliverable += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[BUS] Dropping undeliverable frame: {e}")
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe()
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def publish(self, worker_id: str, session_id: str, data: Dict[str, Any]) -> bool:
+        """Send a frame to the worker holding the session; False when no worker is listening there"""
+        try:
+            listeners = await self.redis_client.publish(self.channel(worker_id),
+                                                        dumps_json({"session": session_id, "frame": data}))
+        except Exception as e:
+            self.errors += 1
+            print(f"[BUS] Publish to {worker_id} failed: {e}")
+            return False
+        self.published += 1
+        return listeners > 0
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_delivery(kind: str = None, redis_client=None, worker_id: str = None):
+    """
+    Connection registry and delivery bus for WS_DELIVERY_BUS: the in-process
+    pair by default, or the Redis pair (on REDIS_HOST/REDIS_PORT/REDIS_DB) so
+    several uvicorn workers can serve the same sessions.
+    """
+    kind = kind or WS_DELIVERY_BUS
+    worker_id = worker_id or default_worker_id()
+    if kind != "redis":
+        return LocalConnectionRegistry(worker_id), LocalDeliveryBus(worker_id)
+    if redis_client is None:
+        import redis.asyncio as aioredis
+        redis_client = aioredis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            db=int(os.getenv("REDIS_DB", 0)),
+        )
+    return RedisConnectionRegistry(redis_client, worker_id), RedisDeliveryBus(redis_client, worker_id)
@@ -0,0 +1,56 @@
+# utils/fan_out.py
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+from utils.bulkhead import BulkheadFull
+
+
+@dataclass
+class AgentResult:
+    """One agent's reply from a fan-out, with how long it took from dispatch"""
+    agent: str
+    response: Any
+    latency_ms: float
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def busy(self) -> bool:
+        """The agent never ran: no bulkhead slot was free"""
+        return isinstance(self.error, BulkheadFull)
+
+
+async def as_completed(calls: Dict[str, Awaitable[Any]]) -> AsyncIterator[AgentResult]:
+    """
+    Run agent calls concurrently and yield each result as soon as it lands.
+
+    Unlike asyncio.gather the fastest agent's reply is available immediately
+    instead of waiting on the slowest. Failures are yielded as results with
+    `error` set rather than raised, so one agent can't sink the rest. If the
+    consumer stops early (or is cancelled) the calls still running are cancelled.
+    """
+    started = time.perf_counter()
+
+    async def timed(agent: str, call: Awaitable[Any]) -> AgentResult:
+        try:
+            response = await call
+            return AgentResult(agent, response, round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            return AgentResult(agent, None, round((time.perf_counter() - started) * 1000, 1), e)
+
+    pending = {asyncio.ensure_future(timed(agent, call)) for agent, call in calls.items()}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for result in sorted((task.result() for task in done), key=lambda r: r.latency_ms):
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,200 @@
+# utils/idempotency.py
+import asyncio
+import contextvars
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+# How long a finished request's result is replayed to retries with the same key
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 600))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 1000))
+
+# Frames the current request has sent so far; WebSocketManager appends to it when set
+recorded_frames: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar("recorded_frames", default=None)
+
+
+class _Flight:
+    __slots__ = ("key", "frames", "future")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.frames: List[dict] = []
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class IdempotencyStore:
+    """
+    Deduplicates retried chat requests by idempotency key.
+
+    A retry that arrives while the original is still running attaches to it
+    (WebSocket clients get the frames sent so far, then the rest as they
+    come; HTTP callers wait for the same response). A retry after it finished
+    replays the stored result for IDEMPOTENCY_TTL seconds. Results live in an
+    in-process LRU and, when attached, in Redis so retries landing on another
+    worker are answered too. Failed runs are not stored, so retrying them
+    runs again.
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None, prefix: str = "idempotency:"):
+        self.ttl = ttl or IDEMPOTENCY_TTL
+        self.max_entries = max_entries or IDEMPOTENCY_MAX_ENTRIES
+        self.prefix = prefix
+        self.redis_client = None
+        self._results: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+
+        self.started = 0
+        self.attached = 0
+        self.replayed = 0
+        self.stored = 0
+        self.not_stored = 0
+        self.redis_errors = 0
+
+    def attach_redis(self, redis_client) -> None:
+        """Also keep results in Redis (decode_responses client, as SessionManager opens)"""
+        self.redis_client = redis_client
+
+    async def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored result of a finished request, counted as a replay; Redis is read off the event loop"""
+        entry = self._results.get(key)
+        if entry is not None and entry[0] < time.time():
+            del self._results[key]
+            entry = None
+        if entry is None and self.redis_client is not None:
+            try:
+                payload = await asyncio.to_thread(self.redis_client.get, self.prefix + key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"[IDEMPOTENCY] Redis lookup failed, using memory only: {e}")
+                payload = None
+            if payload is not None:
+                entry = (time.time() + self.ttl, json.loads(payload))
+                self._remember(key, entry)
+        if entry is None:
+            return None
+        self._results.move_to_end(key)
+        self.replayed += 1
+        return entry[1]
+
+    def inflight(self, key: str) -> Optional[_Flight]:
+        """The running original for this key, counted as an attach"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.attached += 1
+        return flight
+
+    async def recorded(self, key: str) -> Optional[List[dict]]:
+        """
+        Frames to resend for a duplicate WebSocket request: the stored run's, or
+        what a still-running original has sent so far (the rest reaches the
+        session as it is sent). None when the key is new.
+        """
+        result = await self.lookup(key)
+        if result is not None:
+            return result["frames"]
+        flight = self.inflight(key)
+        return list(flight.frames) if flight is not None else None
+
+    def _remember(self, key: str, entry: Tuple[float, Dict[str, Any]]) -> None:
+        self._results[key] = entry
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def begin(self, key: str) -> _Flight:
+        """Register a new key as in flight, before its task gets to run"""
+        flight = self._flights[key] = _Flight(key)
+        self.started += 1
+        return flight
+
+    def _finish(self, flight: _Flight, result: Optional[Dict[str, Any]], store: bool) -> bool:
+        """Hand the result to attached retries; True when it was stored and should be shared"""
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        if flight.future.done():
+            return False
+        flight.future.set_result(result)
+        if not store:
+            self.not_stored += 1
+            return False
+        self._remember(flight.key, (time.time() + self.ttl, result))
+        self.stored += 1
+        return True
+
+    async def _share(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result in Redis for retries landing on other workers, off the event loop"""
+        if self.redis_client is None:
+            return
+        try:
+            await asyncio.to_thread(self.redis_client.setex, self.prefix + key, int(self.ttl),
+                                    json.dumps(result, default=str))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"[IDEMPOTENCY] Could not store {key[:32]} in Redis: {e}")
+
+    def abandon(self, flight: _Flight) -> None:
+        """Release a flight whose task ended without running it (e.g. cancelled while queued)"""
+        self._finish(flight, None, store=False)
+
+    async def run(self, key: str, coro: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run an HTTP request body for a new key. The result ({"status", "body"}) is
+        handed to attached retries and stored unless it is a 5xx.
+        """
+        flight = self.begin(key)
+        try:
+            result = await coro
+        except BaseException:
+            self.abandon(flight)
+            raise
+        if self._finish(flight, result, store=result.get("status", 200) < 500):
+            await self._share(key, result)
+        return result
+
+    async def join(self, flight: _Flight) -> Optional[Dict[str, Any]]:
+        """Wait for an attached original; None if it failed without a result"""
+        return await asyncio.shield(flight.future)
+
+    async def record(self, flight: _Flight, coro: Awaitable[Any]) -> Any:
+        """
+        Run a WebSocket request begun under flight, recording the frames it sends
+        (deltas aside - end frames carry the full text). Runs that sent an
+        error frame, failed or were cancelled are not stored.
+        """
+        token = recorded_frames.set(flight.frames)
+        try:
+            result = await coro
+        except BaseException:
+            self.abandon(flight)
+            raise
+        finally:
+            recorded_frames.reset(token)
+        failed = any(f.get("type") == "error" or f.get("status") in ("error", "cancelled") for f in flight.frames)
+        if self._finish(flight, {"frames": flight.frames}, store=not failed):
+            await self._share(flight.key, {"frames": flight.frames})
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._results),
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "stored": self.stored,
+            "not_stored": self.not_stored,
+            "redis": self.redis_client is not None,
+            "redis_errors": self.redis_errors,
+        }
+
+
+_store_instance = None
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get or create the process-wide idempotency store"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = IdempotencyStore()
+    return _store_instance
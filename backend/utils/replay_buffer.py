@@ -0,0 +1,152 @@
+# utils/replay_buffer.py
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# How long a dropped session's requests keep running, and its frames stay buffered, waiting for a reconnect
+WS_RESUME_GRACE = float(os.getenv("WS_RESUME_GRACE", 30))
+# Approximate bytes of recent frames kept per session for replay after a reconnect
+WS_REPLAY_BUFFER_BYTES = int(os.getenv("WS_REPLAY_BUFFER_BYTES", 256 * 1024))
+# Cap across all sessions; the least recently active sessions lose their oldest frames first
+WS_REPLAY_BUFFER_TOTAL_BYTES = int(os.getenv("WS_REPLAY_BUFFER_TOTAL_BYTES", 64 * 1024 * 1024))
+
+
+def _frame_size(frame: Dict[str, Any]) -> int:
+    """Rough wire size - string lengths plus a flat cost per key"""
+    return 32 + sum(len(key) + (len(value) if isinstance(value, str) else 8) for key, value in frame.items())
+
+
+class _SessionFrames:
+    __slots__ = ("frames", "bytes", "last_seq", "evicted_through")
+
+    def __init__(self):
+        self.frames: Deque[Tuple[int, Dict[str, Any], int]] = deque()  # (frame_seq, frame, size)
+        self.bytes = 0
+        self.last_seq = 0
+        self.evicted_through = 0
+
+
+class ReplayBuffer:
+    """
+    Recent outbound frames per session, numbered with a per-session frame_seq.
+
+    A client that reconnects with the last frame_seq it saw gets everything
+    after it replayed in order, then the live stream. Sessions are tracked from
+    connect until WS_RESUME_GRACE after they drop; frames sent meanwhile are
+    buffered for the reconnect. Each session keeps WS_REPLAY_BUFFER_BYTES of
+    its newest frames and all sessions together WS_REPLAY_BUFFER_TOTAL_BYTES;
+    a resume that reaches back past what was kept is reported incomplete so the
+    client can reload the history instead.
+    """
+
+    def __init__(self, max_bytes: int = None, max_total_bytes: int = None, grace: float = None):
+        self.max_bytes = max_bytes or WS_REPLAY_BUFFER_BYTES
+        self.max_total_bytes = max_total_bytes or WS_REPLAY_BUFFER_TOTAL_BYTES
+        self.grace = WS_RESUME_GRACE if grace is None else grace
+        self._sessions: "OrderedDict[str, _SessionFrames]" = OrderedDict()  # least recently active first
+        self._detached: "OrderedDict[str, float]" = OrderedDict()  # session -> when it dropped
+        self.total_bytes = 0
+
+        self.buffered = 0
+        self.evicted = 0
+        self.resumes = 0
+        self.replayed = 0
+        self.incomplete = 0
+
+    def attach(self, session_id: str) -> None:
+        """A client connected: start (or keep) numbering its frames"""
+        self._detached.pop(session_id, None)
+        if session_id not in self._sessions:
+            self._sessions[session_id] = _SessionFrames()
+        self._expire()
+
+    def detach(self, session_id: str) -> None:
+        """The client dropped: keep buffering for WS_RESUME_GRACE, then forget the session"""
+        if session_id in self._sessions:
+            self._detached[session_id] = time.monotonic()
+            self._detached.move_to_end(session_id)
+
+    def tracking(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def add(self, session_id: str, frame: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The frame stamped with its frame_seq and buffered, or None for a session not tracked here"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        entry.last_seq += 1
+        frame = {**frame, "frame_seq": entry.last_seq}
+        size = _frame_size(frame)
+        entry.frames.append((entry.last_seq, frame, size))
+        entry.bytes += size
+        self.total_bytes += size
+        self.buffered += 1
+        self._sessions.move_to_end(session_id)
+
+        while entry.bytes > self.max_bytes and len(entry.frames) > 1:
+            self._evict_oldest(entry)
+        if self.total_bytes > self.max_total_bytes:
+            self._expire()
+            for other in list(self._sessions.values()):
+                while other.frames and self.total_bytes > self.max_total_bytes:
+                    self._evict_oldest(other)
+                if self.total_bytes <= self.max_total_bytes:
+                    break
+        return frame
+
+    def _evict_oldest(self, entry: _SessionFrames) -> None:
+        seq, _, size = entry.frames.popleft()
+        entry.bytes -= size
+        entry.evicted_through = seq
+        self.total_bytes -= size
+        self.evicted += 1
+
+    def since(self, session_id: str, last_seq: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Frames after last_seq, and whether they are all of them - False when
+        older frames were evicted, or last_seq comes from a numbering this
+        buffer no longer has (server restart, another worker, grace expired)
+        """
+        self.resumes += 1
+        entry = self._sessions.get(session_id)
+        if entry is None or last_seq > entry.last_seq:
+            self.incomplete += 1
+            return [], False
+        frames = [frame for seq, frame, _ in entry.frames if seq > last_seq]
+        complete = last_seq >= entry.evicted_through
+        if not complete:
+            self.incomplete += 1
+        self.replayed += len(frames)
+        return frames, complete
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.grace
+        while self._detached:
+            session_id, dropped_at = next(iter(self._detached.items()))
+            if dropped_at > cutoff:
+                break
+            del self._detached[session_id]
+            self.forget(session_id)
+
+    def forget(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.bytes
+        self._detached.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire()
+        return {
+            "sessions": len(self._sessions),
+            "detached_sessions": len(self._detached),
+            "frames": sum(len(entry.frames) for entry in self._sessions.values()),
+            "bytes": self.total_bytes,
+            "max_bytes_per_session": self.max_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            "buffered": self.buffered,
+            "evicted": self.evicted,
+            "resumes": self.resumes,
+            "replayed_frames": self.replayed,
+            "incomplete_resumes": self.incomplete,
+        }
@@ -3,12 +3,57 @@ import redis
 import json
 from typing import Dict, Any, Optional, List
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
+
+# Sessions expire this long after they were last read or written
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 24 * 3600))
+# Messages kept in a session's conversation_history
+SESSION_HISTORY_MAX = int(os.getenv("SESSION_HISTORY_MAX", 50))
+
+HISTORY_FIELD = "conversation_history"
+
+# Writes to an existing session, checked and applied atomically server-side so a
+# deleted session is never recreated. KEYS: session hash, history list. ARGV: TTL,
+# history cap, "1" to replace the history, number of hash fields, the field/value
+# pairs, then the messages to RPUSH.
+WRITE_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local ttl, cap, nfields = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[4])
+local first_message = 5 + 2 * nfields
+if nfields > 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 5, first_message - 1))
+end
+if ARGV[3] == '1' then
+    redis.call('DEL', KEYS[2])
+end
+if #ARGV >= first_message then
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, first_message, #ARGV))
+    redis.call('LTRIM', KEYS[2], -cap, -1)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('EXPIRE', KEYS[2], ttl)
+return 1
+"""
+
 
 class SessionManager:
-    def __init__(self):
+    """
+    Session state in Redis, or in memory when Redis isn't reachable.
+
+    Each session is a hash, session:<id>, with one JSON-encoded value per
+    field, and its conversation_history is a list, session_history:<id>,
+    capped at SESSION_HISTORY_MAX with RPUSH + LTRIM. Writes touch only the
+    fields that changed, and every read or write refreshes both TTLs with
+    EXPIRE in the same round trip as the data. A read is one pipelined
+    round trip; a write to an existing session is one EVALSHA of
+    WRITE_IF_EXISTS_SCRIPT, whatever the history length.
+    """
+
+    def __init__(self, redis_client=None):
         try:
-            self.redis_client = redis.Redis(
+            self.redis_client = redis_client or redis.Redis(
                 host=os.getenv("REDIS_HOST", "localhost"),
                 port=int(os.getenv("REDIS_PORT", 6379)),
                 db=int(os.getenv("REDIS_DB", 0)),
@@ -18,6 +63,9 @@ class SessionManager:
             )
             # Test the connection
             self.redis_client.ping()
+            # Loaded up front so the first write is already an EVALSHA hit
+            self._write_if_exists_script = self.redis_client.register_script(WRITE_IF_EXISTS_SCRIPT)
+            self.redis_client.script_load(WRITE_IF_EXISTS_SCRIPT)
             self.redis_available = True
             print("Redis connection established")
         except (redis.ConnectionError, redis.TimeoutError, Exception):
@@ -25,6 +73,37 @@ class SessionManager:
             self.redis_available = False
             self.memory_storage = {}
 
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _history_key(session_id: str) -> str:
+        return f"session_history:{session_id}"
+
+    def _write(self, pipe, session_id: str, fields: Dict[str, Any]) -> None:
+        """Queue writes of changed fields (a conversation_history value replaces the list) and the TTL refresh"""
+        key, history_key = self._key(session_id), self._history_key(session_id)
+        values = {name: json.dumps(value) for name, value in fields.items() if name != HISTORY_FIELD}
+        if values:
+            pipe.hset(key, mapping=values)
+        if HISTORY_FIELD in fields:
+            pipe.delete(history_key)
+            history = (fields[HISTORY_FIELD] or [])[-SESSION_HISTORY_MAX:]
+            if history:
+                pipe.rpush(history_key, *(json.dumps(message) for message in history))
+        pipe.expire(key, SESSION_TTL_SECONDS)
+        pipe.expire(history_key, SESSION_TTL_SECONDS)
+
+    def _write_if_exists(self, session_id: str, fields: Dict[str, Any], messages: List[Dict[str, Any]] = (),
+                         replace_history: bool = False) -> bool:
+        """Write hash fields and push messages in one script call; a missing session gets no writes"""
+        values = [item for name, value in fields.items() for item in (name, json.dumps(value))]
+        args = [SESSION_TTL_SECONDS, SESSION_HISTORY_MAX, int(replace_history), len(fields), *values,
+                *(json.dumps(message) for message in messages)]
+        keys = [self._key(session_id), self._history_key(session_id)]
+        return bool(self._write_if_exists_script(keys=keys, args=args))
+
     def create_session(self, session_id: str, initial_data: Dict[str, Any] = None) -> bool:
         """Create a new session with optional initial data"""
         try:
@@ -41,11 +120,10 @@ class SessionManager:
                 session_data.update(initial_data)
 
             if self.redis_available:
-                self.redis_client.setex(
-                    f"session:{session_id}",
-                    timedelta(hours=24),  # 24 hour expiry
-                    json.dumps(session_data)
-                )
+                pipe = self.redis_client.pipeline()
+                pipe.delete(self._key(session_id), self._history_key(session_id))
+                self._write(pipe, session_id, session_data)
+                pipe.execute()
             else:
                 self.memory_storage[session_id] = session_data
             return True
@@ -54,19 +132,23 @@ class SessionManager:
             return False
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Retrieve session data"""
+        """Retrieve session data; reading refreshes the TTL without rewriting anything"""
         try:
             if self.redis_available:
-                data = self.redis_client.get(f"session:{session_id}")
-                if data:
-                    session_data = json.loads(data)
-                    # Update last activity
+                key, history_key = self._key(session_id), self._history_key(session_id)
+                pipe = self.redis_client.pipeline()
+                pipe.hgetall(key)
+                pipe.lrange(history_key, 0, -1)
+                pipe.expire(key, SESSION_TTL_SECONDS)
+                pipe.expire(history_key, SESSION_TTL_SECONDS)
+                try:
+                    fields, history, _, _ = pipe.execute()
+                except redis.ResponseError:
+                    return self._migrate_legacy(session_id)
+                if fields:
+                    session_data = {name: json.loads(value) for name, value in fields.items()}
+                    session_data[HISTORY_FIELD] = [json.loads(message) for message in history]
                     session_data["last_activity"] = datetime.now().isoformat()
-                    self.redis_client.setex(
-                        f"session:{session_id}",
-                        timedelta(hours=24),
-                        json.dumps(session_data)
-                    )
                     return session_data
             else:
                 if session_id in self.memory_storage:
@@ -79,44 +161,55 @@ class SessionManager:
             print(f"Error retrieving session: {e}")
             return None
 
+    def _migrate_legacy(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Rewrite a session stored as one JSON string (before the hash layout) and return it"""
+        data = self.redis_client.get(self._key(session_id))
+        if not data:
+            return None
+        session_data = json.loads(data)
+        session_data["last_activity"] = datetime.now().isoformat()
+        pipe = self.redis_client.pipeline()
+        pipe.delete(self._key(session_id), self._history_key(session_id))
+        self._write(pipe, session_id, session_data)
+        pipe.execute()
+        print(f"[SESSION] Migrated session {session_id} to the hash layout")
+        return session_data
+
     def update_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
         """Update session data"""
         try:
-            session_data = self.get_session(session_id)
-            if session_data:
-                session_data.update(updates)
-                session_data["last_activity"] = datetime.now().isoformat()
-
-                if self.redis_available:
-                    self.redis_client.setex(
-                        f"session:{session_id}",
-                        timedelta(hours=24),
-                        json.dumps(session_data)
-                    )
-                else:
-                    self.memory_storage[session_id] = session_data
-                return True
-            return False
+            updates = {**updates, "last_activity": datetime.now().isoformat()}
+            if self.redis_available:
+                fields = {name: value for name, value in updates.items() if name != HISTORY_FIELD}
+                history = (updates.get(HISTORY_FIELD) or [])[-SESSION_HISTORY_MAX:]
+                return self._write_if_exists(session_id, fields, history, replace_history=HISTORY_FIELD in updates)
+
+            session_data = self.memory_storage.get(session_id)
+            if session_data is None:
+                return False
+            session_data = {**session_data, **updates}
+            if HISTORY_FIELD in updates:
+                session_data[HISTORY_FIELD] = list(updates[HISTORY_FIELD] or [])[-SESSION_HISTORY_MAX:]
+            self.memory_storage[session_id] = session_data
+            return True
         except Exception as e:
             print(f"Error updating session: {e}")
             return False
 
     def add_message_to_history(self, session_id: str, message: Dict[str, Any]) -> bool:
-        """Add a message to the conversation history"""
+        """Add a message to the conversation history, keeping the last SESSION_HISTORY_MAX"""
         try:
-            session_data = self.get_session(session_id)
-            if session_data:
-                if "conversation_history" not in session_data:
-                    session_data["conversation_history"] = []
-
-                session_data["conversation_history"].append(message)
-
-                # Keep only last 50 messages to prevent memory issues
-                if len(session_data["conversation_history"]) > 50:
-                    session_data["conversation_history"] = session_data["conversation_history"][-50:]
+            if self.redis_available:
+                return self._write_if_exists(session_id, {"last_activity": datetime.now().isoformat()}, [message])
 
-                return self.update_session(session_id, session_data)
-            return False
+            session_data = self.memory_storage.get(session_id)
+            if session_data is None:
+                return False
+            history = session_data.setdefault(HISTORY_FIELD, [])
+            history.append(message)
+            del history[:-SESSION_HISTORY_MAX]
+            session_data["last_activity"] = datetime.now().isoformat()
+            return True
         except Exception as e:
             print(f"Error adding message to history: {e}")
             return False
@@ -125,7 +218,7 @@ class SessionManager:
         """Delete a session"""
         try:
             if self.redis_available:
-                return bool(self.redis_client.delete(f"session:{session_id}"))
+                return bool(self.redis_client.delete(self._key(session_id), self._history_key(session_id)))
             else:
                 if session_id in self.memory_storage:
                     del self.memory_storage[session_id]
@@ -139,10 +232,10 @@ class SessionManager:
         """Get list of active session IDs"""
         try:
             if self.redis_available:
-                keys = self.redis_client.keys("session:*")
-                return [key.replace("session:", "") for key in keys]
+                # SCAN rather than KEYS so a large keyspace doesn't block Redis
+                return [key.replace("session:", "", 1) for key in self.redis_client.scan_iter(match="session:*", count=500)]
             else:
                 return list(self.memory_storage.keys())
         except Exception as e:
             print(f"Error getting active sessions: {e}")
-            return []
\ No newline at end of file
+            return []
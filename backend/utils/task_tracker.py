@@ -0,0 +1,176 @@
+# utils/task_tracker.py
+import asyncio
+import contextvars
+import os
+from typing import Any, Awaitable, Dict, Optional, Set
+
+# Session whose request the current task is working for. Tasks spawned underneath
+# (router fan-out, LangGraph nodes, hedged provider streams) inherit it.
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_session", default=None)
+# Id of the chat request the current task is working for; WebSocketManager echoes it on every frame
+current_request: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request", default=None)
+
+# Requests one session may have running at once; more wait for a free slot
+SESSION_MAX_CONCURRENT_REQUESTS = int(os.getenv("WS_MAX_CONCURRENT_REQUESTS", 3))
+
+
+class SessionTaskTracker:
+    """
+    Tracks the request tasks running for each WebSocket session so they can be
+    cancelled when the client disconnects or sends a request that supersedes them.
+
+    Cancelling the request task propagates down through the workflow, router
+    fan-out and provider streams. Streams torn down this way report the prompt and
+    completion tokens already spent, which are counted as wasted.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Set[asyncio.Task]] = {}
+        self._cancelling: Dict[str, str] = {}  # session_id -> reason while a cancel is in progress
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._orphaned: Dict[str, asyncio.TimerHandle] = {}  # session_id -> pending cancel after a disconnect
+
+        self.started = 0
+        self.reclaimed = 0
+        self.completed = 0
+        self.cancelled: Dict[str, int] = {}
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+        self.aborted_streams = 0
+
+    def spawn(self, session_id: str, coro: Awaitable[Any], after: Optional[asyncio.Task] = None, name: str = None,
+              request_id: str = None, limit: int = None) -> asyncio.Task:
+        """
+        Run a request for a session as a tracked task, optionally once `after` has finished,
+        or once fewer than `limit` of the session's requests are running.
+        """
+        if after is not None and not after.done():
+            coro = self._run_after(after, coro)
+        if limit:
+            slots = self._slots.get(session_id)
+            if slots is None:
+                slots = self._slots[session_id] = asyncio.Semaphore(limit)
+            coro = self._run_limited(slots, coro)
+        session_token = current_session.set(session_id)
+        request_token = current_request.set(request_id)
+        try:
+            task = asyncio.create_task(coro, name=name or f"request:{session_id}" + (f":{request_id}" if request_id else ""))
+        finally:
+            current_request.reset(request_token)
+            current_session.reset(session_token)
+        self._tasks.setdefault(session_id, set()).add(task)
+        self.started += 1
+        task.add_done_callback(lambda t: self._forget(session_id, t))
+        return task
+
+    @staticmethod
+    async def _run_after(after: asyncio.Task, coro: Awaitable[Any]) -> Any:
+        try:
+            await asyncio.wait([after])  # Finishes whether `after` succeeded, failed or was cancelled
+        except asyncio.CancelledError:
+            coro.close()  # Cancelled while queued: the request never started
+            raise
+        return await coro
+
+    @staticmethod
+    async def _run_limited(slots: asyncio.Semaphore, coro: Awaitable[Any]) -> Any:
+        try:
+            await slots.acquire()
+        except asyncio.CancelledError:
+            coro.close()  # Cancelled while waiting for a slot: the request never started
+            raise
+        try:
+            return await coro
+        finally:
+            slots.release()
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        tasks = self._tasks.get(session_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[session_id]
+                self._slots.pop(session_id, None)
+        if not task.cancelled():
+            self.completed += 1
+
+    def active(self, session_id: str) -> int:
+        return len(self._tasks.get(session_id, ()))
+
+    async def cancel(self, session_id: str, reason: str = "disconnect") -> int:
+        """Cancel every request running for a session and wait for them to unwind"""
+        tasks = [t for t in self._tasks.get(session_id, ()) if not t.done()]
+        if not tasks:
+            return 0
+        self._cancelling[session_id] = reason
+        try:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._cancelling.pop(session_id, None)
+        cancelled = sum(1 for t in tasks if t.cancelled())
+        self.cancelled[reason] = self.cancelled.get(reason, 0) + cancelled
+        print(f"[TASKS] Cancelled {cancelled} request(s) for {session_id} ({reason})")
+        return cancelled
+
+    async def cancel_after(self, session_id: str, grace: float, reason: str = "disconnect") -> int:
+        """
+        Cancel a dropped session's requests once grace seconds pass without
+        reclaim() - so a client that reconnects in time gets their replies
+        instead of a re-run. With no grace, or nothing running, cancels now.
+        """
+        if grace <= 0 or not self.active(session_id):
+            return await self.cancel(session_id, reason)
+        self.reclaim(session_id, count=False)
+        loop = asyncio.get_running_loop()
+        self._orphaned[session_id] = loop.call_later(grace, self._expire_orphan, session_id, reason)
+        print(f"[TASKS] {self.active(session_id)} request(s) for {session_id} keep running for {grace:.0f}s awaiting reconnect")
+        return 0
+
+    def _expire_orphan(self, session_id: str, reason: str) -> None:
+        self._orphaned.pop(session_id, None)
+        asyncio.ensure_future(self.cancel(session_id, reason))
+
+    def reclaim(self, session_id: str, count: bool = True) -> bool:
+        """A dropped session reconnected: keep its requests running"""
+        handle = self._orphaned.pop(session_id, None)
+        if handle is None:
+            return False
+        handle.cancel()
+        if count:
+            self.reclaimed += 1
+        return True
+
+    def record_aborted_stream(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Called by the provider when a stream is torn down before finishing"""
+        session_id = current_session.get()
+        if session_id is None or session_id not in self._cancelling:
+            return  # Not ours, e.g. a losing hedge or a single-flight leader handing over
+        self.aborted_streams += 1
+        self.wasted_prompt_tokens += prompt_tokens
+        self.wasted_completion_tokens += completion_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self._tasks),
+            "active_requests": sum(len(t) for t in self._tasks.values()),
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": dict(self.cancelled),
+            "awaiting_reconnect": len(self._orphaned),
+            "reclaimed": self.reclaimed,
+            "aborted_streams": self.aborted_streams,
+            "wasted_prompt_tokens": self.wasted_prompt_tokens,
+            "wasted_completion_tokens": self.wasted_completion_tokens,
+        }
+
+
+_tracker_instance = None
+
+def get_task_tracker() -> SessionTaskTracker:
+    """Get or create the process-wide session task tracker"""
+    global _tracker_instance
+    if _tracker_instance is None:
+        _tracker_instance = SessionTaskTracker()
+    return _tracker_instance
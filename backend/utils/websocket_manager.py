@@ -1,61 +1,512 @@
 # utils/websocket_manager.py
 from fastapi import WebSocket
-from typing import Dict, List
-import json
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import deque
 import asyncio
+import os
+import time
+import uuid
 from datetime import datetime
 
+from utils.wire_protocol import WireCodec, LEGACY_CODEC, get_codec, negotiate
+from utils.delivery_bus import LocalConnectionRegistry, LocalDeliveryBus
+from utils.task_tracker import current_request
+from utils.idempotency import recorded_frames
+from utils.replay_buffer import ReplayBuffer
+
+# Deltas are buffered until this much time has passed or this many characters are waiting
+STREAM_FLUSH_INTERVAL = float(os.getenv("WS_STREAM_FLUSH_INTERVAL", 0.05))
+STREAM_FLUSH_CHARS = int(os.getenv("WS_STREAM_FLUSH_CHARS", 256))
+# Frames waiting to go out to one client before it counts as too slow
+SEND_QUEUE_MAX = int(os.getenv("WS_SEND_QUEUE_MAX", 256))
+# A client whose socket takes longer than this to accept one frame is disconnected
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 10))
+# Status frames where only the newest queued one matters
+COALESCED_STATUSES = ("processing", "queued")
+
+
+class AgentResponseStream:
+    """
+    One agent reply streamed as agent_response_start / agent_response_delta /
+    agent_response_end frames sharing a message_id.
+
+    Tokens are coalesced so a burst of small deltas becomes one frame: the buffer
+    is sent once it reaches STREAM_FLUSH_CHARS, or STREAM_FLUSH_INTERVAL after the
+    first buffered token, whichever comes first. The end frame carries the full
+    message so clients that missed deltas still render the final text.
+    """
+
+    def __init__(self, manager: "WebSocketManager", session_id: str, agent_name: str, message_id: str = None,
+                 flush_interval: float = None, flush_chars: int = None):
+        self.manager = manager
+        self.session_id = session_id
+        self.agent_name = agent_name
+        self.message_id = message_id or uuid.uuid4().hex
+        self.request_id = current_request.get()
+        self.flush_interval = STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.flush_chars = flush_chars or STREAM_FLUSH_CHARS
+
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.frames = 0
+        self.seq = 0
+        self.closed = False
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._parts: List[str] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        await self.manager.send_frame(self.session_id, {
+            "type": "agent_response_start",
+            "message_id": self.message_id,
+            "agent": self.agent_name,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def push(self, delta: str) -> None:
+        if self.closed or not delta:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self._parts.append(delta)
+        self._buffer.append(delta)
+        self._buffered += len(delta)
+
+        if self._buffered >= self.flush_chars or self.flush_interval <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if self._timer is not None and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            delta = "".join(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+            self.seq += 1
+            self.frames += 1
+            await self.manager.send_delta(self.session_id, self.message_id, self.agent_name, self.seq, delta,
+                                          self.request_id)
+
+    async def end(self, message: str = None, **fields) -> str:
+        """Flush what is buffered and close the stream with the final message (plus any extra fields, e.g. latency_ms)"""
+        if self.closed:
+            return message if message is not None else "".join(self._parts)
+        await self.flush()
+        self.closed = True
+        final = message if message is not None else "".join(self._parts)
+        await self.manager.send_frame(self.session_id, {
+            "type": "agent_response_end",
+            "message_id": self.message_id,
+            "agent": self.agent_name,
+            "message": final,
+            "deltas": self.seq,
+            "ttft_ms": round((self.first_token_at - self.started_at) * 1000, 1) if self.first_token_at else None,
+            **fields,
+            "timestamp": datetime.now().isoformat()
+        })
+        return final
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+class AgentStreams:
+    """
+    Streams for one request, opened lazily on each agent's first token.
+
+    handler(key) returns the on_token callback agents receive through their context
+    (see BaseSDLCAgent.process_request). finish() closes an agent's stream with its
+    final text, and reports False when nothing was streamed so the caller can fall
+    back to a plain agent_response frame (e.g. an agent that failed before any token).
+    """
+
+    def __init__(self, manager: "WebSocketManager", session_id: str, label=None):
+        self.manager = manager
+        self.session_id = session_id
+        self.label = label or (lambda key: key)
+        self.streams: Dict[str, AgentResponseStream] = {}
+
+    def handler(self, key: str):
+        async def on_token(delta: str) -> None:
+            stream = self.streams.get(key)
+            if stream is None:
+                stream = self.streams[key] = await self.manager.open_stream(self.session_id, self.label(key))
+            await stream.push(delta)
+        return on_token
+
+    async def finish(self, key: str, message: str, **fields) -> bool:
+        stream = self.streams.pop(key, None)
+        if stream is None:
+            return False
+        await stream.end(message, **fields)
+        return True
+
+    async def close_all(self) -> None:
+        for key in list(self.streams):
+            await self.streams.pop(key).end()
+
+
+class _Outbox:
+    """
+    Outbound frames for one connection, written by a single writer task.
+
+    Producers append and move on; the writer drains the queue in order, so a
+    slow socket only delays its own frames and concurrent sends never
+    interleave. The writer only runs while there is something to send.
+    """
+
+    def __init__(self, websocket: WebSocket, codec: WireCodec):
+        self.websocket = websocket
+        self.codec = codec
+        self.queue: Deque[list] = deque()  # [coalesce key, encoded frame, droppable]
+        self.pending: Dict[tuple, list] = {}
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sending_since: Optional[float] = None
+        self.peak = 0
+
+
+def _coalesce_key(data: dict) -> Optional[tuple]:
+    request_id = data.get("request_id")
+    if data.get("type") == "status_update" and data.get("status") in COALESCED_STATUSES:
+        # One "processing" line per request, one "queued" position per agent
+        return ("status", request_id, data["status"], data.get("agent") if data["status"] == "queued" else None)
+    if data.get("type") == "collaboration_update":
+        return ("collaboration", request_id)
+    return None
+
+
 class WebSocketManager:
-    def __init__(self):
+    """
+    Connections per session, each with its own bounded outbound queue.
+
+    Clients pick a wire format by WebSocket subprotocol (see utils.wire_protocol);
+    those that offer none get JSON text frames as before. Frames sent while a
+    request task is running carry its request_id (see task_tracker.current_request).
+
+    Every send_* call encodes the frame, queues it and returns; agent work is
+    never held up by a socket. While a frame is still queued, a newer
+    processing/queued status or collaboration update replaces it. When a
+    client falls SEND_QUEUE_MAX frames behind, queued deltas are dropped first
+    (agent_response_end carries the full text); if that frees nothing, or a
+    frame is queued while one write has been stuck for over SEND_TIMEOUT, the
+    client is closed as too slow.
+
+    Sessions connected to another worker are reached through the connection
+    registry and delivery bus (see utils.delivery_bus); the default in-process
+    pair forwards nothing, which is the single-worker behaviour.
+
+    Frames for sessions connected here carry a per-session frame_seq and are
+    kept in a bounded replay buffer (see utils.replay_buffer), so a client
+    that drops and reconnects with its last frame_seq gets the frames it
+    missed via resume() before the live stream.
+    """
+
+    def __init__(self, max_queue: int = None, send_timeout: float = None, registry=None, bus=None,
+                 replay_buffer: ReplayBuffer = None):
         self.active_connections: Dict[str, WebSocket] = {}
         self.session_agents: Dict[str, List[str]] = {}
+        self.max_queue = max_queue or SEND_QUEUE_MAX
+        self.send_timeout = send_timeout or SEND_TIMEOUT
+        self._outboxes: Dict[str, _Outbox] = {}
+        self.codecs: Dict[str, WireCodec] = {}
+        self.protocols: Dict[str, Dict[str, float]] = {}  # codec name -> frames, bytes, encode seconds
+        self.registry = registry or LocalConnectionRegistry()
+        self.bus = bus or LocalDeliveryBus(self.registry.worker_id)
+        self.replay_buffer = replay_buffer or ReplayBuffer()
+
+        self.frames_sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.slow_closed = 0
+        self.send_errors = 0
+        self.forwarded = 0
+        self.unreachable = 0
+
+    async def start_delivery(self) -> None:
+        """Start receiving frames other workers publish for sessions connected here"""
+        await self.bus.start(self.deliver_local)
+
+    async def stop_delivery(self) -> None:
+        await self.bus.stop()
+
+    async def deliver_local(self, session_id: str, data: dict) -> bool:
+        """Queue a frame that arrived over the bus; False when the session isn't connected here (any more)"""
+        if session_id not in self.active_connections:
+            return False
+        if data.get("type") == "agent_response_delta":
+            await self.send_delta(session_id, data["message_id"], data["agent"], data["seq"], data["delta"],
+                                  data.get("request_id"))
+        else:
+            await self._enqueue(session_id, data)
+        return True
+
+    async def _forward(self, session_id: str, data: dict) -> None:
+        owner = await self.registry.owner(session_id)
+        if owner is None or owner == self.registry.worker_id:
+            return
+        if await self.bus.publish(owner, session_id, data):
+            self.forwarded += 1
+        else:
+            self.unreachable += 1
+            self.registry.forget(session_id)
 
     async def connect(self, websocket: WebSocket, session_id: str):
-        await websocket.accept()
+        subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        self.codecs[session_id] = get_codec(subprotocol)
+        self.replay_buffer.attach(session_id)
+        await self.registry.register(session_id)
+        # Nothing awaits between here and a resume(), so replayed frames go out ahead of live ones
         self.active_connections[session_id] = websocket
         self.session_agents[session_id] = []
 
-    def disconnect(self, session_id: str):
+    async def resume(self, session_id: str, last_seq: int) -> Tuple[int, bool]:
+        """
+        Resend the frames a reconnecting client missed after last_seq, back to
+        back ahead of anything live. Returns how many, and whether that was all
+        of them (False when the buffer no longer reaches back that far).
+        """
+        frames, complete = self.replay_buffer.since(session_id, last_seq)
+        for data in frames:
+            await self._send(session_id, data, settle=False)
+        await asyncio.sleep(0)
+        return len(frames), complete
+
+    def disconnect(self, session_id: str, websocket: WebSocket = None):
+        if websocket is not None and self.active_connections.get(session_id) is not websocket:
+            return  # The client already reconnected on a newer socket
         if session_id in self.active_connections:
             del self.active_connections[session_id]
         if session_id in self.session_agents:
             del self.session_agents[session_id]
+        self.codecs.pop(session_id, None)
+        self.replay_buffer.detach(session_id)
+        self.registry.unregister(session_id)
+        outbox = self._outboxes.pop(session_id, None)
+        if outbox is not None:
+            outbox.closed = True
+            outbox.queue.clear()
+            if outbox.writer is not None and outbox.writer is not asyncio.current_task():
+                outbox.writer.cancel()
 
-    async def send_agent_response(self, session_id: str, agent_name: str, message: str, message_type: str = "agent_response"):
-        if session_id in self.active_connections:
+    def _outbox(self, session_id: str) -> Optional[_Outbox]:
+        websocket = self.active_connections.get(session_id)
+        if websocket is None:
+            return None
+        outbox = self._outboxes.get(session_id)
+        if outbox is None or outbox.websocket is not websocket:
+            outbox = self._outboxes[session_id] = _Outbox(websocket, self.codecs.get(session_id, LEGACY_CODEC))
+        if outbox.sending_since is not None and time.monotonic() - outbox.sending_since > self.send_timeout:
+            self._close_slow(session_id, f"one frame has taken over {self.send_timeout:.0f}s to send")
+            return None
+        return outbox
+
+    def _record_encode(self, codec: WireCodec, payload: bytes, started: float) -> None:
+        counters = self.protocols.setdefault(codec.name, {"frames": 0, "bytes": 0, "encode_seconds": 0.0})
+        counters["frames"] += 1
+        counters["bytes"] += len(payload)
+        counters["encode_seconds"] += time.perf_counter() - started
+
+    async def _enqueue(self, session_id: str, data: dict) -> None:
+        request_id = current_request.get()
+        if request_id is not None and "request_id" not in data:
+            data = {**data, "request_id": request_id}
+        recording = recorded_frames.get()
+        if recording is not None:
+            recording.append(data)
+        await self._send(session_id, self._sequence(session_id, data))
+
+    def _sequence(self, session_id: str, data: dict) -> dict:
+        if data.get("type") == "pong":
+            return data
+        return self.replay_buffer.add(session_id, data) or data
+
+    async def _send(self, session_id: str, data: dict, settle: bool = True) -> None:
+        if session_id not in self.active_connections:
+            await self._forward(session_id, data)
+            return
+        outbox = self._outbox(session_id)
+        if outbox is None:
+            return
+        started = time.perf_counter()
+        payload = outbox.codec.encode(data)
+        self._record_encode(outbox.codec, payload, started)
+        await self._push(session_id, outbox, _coalesce_key(data), payload, data.get("type") == "agent_response_delta",
+                         settle)
+
+    async def replay(self, session_id: str, frames: List[dict]) -> None:
+        """
+        Resend frames recorded for an earlier request (see utils.idempotency),
+        marked replayed, queued back to back so no live frame lands between them
+        """
+        for data in frames:
+            await self._send(session_id, self._sequence(session_id, {**data, "replayed": True}), settle=False)
+        await asyncio.sleep(0)
+
+    async def send_delta(self, session_id: str, message_id: str, agent_name: str, seq: int, delta: str,
+                         request_id: str = None) -> None:
+        """Queue one agent_response_delta, encoded from the stream's pre-built envelope"""
+        request_id = request_id or current_request.get()
+        frame, frame_seq = None, None
+        if self.replay_buffer.tracking(session_id) or session_id not in self.active_connections:
+            frame = {"type": "agent_response_delta", "message_id": message_id, "agent": agent_name, "seq": seq, "delta": delta}
+            if request_id:
+                frame["request_id"] = request_id
+            frame = self.replay_buffer.add(session_id, frame) or frame
+            frame_seq = frame.get("frame_seq")
+        if session_id not in self.active_connections:
+            await self._forward(session_id, frame)
+            return
+        outbox = self._outbox(session_id)
+        if outbox is None:
+            return
+        started = time.perf_counter()
+        payload = outbox.codec.encode_delta(message_id, agent_name, seq, delta, request_id, frame_seq)
+        self._record_encode(outbox.codec, payload, started)
+        await self._push(session_id, outbox, None, payload, True)
+
+    async def _push(self, session_id: str, outbox: _Outbox, key: Optional[tuple], payload: bytes, droppable: bool,
+                    settle: bool = True) -> None:
+        entry = [key, payload, droppable]
+        if key is not None and key in outbox.pending:
+            # Drop the stale frame and queue the new one where the old one's successors can't overtake it
+            outbox.queue.remove(outbox.pending.pop(key))
+            self.coalesced += 1
+        if len(outbox.queue) >= self.max_queue and not self._drop_deltas(outbox):
+            self._close_slow(session_id, f"{len(outbox.queue)} frames behind")
+            return
+        outbox.queue.append(entry)
+        if key is not None:
+            outbox.pending[key] = entry
+        outbox.peak = max(outbox.peak, len(outbox.queue))
+
+        if outbox.writer is None or outbox.writer.done():
+            outbox.writer = asyncio.create_task(self._write(session_id, outbox))
+        # Let the writer take the frame now; a fast socket is written to before the producer resumes
+        if settle:
+            await asyncio.sleep(0)
+
+    def _drop_deltas(self, outbox: _Outbox) -> bool:
+        kept = deque(entry for entry in outbox.queue if not entry[2])
+        dropped = len(outbox.queue) - len(kept)
+        if dropped:
+            outbox.queue = kept
+            self.dropped += dropped
+        return dropped > 0
+
+    async def _write(self, session_id: str, outbox: _Outbox) -> None:
+        while outbox.queue and not outbox.closed:
+            entry = outbox.queue.popleft()
+            if entry[0] is not None:
+                outbox.pending.pop(entry[0], None)
+            outbox.sending_since = time.monotonic()
             try:
-                data = {
-                    "type": message_type,
-                    "agent": agent_name,
-                    "message": message,
-                    "timestamp": datetime.now().isoformat()
-                }
-                await self.active_connections[session_id].send_text(json.dumps(data))
+                if outbox.codec.binary:
+                    await outbox.websocket.send_bytes(entry[1])
+                else:
+                    await outbox.websocket.send_text(entry[1].decode())
+                self.frames_sent += 1
             except Exception as e:
-                print(f"[WS_MGR] Error sending agent response to {session_id}: {e}")
+                self.send_errors += 1
+                print(f"[WS_MGR] Error sending to {session_id}: {e}")
                 # Remove broken connection
-                self.disconnect(session_id)
+                if self._outboxes.get(session_id) is outbox:
+                    self.disconnect(session_id)
+                return
+            finally:
+                outbox.sending_since = None
+
+    def _close_slow(self, session_id: str, reason: str) -> None:
+        outbox = self._outboxes.get(session_id)
+        if outbox is None:
+            return
+        print(f"[WS_MGR] Closing slow client {session_id}: {reason}")
+        self.slow_closed += 1
+        self.disconnect(session_id)
+        asyncio.create_task(self._close_socket(outbox.websocket))
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket) -> None:
+        try:
+            await websocket.close(code=1013, reason="Client too slow")
+        except Exception:
+            pass
+
+    def queue_depth(self, session_id: str) -> int:
+        outbox = self._outboxes.get(session_id)
+        return len(outbox.queue) if outbox else 0
+
+    def stats(self) -> Dict[str, Any]:
+        depths = {sid: len(outbox.queue) for sid, outbox in self._outboxes.items()}
+        return {
+            "connections": len(self.active_connections),
+            "queued_frames": sum(depths.values()),
+            "max_queue_depth": max(depths.values(), default=0),
+            "peak_queue_depth": max((outbox.peak for outbox in self._outboxes.values()), default=0),
+            "deepest_sessions": dict(sorted(depths.items(), key=lambda item: -item[1])[:5]),
+            "frames_sent": self.frames_sent,
+            "coalesced": self.coalesced,
+            "dropped_deltas": self.dropped,
+            "slow_clients_closed": self.slow_closed,
+            "send_errors": self.send_errors,
+            "forwarded": self.forwarded,
+            "unreachable": self.unreachable,
+            "registry": self.registry.stats(),
+            "bus": self.bus.stats(),
+            "replay_buffer": self.replay_buffer.stats(),
+            "protocols": {
+                name: {
+                    "frames": c["frames"],
+                    "bytes_per_frame": round(c["bytes"] / c["frames"], 1),
+                    "encode_us_per_frame": round(c["encode_seconds"] / c["frames"] * 1e6, 2),
+                } for name, c in self.protocols.items()
+            },
+        }
+
+    async def send_agent_response(self, session_id: str, agent_name: str, message: str, message_type: str = "agent_response", **fields):
+        await self._enqueue(session_id, {
+            "type": message_type,
+            "agent": agent_name,
+            "message": message,
+            **fields,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def send_frame(self, session_id: str, data: dict) -> None:
+        await self._enqueue(session_id, data)
+
+    async def open_stream(self, session_id: str, agent_name: str, message_id: str = None) -> AgentResponseStream:
+        """Start streaming an agent reply; push deltas and end() it with the final text"""
+        stream = AgentResponseStream(self, session_id, agent_name, message_id)
+        await stream.start()
+        return stream
 
     async def broadcast_collaboration(self, session_id: str, agents: List[str], status: str):
-        if session_id in self.active_connections:
-            data = {
-                "type": "collaboration_update",
-                "agents": agents,
-                "status": status,
-                "timestamp": datetime.now().isoformat()
-            }
-            await self.active_connections[session_id].send_text(json.dumps(data))
-
-    async def send_status_update(self, session_id: str, status: str, details: str = ""):
-        if session_id in self.active_connections:
-            try:
-                data = {
-                    "type": "status_update",
-                    "status": status,
-                    "details": details,
-                    "timestamp": datetime.now().isoformat()
-                }
-                await self.active_connections[session_id].send_text(json.dumps(data))
-            except Exception as e:
-                print(f"[WS_MGR] Error sending status update to {session_id}: {e}")
-                self.disconnect(session_id)
\ No newline at end of file
+        await self._enqueue(session_id, {
+            "type": "collaboration_update",
+            "agents": agents,
+            "status": status,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def send_status_update(self, session_id: str, status: str, details: str = "", **fields):
+        await self._enqueue(session_id, {
+            "type": "status_update",
+            "status": status,
+            "details": details,
+            **fields,
+            "timestamp": datetime.now().isoformat()
+        })
@@ -0,0 +1,146 @@
+# utils/wire_protocol.py
+import json
+import os
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Binary protocols deflate payloads at least this big (long replies, echoed uploads)
+WS_COMPRESS_MIN_BYTES = int(os.getenv("WS_COMPRESS_MIN_BYTES", 1024))
+WS_COMPRESS_LEVEL = int(os.getenv("WS_COMPRESS_LEVEL", 6))
+
+# First byte of every binary frame
+RAW = b"\x00"
+DEFLATED = b"\x01"
+
+
+def dumps_json(data: dict) -> bytes:
+    """UTF-8 JSON, through orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. ints past 64 bits - the stdlib encoder copes
+    return json.dumps(data, ensure_ascii=False, default=str).encode()
+
+
+class WireCodec:
+    """
+    How frames for one connection are encoded.
+
+    encode() serializes a whole frame. encode_delta() builds streamed
+    agent_response_delta frames from a pre-encoded envelope header - the type,
+    message_id and agent keys are serialized once per stream, not once per
+    delta. Text codecs return UTF-8 bytes that go out as text frames.
+    """
+
+    name = "json"
+    binary = False
+
+    def encode(self, data: dict) -> bytes:
+        return dumps_json(data)
+
+    def encode_delta(self, message_id: str, agent: str, seq: int, delta: str, request_id: str = None,
+                     frame_seq: int = None) -> bytes:
+        return (_json_delta_header(message_id, agent, request_id)
+                + (b'"frame_seq":' + str(frame_seq).encode() + b"," if frame_seq is not None else b"")
+                + b'"seq":' + str(seq).encode() + b',"delta":' + dumps_json(delta) + b"}")
+
+    def decode(self, payload: Union[str, bytes]) -> dict:
+        return json.loads(payload)
+
+
+class DeflateJsonCodec(WireCodec):
+    """JSON in binary frames, deflated past WS_COMPRESS_MIN_BYTES - for clients without a MessagePack decoder"""
+
+    name = "flux.json.deflate"
+    binary = True
+
+    def encode(self, data: dict) -> bytes:
+        return _envelope(super().encode(data))
+
+    def encode_delta(self, message_id: str, agent: str, seq: int, delta: str, request_id: str = None,
+                     frame_seq: int = None) -> bytes:
+        return _envelope(super().encode_delta(message_id, agent, seq, delta, request_id, frame_seq))
+
+    def decode(self, payload: bytes) -> dict:
+        return json.loads(_unwrap(payload))
+
+
+class MsgpackCodec(WireCodec):
+    """MessagePack in binary frames, deflated past WS_COMPRESS_MIN_BYTES"""
+
+    name = "flux.msgpack"
+    binary = True
+
+    def encode(self, data: dict) -> bytes:
+        return _envelope(msgpack.packb(data, default=str))
+
+    def encode_delta(self, message_id: str, agent: str, seq: int, delta: str, request_id: str = None,
+                     frame_seq: int = None) -> bytes:
+        header = _msgpack_delta_header(message_id, agent, request_id, frame_seq is not None)
+        if frame_seq is not None:
+            header += msgpack.packb("frame_seq") + msgpack.packb(frame_seq)
+        return _envelope(header
+                         + msgpack.packb("seq") + msgpack.packb(seq)
+                         + msgpack.packb("delta") + msgpack.packb(delta))
+
+    def decode(self, payload: bytes) -> dict:
+        return msgpack.unpackb(_unwrap(payload))
+
+
+@lru_cache(maxsize=512)
+def _json_delta_header(message_id: str, agent: str, request_id: Optional[str]) -> bytes:
+    return (b'{"type":"agent_response_delta","message_id":' + dumps_json(message_id)
+            + b',"agent":' + dumps_json(agent) + b","
+            + (b'"request_id":' + dumps_json(request_id) + b"," if request_id else b""))
+
+
+@lru_cache(maxsize=512)
+def _msgpack_delta_header(message_id: str, agent: str, request_id: Optional[str], sequenced: bool = False) -> bytes:
+    # A 5-entry map, plus one each for request_id and frame_seq; seq, delta (and frame_seq) are appended per frame
+    return (bytes([0x85 + bool(request_id) + sequenced]) + msgpack.packb("type") + msgpack.packb("agent_response_delta")
+            + msgpack.packb("message_id") + msgpack.packb(message_id)
+            + msgpack.packb("agent") + msgpack.packb(agent)
+            + (msgpack.packb("request_id") + msgpack.packb(request_id) if request_id else b""))
+
+
+def _envelope(body: bytes) -> bytes:
+    if len(body) >= WS_COMPRESS_MIN_BYTES:
+        packed = zlib.compress(body, WS_COMPRESS_LEVEL)
+        if len(packed) < len(body):
+            return DEFLATED + packed
+    return RAW + body
+
+
+def _unwrap(payload: bytes) -> bytes:
+    return zlib.decompress(payload[1:]) if payload[:1] == DEFLATED else payload[1:]
+
+
+LEGACY_CODEC = WireCodec()
+# Subprotocol name -> codec; "flux.json" is the legacy text protocol asked for explicitly
+CODECS = {"flux.json.deflate": DeflateJsonCodec(), "flux.json": LEGACY_CODEC}
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def negotiate(offered: List[str]) -> Optional[str]:
+    """Pick the client's most preferred subprotocol we speak; None keeps the legacy JSON text frames"""
+    for name in offered or []:
+        if name in CODECS:
+            return name
+    return None
+
+
+def get_codec(subprotocol: Optional[str]) -> WireCodec:
+    return CODECS.get(subprotocol, LEGACY_CODEC)
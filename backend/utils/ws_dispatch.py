@@ -0,0 +1,133 @@
+# utils/ws_dispatch.py
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import WebSocket
+from fastapi.responses import JSONResponse
+
+from utils.admission import get_admission_controller
+from utils.bulkhead import get_bulkhead
+from utils.completion_cache import get_completion_cache
+from utils.deadline import Deadline
+from utils.idempotency import get_idempotency_store
+from utils.replay_buffer import WS_RESUME_GRACE
+from utils.task_tracker import get_task_tracker, SESSION_MAX_CONCURRENT_REQUESTS
+from utils.websocket_manager import WebSocketManager
+from models.groq_models import get_request_scheduler, get_latency_tracker, get_groq_manager, get_provider_registry
+
+# prepare(message) -> (priority class, start); start(deadline) returns the request coroutine
+RequestStarter = Callable[[Deadline], Awaitable[Any]]
+Prepare = Callable[[Any], Tuple[str, RequestStarter]]
+
+
+def readiness() -> JSONResponse:
+    """Readiness gate for the load balancer: 503 until model warm-up has finished"""
+    try:
+        status = get_groq_manager().warmup_status()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"ready": False, "status": "unavailable", "error": str(e)})
+    status["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+class WebSocketDispatcher:
+    """
+    What every chat WebSocket endpoint does with a session's messages, whatever
+    runs the request: answer pings from the receive loop, replay a retried
+    idempotency key instead of running it again, cancel on supersede, shed over
+    budget requests with a busy frame, and run the rest as tracked tasks (up to
+    SESSION_MAX_CONCURRENT_REQUESTS per session, each frame tagged with its
+    request_id) so the socket keeps being read. Reconnects resume from the
+    replay buffer; a closed socket's requests run on for WS_RESUME_GRACE.
+    """
+
+    def __init__(self, websocket_manager: WebSocketManager, task_tracker=None,
+                 admission_controller=None, idempotency_store=None):
+        self.websocket_manager = websocket_manager
+        self.task_tracker = task_tracker or get_task_tracker()
+        self.admission_controller = admission_controller or get_admission_controller()
+        self.idempotency_store = idempotency_store or get_idempotency_store()
+
+    async def resume(self, websocket: WebSocket, session_id: str) -> Dict[str, Any]:
+        """Replay what a reconnecting client (?last_seq=N) missed; fields for its connected frame"""
+        reclaimed = self.task_tracker.reclaim(session_id)
+        last_seq = websocket.query_params.get("last_seq")
+        if last_seq is None or not last_seq.isdigit():
+            return {}
+        replayed, complete = await self.websocket_manager.resume(session_id, int(last_seq))
+        print(f"[WS] Resumed session={session_id} from frame {last_seq}: {replayed} replayed, "
+              f"{'complete' if complete else 'incomplete'}, running requests {'kept' if reclaimed else 'none'}")
+        return {"resumed_from": int(last_seq), "replayed": replayed, "resume_complete": complete}
+
+    async def release(self, websocket: WebSocket, session_id: str) -> None:
+        """Drop a closed socket; its requests run on for WS_RESUME_GRACE in case the client reconnects"""
+        self.websocket_manager.disconnect(session_id, websocket)
+        if session_id not in self.websocket_manager.active_connections:
+            await self.task_tracker.cancel_after(session_id, WS_RESUME_GRACE, "disconnect")
+
+    async def dispatch(self, session_id: str, message: Any, prepare: Prepare) -> None:
+        """Handle one decoded client message; prepare() raising answers with an invalid-format error"""
+        manager = self.websocket_manager
+        data = message if isinstance(message, dict) else {}
+        # Heartbeats are answered straight from the receive loop, never behind a running request
+        if data.get("type") == "ping":
+            await manager.send_frame(session_id, {"type": "pong", "timestamp": datetime.now().isoformat()})
+            return
+
+        try:
+            priority, start = prepare(message)
+        except Exception as e:
+            await manager.send_agent_response(session_id, "system", f"Invalid request format: {e}", "error",
+                                              request_id=data.get("request_id"))
+            return
+        request_id = data.get("request_id") or uuid.uuid4().hex[:12]
+
+        # A retry carrying an idempotency key this session already used gets the original's
+        # frames replayed (and, while it is still running, the rest as they are sent)
+        # instead of running the request a second time
+        idempotency_key = f"{session_id}:{data['idempotency_key']}" if data.get("idempotency_key") else None
+        if idempotency_key:
+            frames = await self.idempotency_store.recorded(idempotency_key)
+            if frames is not None:
+                await manager.replay(session_id, frames)
+                return
+
+        if data.get("supersede"):
+            if await self.task_tracker.cancel(session_id, "supersede"):
+                await manager.send_status_update(session_id, "cancelled", "Previous request superseded")
+
+        # Admission control: when the predicted queue wait is over budget, answer with a
+        # busy frame carrying retry_after instead of letting the request pile up
+        admission = self.admission_controller.try_admit(priority, entry="ws")
+        if not admission.admitted:
+            await manager.send_frame(session_id, {**admission.busy_frame(), "request_id": request_id})
+            return
+
+        if self.task_tracker.active(session_id) >= SESSION_MAX_CONCURRENT_REQUESTS:
+            await manager.send_status_update(session_id, "queued", "Waiting for an earlier request to finish",
+                                             request_id=request_id)
+        request = start(Deadline())
+        if idempotency_key:
+            flight = self.idempotency_store.begin(idempotency_key)
+            request = self.idempotency_store.record(flight, request)
+        request_task = self.task_tracker.spawn(session_id, request,
+                                               request_id=request_id, limit=SESSION_MAX_CONCURRENT_REQUESTS)
+        request_task.add_done_callback(lambda _task, a=admission: self.admission_controller.release(a))
+        if idempotency_key:
+            request_task.add_done_callback(lambda _task, f=flight: self.idempotency_store.abandon(f))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Runtime counters for the LLM provider path and the WebSocket entry"""
+        return {
+            "completion_cache": get_completion_cache().stats(),
+            "rate_limits": get_request_scheduler().stats(),
+            "latency": get_latency_tracker().stats(),
+            "requests": self.task_tracker.stats(),
+            "provider": get_provider_registry().stats(),
+            "bulkhead": get_bulkhead().stats(),
+            "admission": self.admission_controller.stats(),
+            "idempotency": self.idempotency_store.stats(),
+            "websocket": self.websocket_manager.stats(),
+            "timestamp": datetime.now().isoformat()
+        }
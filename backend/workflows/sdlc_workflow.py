@@ -1,7 +1,6 @@
 # workflows/sdlc_workflow.py
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Optional
-import asyncio
+from typing import TypedDict, List, Optional, Callable
 import re
 
 from agents.requirements_analyst import RequirementsAnalyst
@@ -11,6 +10,53 @@ from agents.qa_tester import QATester
 from agents.devops_engineer import DevOpsEngineer
 from agents.project_manager import ProjectManager
 from agents.security_expert import SecurityExpert
+from utils.deadline import Deadline
+from utils.fan_out import as_completed
+from utils.bulkhead import request_priority
+from core.agent_matcher import AgentMatcher, MentionScan
+
+# Every name the agents go by, in the UI and in each other's replies
+AGENT_NAMES = {
+    "sara": "requirements_analyst", "sarah": "requirements_analyst", "sarah chen": "requirements_analyst",
+    "marc": "software_architect", "marcus": "software_architect", "marcus rodriguez": "software_architect",
+    "alex": "developer", "alexander": "developer", "alex kim": "developer",
+    "jess": "qa_tester", "jessica": "qa_tester", "jessica wu": "qa_tester",
+    "dave": "devops_engineer", "david": "devops_engineer", "david singh": "devops_engineer",
+    "emma": "project_manager", "emily": "project_manager", "emily johnson": "project_manager",
+    "rob": "security_expert", "robt": "security_expert", "robert": "security_expert", "robert chen": "security_expert",
+}
+# Role words count as A2A mentions but never as a direct call
+AGENT_ROLES = {
+    "requirements": "requirements_analyst",
+    "architect": "software_architect",
+    "developer": "developer",
+    "tester": "qa_tester",
+    "qa": "qa_tester",
+    "devops": "devops_engineer",
+    "manager": "project_manager",
+    "security": "security_expert",
+}
+AGENT_ROUTES = {
+    "requirements_analyst": "requirements",
+    "software_architect": "architecture",
+    "developer": "development",
+    "qa_tester": "testing",
+    "devops_engineer": "deployment",
+    "project_manager": "management",
+    "security_expert": "security",
+}
+AGENT_MATCHER = AgentMatcher(AGENT_NAMES, AGENT_ROLES)
+
+
+def request_class(user_request: str, requested_agents: list = None, uploaded_files: list = None,
+                  scan: MentionScan = None) -> str:
+    """Priority class of a request (see utils.bulkhead), decided up front the way _route_from_entry routes it"""
+    scan = scan or AGENT_MATCHER.scan(str(user_request).lower())
+    if scan.mentions and not (requested_agents and len(requested_agents) > 1):
+        return "direct"
+    if scan.team_call or (requested_agents and len(requested_agents) > 1):
+        return request_priority("collaboration", uploaded_files)
+    return "smart"
 
 class SDLCState(TypedDict):
     user_request: str
@@ -23,6 +69,13 @@ class SDLCState(TypedDict):
     final_response: str
     requested_agents: list  # Agents requested by user
     called_agent: Optional[str]  # Specific agent directly called by user
+    stream_handler: Optional[Callable]  # role -> on_token callback for streaming replies to the client
+    deadline: Optional[Deadline]  # Request time budget; optional agents are skipped when it runs low
+    mention_scan: Optional[MentionScan]  # Agent mentions in user_request, scanned once by the route_entry node
+    request_class: Optional[str]  # Bulkhead class of the request, from request_class() at entry
+    on_queued: Optional[Callable]  # async (role, position) called while an agent waits for a bulkhead slot
+    on_agent_response: Optional[Callable]  # async (agent_id, response, latency_ms) called as each collaborator finishes
+    on_agent_busy: Optional[Callable]  # async (agent_id, BulkheadFull) for a collaborator that got no bulkhead slot
 
 class SDLCWorkflow:
     def __init__(self):
@@ -100,10 +153,24 @@ class SDLCWorkflow:
         print("[WORKFLOW] Created new workflow graph with route_entry as entry point")
         return workflow.compile()
 
-    async def _analyze_requirements(self, state: SDLCState) -> SDLCState:
-        agent = self.agents["requirements_analyst"]
+    def _agent_context(self, state: SDLCState, priority: str = None) -> dict:
+        """
+        Project context for one agent call, plus the request plumbing (streaming, deadline, bulkhead class).
+        The class defaults to "direct" for a request that called an agent, else the class decided at entry
+        """
+        if priority is None:
+            priority = "direct" if state.get("called_agent") else state.get("request_class") or "smart"
         context = state["project_context"].copy()
         context["uploaded_files"] = state.get("uploaded_files", [])
+        context["stream_handler"] = state.get("stream_handler")
+        context["deadline"] = state.get("deadline")
+        context["on_queued"] = state.get("on_queued")
+        context["priority"] = priority
+        return context
+
+    async def _analyze_requirements(self, state: SDLCState) -> SDLCState:
+        agent = self.agents["requirements_analyst"]
+        context = self._agent_context(state)
         
         # Add context about being directly called
         if state.get("called_agent") == "requirements_analyst":
@@ -117,8 +184,7 @@ class SDLCWorkflow:
 
     async def _design_architecture(self, state: SDLCState) -> SDLCState:
         agent = self.agents["software_architect"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "software_architect":
             context["direct_call"] = True
@@ -131,8 +197,7 @@ class SDLCWorkflow:
 
     async def _develop_solution(self, state: SDLCState) -> SDLCState:
         agent = self.agents["developer"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "developer":
             context["direct_call"] = True
@@ -145,8 +210,7 @@ class SDLCWorkflow:
 
     async def _test_solution(self, state: SDLCState) -> SDLCState:
         agent = self.agents["qa_tester"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "qa_tester":
             context["direct_call"] = True
@@ -159,8 +223,7 @@ class SDLCWorkflow:
 
     async def _plan_deployment(self, state: SDLCState) -> SDLCState:
         agent = self.agents["devops_engineer"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "devops_engineer":
             context["direct_call"] = True
@@ -173,8 +236,7 @@ class SDLCWorkflow:
 
     async def _manage_project(self, state: SDLCState) -> SDLCState:
         agent = self.agents["project_manager"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "project_manager":
             context["direct_call"] = True
@@ -187,8 +249,7 @@ class SDLCWorkflow:
 
     async def _security_review(self, state: SDLCState) -> SDLCState:
         agent = self.agents["security_expert"]
-        context = state["project_context"].copy()
-        context["uploaded_files"] = state.get("uploaded_files", [])
+        context = self._agent_context(state)
         
         if state.get("called_agent") == "security_expert":
             context["direct_call"] = True
@@ -209,8 +270,7 @@ class SDLCWorkflow:
             # Execute only the called agent
             agent = self.agents.get(called_agent)
             if agent:
-                context = state["project_context"].copy()
-                context["uploaded_files"] = state.get("uploaded_files", [])
+                context = self._agent_context(state)
                 context["direct_call"] = True
                 context["interaction_type"] = "You were directly addressed by the user. Respond naturally as if having a one-on-one conversation."
                 
@@ -261,70 +321,27 @@ class SDLCWorkflow:
             mentioned_agents = set()
             is_exclusive_request = False
             
-            # Agent name mappings for A2A communication - Enhanced with more variations
-            agent_name_mapping = {
-                "sarah": "requirements_analyst",
-                "sarah chen": "requirements_analyst", 
-                "alex": "developer",
-                "alex kim": "developer",
-                "marcus": "software_architect", 
-                "marcus rodriguez": "software_architect",
-                "jessica": "qa_tester",
-                "jessica wu": "qa_tester",
-                "david": "devops_engineer",
-                "david singh": "devops_engineer", 
-                "emily": "project_manager",
-                "emily johnson": "project_manager",
-                "robert": "security_expert",
-                "robert chen": "security_expert",
-                # Additional patterns for better detection
-                "requirements": "requirements_analyst",
-                "architect": "software_architect",
-                "developer": "developer",
-                "tester": "qa_tester", 
-                "qa": "qa_tester",
-                "devops": "devops_engineer",
-                "manager": "project_manager",
-                "security": "security_expert"
-            }
-            
-            # Check for agent mentions in previous responses AND user request
-            user_request_lower = state["user_request"].lower()
+            # Greetings, names, role words, hand-overs and dismissals in the user request,
+            # found in the single scan the entry node ran
+            scan = state["mention_scan"]
             print(f"[A2A] Checking user request for direct agent mentions and dismissals...")
             
-            # Detect agent dismissals/drop-offs
-            dismissal_patterns = ["drop off", "drop out", "leave", "dismiss", "step back", "thank you", "thanks", "goodbye", "bye"]
-            agent_dismissals = set()
-            
-            for name, agent_key in agent_name_mapping.items():
-                # Check if agent is being dismissed
-                for dismissal in dismissal_patterns:
-                    if f"{name}" in user_request_lower and dismissal in user_request_lower:
-                        agent_dismissals.add(agent_key)
-                        print(f"[A2A] User dismissing '{name}' -> removing {agent_key}")
+            agent_dismissals = set(scan.dismissed)
+            for agent_key in agent_dismissals:
+                print(f"[A2A] User dismissing '{scan.aliases[agent_key]}' -> removing {agent_key}")
             
             # Detect agent mentions (excluding dismissed ones)
-            for name, agent_key in agent_name_mapping.items():
-                if name in user_request_lower and agent_key not in requested_agents and agent_key not in agent_dismissals:
+            for agent_key in scan.agents:
+                if agent_key not in requested_agents and agent_key not in agent_dismissals:
                     mentioned_agents.add(agent_key)
-                    print(f"[A2A] User mentioned '{name}' -> adding {agent_key}")
+                    print(f"[A2A] User mentioned '{scan.aliases[agent_key]}' -> adding {agent_key}")
             
-            # Handle continuation patterns ("continue with", "chat with", "work with")
-            continuation_patterns = [
-                "continue", "chat with", "work with", "speak with", "talk to", 
-                "call", "bring in", "would like to talk to", "want to talk to",
-                "need to talk to", "like to speak to", "want to speak to"
-            ]
-            if any(pattern in user_request_lower for pattern in continuation_patterns):
-                print(f"[A2A] Continuation pattern detected - focusing on specific agents")
-                # If user says "I would like to talk to Marc", only include Marc
-                for name, agent_key in agent_name_mapping.items():
-                    if any(f"{pattern} {name}" in user_request_lower for pattern in continuation_patterns):
-                        # This is an EXCLUSIVE request - clear other agents
-                        mentioned_agents = {agent_key}
-                        requested_agents = [agent_key]
-                        print(f"[A2A] Exclusive request to talk to {name} -> using ONLY {agent_key}")
-                        break
+            # Handle hand-overs ("talk to marc", "bring in alex"): only the first addressed agent continues
+            if scan.addressed:
+                agent_key = scan.addressed[0]
+                mentioned_agents = {agent_key}
+                requested_agents = [agent_key]
+                print(f"[A2A] Exclusive request to talk to {scan.aliases[agent_key]} -> using ONLY {agent_key}")
             
             # Apply dismissals - remove dismissed agents from previous responses tracking
             if agent_dismissals and "agent_outputs" in state:
@@ -334,39 +351,32 @@ class SDLCWorkflow:
                         del state["agent_outputs"][dismissed_agent]
             
             # Handle exclusive talk-to requests - remove all other agents
-            exclusive_patterns = ["would like to talk to", "want to talk to", "need to talk to", 
-                                 "like to speak to", "want to speak to", "would like to speak to"]
-            is_exclusive_request = False
-            for pattern in exclusive_patterns:
-                if pattern in user_request_lower:
-                    is_exclusive_request = True
-                    print(f"[A2A] Exclusive request detected: '{pattern}'")
-                    # Clear all previous agent outputs except the requested one
-                    if mentioned_agents and "agent_outputs" in state:
-                        agents_to_remove = [a for a in state["agent_outputs"].keys() if a not in mentioned_agents]
-                        for agent_to_remove in agents_to_remove:
-                            del state["agent_outputs"][agent_to_remove]
-                            print(f"[A2A] Removed {agent_to_remove} from conversation (exclusive request)")
-                    break
+            is_exclusive_request = scan.exclusive
+            if is_exclusive_request:
+                print(f"[A2A] Exclusive request detected")
+                # Clear all previous agent outputs except the requested one
+                if mentioned_agents and "agent_outputs" in state:
+                    agents_to_remove = [a for a in state["agent_outputs"].keys() if a not in mentioned_agents]
+                    for agent_to_remove in agents_to_remove:
+                        del state["agent_outputs"][agent_to_remove]
+                        print(f"[A2A] Removed {agent_to_remove} from conversation (exclusive request)")
             
             # SECOND: Check previous agent responses for mentions (only if not a direct call)
             if not called_agent:
                 for agent_id, response in previous_responses.items():
                     if isinstance(response, str):
-                        response_lower = response.lower()
                         print(f"[A2A] Checking {agent_id} response for mentions...")
+                        response_scan = AGENT_MATCHER.scan(response)
                         
-                        for name, agent_key in agent_name_mapping.items():
-                            if name in response_lower and agent_key not in requested_agents:
+                        for agent_key in response_scan.agents:
+                            if agent_key not in requested_agents:
                                 mentioned_agents.add(agent_key)
-                                print(f"[A2A] {agent_id} mentioned '{name}' -> adding {agent_key}")
+                                print(f"[A2A] {agent_id} mentioned '{response_scan.aliases[agent_key]}' -> adding {agent_key}")
                                 
                         # Additional check for names mentioned together (e.g., "Alex, Jessica, David, Emily, and Robert")
                         if len(mentioned_agents) < 3:  # If we haven't found many mentions, try a broader search
-                            all_names = ["alex", "jessica", "david", "emily", "robert", "kim", "wu", "singh", "johnson", "chen"]
-                            found_names = [name for name in all_names if name in response_lower]
-                            if len(found_names) >= 2:  # Multiple names mentioned together
-                                print(f"[A2A] Multiple names detected in {agent_id} response: {found_names}")
+                            if len(response_scan.mentions) >= 2:  # Multiple names mentioned together
+                                print(f"[A2A] Multiple names detected in {agent_id} response: {response_scan.mentions}")
                                 # Add all remaining agents when multiple names are mentioned
                                 for agent_key in ["developer", "qa_tester", "devops_engineer", "project_manager", "security_expert"]:
                                     if agent_key not in requested_agents:
@@ -381,6 +391,11 @@ class SDLCWorkflow:
                 all_agents = list(mentioned_agents)
                 print(f"[WORKFLOW] Exclusive request - using ONLY: {all_agents}")
             else:
+                deadline = state.get("deadline")
+                if mentioned_agents and deadline is not None and not deadline.allows_optional():
+                    # Agents only pulled in by another agent's mention are optional
+                    print(f"[WORKFLOW] ⏱️ {deadline.remaining():.1f}s left - skipping A2A agents {sorted(mentioned_agents)}")
+                    mentioned_agents = set()
                 all_agents = list(set(requested_agents + list(mentioned_agents)))
                 print(f"[WORKFLOW] Final agent list (including A2A): {all_agents}")
         
@@ -392,8 +407,8 @@ class SDLCWorkflow:
                     agent = self.agents[agent_name]
                     
                     # Build context from previous agent responses
-                    collaboration_context = state["project_context"].copy()
-                    collaboration_context["uploaded_files"] = state.get("uploaded_files", [])
+                    collaboration_context = self._agent_context(
+                        state, request_priority("team", state.get("uploaded_files")))
                     if previous_responses:
                         collaboration_context["previous_responses"] = previous_responses
                         collaboration_context["conversation_flow"] = "This is part of an ongoing multi-agent collaboration. Please respond to the user's request and any relevant points raised by other team members."
@@ -405,27 +420,50 @@ class SDLCWorkflow:
             else:
                 print(f"[WORKFLOW] Warning: Agent {agent_name} not found in available agents")
 
-        # Execute agents in parallel
+        # Execute agents in parallel, handing each reply to on_agent_response as soon as it
+        # lands - the node itself only returns once every agent is done. Collaborators that
+        # got no bulkhead slot go to on_agent_busy and leave nothing in agent_outputs.
         if collaboration_tasks:
             print(f"[WORKFLOW] Executing {len(collaboration_tasks)} agent tasks")
-            results = await asyncio.gather(*[task for _, task in collaboration_tasks])
-            for (agent_name, _), result in zip(collaboration_tasks, results):
-                print(f"[WORKFLOW] Got result from {agent_name}: {len(result)} chars")
-                state["agent_outputs"][agent_name] = result
+            on_agent_response = state.get("on_agent_response")
+            on_agent_busy = state.get("on_agent_busy")
+            async for result in as_completed(dict(collaboration_tasks)):
+                if result.busy:
+                    print(f"[WORKFLOW] {result.agent} not run: {result.error}")
+                    if on_agent_busy is not None:
+                        await on_agent_busy(result.agent, result.error)
+                    continue
+                if not result.ok:
+                    raise result.error
+                print(f"[WORKFLOW] Got result from {result.agent}: {len(result.response)} chars in {result.latency_ms:.0f}ms")
+                state["agent_outputs"][result.agent] = result.response
+                if on_agent_response is not None:
+                    try:
+                        await on_agent_response(result.agent, result.response, result.latency_ms)
+                    except Exception as deliver_err:
+                        print(f"[WORKFLOW] Error delivering {result.agent} response early: {deliver_err}")
         else:
             print("[WORKFLOW] No collaboration tasks to execute")
 
         return state
 
-    def _route_entry_point(self, state: SDLCState) -> SDLCState:
-        """Entry point that just passes through state for routing"""
+    def _route_entry_point(self, state: SDLCState) -> dict:
+        """
+        Entry point: scans the request for agent mentions once and records the scan
+        and any directly called agent on the state, for routing and collaboration
+        (a conditional edge can't write state, so this has to happen in a node)
+        """
         print("="*80)
         print("[WORKFLOW] 🔥 NUCLEAR ENTRY POINT ACTIVATED!")
         print(f"[WORKFLOW] 📝 Message: '{state.get('user_request')}'")
         print(f"[WORKFLOW] 👥 Requested agents: {state.get('requested_agents', [])}")
         print(f"[WORKFLOW] 🎯 This is the HARDCODED routing version!")
         print("="*80)
-        return state
+        scan = AGENT_MATCHER.scan(str(state["user_request"]).strip().lower())
+        # A greeted agent wins, otherwise the first agent named (role words are left to content routing)
+        called_agent = scan.greeted if scan.greeted in scan.mentions else next(iter(scan.mentions), None)
+        priority = request_class(state["user_request"], state.get("requested_agents"), state.get("uploaded_files"), scan)
+        return {"mention_scan": scan, "called_agent": called_agent, "request_class": priority}
     
     def _route_from_entry(self, state: SDLCState) -> str:
         """Route from entry point based on requested agents or request content"""
@@ -436,42 +474,23 @@ class SDLCWorkflow:
         else:
             user_request_lower = str(raw_request).strip().lower()
 
-        # Always clear any previous direct-call marker before evaluating this turn
-        state["called_agent"] = None
-
         print(f"\n" + "="*80)
         print(f"[ROUTE] 🔍 NEW REQUEST RECEIVED")
         print(f"[ROUTE] 📝 Message: '{state['user_request']}'")
         print(f"[ROUTE] 👥 Requested agents from UI: {requested_agents}")
-        print(f"[ROUTE] 🎯 called_agent (before routing): {state.get('called_agent')}")
         print("="*80)
         
-        # COMPLETE HARDCODED AGENT ROUTING - REPLACES ALL COMPLEX LOGIC
-        print(f"[ROUTE] 🧪 HARDCODED ROUTING: Checking for agent names...")
-        
-        # Check all agent names with proper logging
-        agent_mappings = {
-            "dave": ("deployment", "devops_engineer", "Dave (DevOps Engineer)"),
-            "marc": ("architecture", "software_architect", "Marc (Software Architect)"), 
-            "alex": ("development", "developer", "Alex (Developer)"),
-            "jess": ("testing", "qa_tester", "Jess (QA Tester)"),
-            "emma": ("management", "project_manager", "Emma (Project Manager)"),
-            "robt": ("security", "security_expert", "Robt (Security Expert)"),
-            "rob": ("security", "security_expert", "Rob (Security Expert)"),
-            "sara": ("requirements", "requirements_analyst", "Sara (Requirements Analyst)")
-        }
-        
-        # Check each agent name
-        for name, (route, agent_id, display_name) in agent_mappings.items():
-            if name in user_request_lower:
-                print(f"[ROUTE] ✅ HARDCODED: Found '{name}' → routing to {route}")
-                print(f"[ROUTE] 🎯 Setting called_agent to: {agent_id}")
-                print(f"[ROUTE] 👤 Agent: {display_name}")
-                state["called_agent"] = agent_id
-                return route
+        # The entry node already scanned for greetings, agent names and team calls
+        scan = state["mention_scan"]
+        agent_id = state.get("called_agent")
+        if agent_id:
+            route = AGENT_ROUTES[agent_id]
+            print(f"[ROUTE] ✅ Found '{scan.aliases[agent_id]}' → routing to {route}")
+            print(f"[ROUTE] 🎯 called_agent: {agent_id}")
+            return route
         
         # Check for team greetings
-        if any(word in user_request_lower for word in ["everyone", "everybody", "team", "all"]):
+        if scan.team_call:
             print("[ROUTE] 👥 TEAM GREETING DETECTED: Activating collaboration mode")
             return "collaboration"
         
@@ -640,8 +659,15 @@ class SDLCWorkflow:
         # Priority 1: If specific agents are requested, use collaboration
         requested_agents = state.get("requested_agents", [])
         if len(requested_agents) >= 1:
-            # Always use collaboration for agent requests
-            return "collaboration"
+            # Always use collaboration for agent requests - unless Sara was called directly,
+            # when collaboration would only run her again
+            return "end" if state.get("called_agent") else "collaboration"
+        
+        # Further phases are optional follow-ups; stop here if the request is short on time
+        deadline = state.get("deadline")
+        if deadline is not None and not deadline.allows_optional():
+            print(f"[WORKFLOW] ⏱️ {deadline.remaining():.1f}s left - ending after requirements")
+            return "end"
         
         # Priority 2: Route based on request content
         request = state["user_request"].lower()
@@ -3,10 +3,92 @@ import json
 import os
 from datetime import datetime
 import asyncio
+import re
+import time
+
+# Request time budget. Vercel kills the function at its maxDuration, so stop starting
+# new agent calls early enough to return the responses collected so far.
+CHAT_DEADLINE_SECONDS = float(os.environ.get("CHAT_DEADLINE_SECONDS", 25))
+MIN_CALL_SECONDS = 3.0        # Don't start an agent call with less time than this left
+MIN_EXTRA_ROUND_SECONDS = 10.0  # Follow-up rounds are optional; only start them with this much left
+TOKENS_PER_SECOND = 200       # Conservative generation speed used to size max_tokens
+
+# Agent detection in a single pass over the text. Vercel turns every module under api/
+# into its own function, so this is a self-contained copy of backend/core/agent_matcher.py.
+AGENT_ORDER = ["messi", "ronaldo", "neymar", "mbappe", "benzema", "modric", "ramos"]
+AGENT_NAMES = {name: name for name in AGENT_ORDER}
+AGENT_NAMES["mbappé"] = "mbappe"
+# Topic words pick an agent in team mode; matched as word prefixes ("tests", "deployment")
+AGENT_TOPICS = {
+    "requirement": "messi",
+    "architect": "ronaldo",
+    "developer": "neymar", "code": "neymar",
+    "qa": "mbappe", "test": "mbappe",
+    "devops": "benzema", "deploy": "benzema",
+    "project manager": "modric", "planning": "modric",
+    "security": "ramos",
+}
+AGENT_PATTERN = re.compile(
+    r"(?P<team>\b(?:everyone|team|all)\b)"
+    r"|\b(?P<name>" + "|".join(sorted(AGENT_NAMES, key=len, reverse=True)) + r")\b"
+    r"|\b(?P<topic>" + "|".join(sorted(AGENT_TOPICS, key=len, reverse=True)) + r")"
+)
+AGENT_NAME_PREFIX = re.compile(r"(?P<name>" + "|".join(sorted(AGENT_NAMES, key=len, reverse=True)) + r")\b")
+
+
+def scan_agents(text):
+    """Return (agents named, agents picked by topic, whole team called) from one scan"""
+    named, topics, team = set(), set(), False
+    for match in AGENT_PATTERN.finditer(text.lower()):
+        if match.lastgroup == "team":
+            team = True
+        elif match.lastgroup == "name":
+            named.add(AGENT_NAMES[match.group("name")])
+        else:
+            topics.add(AGENT_TOPICS[match.group("topic")])
+    return named, topics, team
+
+
+def select_responding_agents(message, chat_mode="team", uploaded_files=None):
+    """Decide which agents answer; returns (agent keys, message with a leading agent name removed)"""
+    responding_agents = []
+    message_lower = message.lower()
+    
+    # SINGLE AGENT MODE - Only respond with the specifically selected agent
+    if chat_mode == 'single':
+        # Extract agent name from message (frontend prepends it)
+        # Format: "AgentName actual message"
+        name_match = AGENT_NAME_PREFIX.match(message_lower)
+        if name_match:
+            responding_agents = [AGENT_NAMES[name_match.group("name")]]
+            # Remove agent name from message for cleaner processing
+            message = message[name_match.end():].strip()
+        
+        # If no agent found at start, default to modric
+        if not responding_agents:
+            responding_agents = ["modric"]
+    else:
+        # TEAM MODE - Original multi-agent detection logic
+        # Check for specific agent mentions
+        named, topics, team_call = scan_agents(message_lower)
+        responding_agents = [agent for agent in AGENT_ORDER if agent in named or agent in topics]
+        
+        # Check for team/everyone calls OR document upload (trigger full team)
+        if team_call or uploaded_files:
+            responding_agents = ["modric", "messi", "ronaldo", "neymar", "mbappe", "benzema", "ramos"]
+            # Modric first to coordinate
+        
+        # Default to Modric if no specific agent mentioned
+        if not responding_agents:
+            responding_agents = ["modric"]
+    
+    return responding_agents, message
+
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         # Handle POST requests (for chat)
+        deadline_at = time.monotonic() + CHAT_DEADLINE_SECONDS
         content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length)
         
@@ -1731,61 +1813,7 @@ sonar-scanner -Dsonar.projectKey=myapp
             }
             
             # Detect which agents should respond
-            responding_agents = []
-            message_lower = message.lower()
-            
-            # SINGLE AGENT MODE - Only respond with the specifically selected agent
-            if chat_mode == 'single':
-                # Extract agent name from message (frontend prepends it)
-                # Format: "AgentName actual message"
-                agent_name_map = {
-                    'messi': 'messi',
-                    'ronaldo': 'ronaldo', 
-                    'neymar': 'neymar',
-                    'mbappé': 'mbappe',
-                    'mbappe': 'mbappe',
-                    'benzema': 'benzema',
-                    'modric': 'modric',
-                    'ramos': 'ramos'
-                }
-                
-                # Find which agent name appears at the start of the message
-                for agent_name, agent_id in agent_name_map.items():
-                    if message_lower.startswith(agent_name.lower()):
-                        responding_agents = [agent_id]
-                        # Remove agent name from message for cleaner processing
-                        message = message[len(agent_name):].strip()
-                        break
-                
-                # If no agent found at start, default to modric
-                if not responding_agents:
-                    responding_agents = ["modric"]
-            else:
-                # TEAM MODE - Original multi-agent detection logic
-                # Check for specific agent mentions
-                if "messi" in message_lower or "requirement" in message_lower:
-                    responding_agents.append("messi")
-                if "ronaldo" in message_lower or "architect" in message_lower:
-                    responding_agents.append("ronaldo")
-                if "neymar" in message_lower or "developer" in message_lower or "code" in message_lower:
-                    responding_agents.append("neymar")
-                if "mbappe" in message_lower or "mbappé" in message_lower or "qa" in message_lower or "test" in message_lower:
-                    responding_agents.append("mbappe")
-                if "benzema" in message_lower or "devops" in message_lower or "deploy" in message_lower:
-                    responding_agents.append("benzema")
-                if "modric" in message_lower or "project manager" in message_lower or "planning" in message_lower:
-                    responding_agents.append("modric")
-                if "ramos" in message_lower or "security" in message_lower:
-                    responding_agents.append("ramos")
-                
-                # Check for team/everyone calls OR document upload (trigger full team)
-                if "team" in message_lower or "everyone" in message_lower or "all" in message_lower or uploaded_files:
-                    responding_agents = ["modric", "messi", "ronaldo", "neymar", "mbappe", "benzema", "ramos"]
-                    # Modric first to coordinate
-                
-                # Default to Modric if no specific agent mentioned
-                if not responding_agents:
-                    responding_agents = ["modric"]
+            responding_agents, message = select_responding_agents(message, chat_mode, uploaded_files)
             
             responses = []
             
@@ -1798,8 +1826,15 @@ sonar-scanner -Dsonar.projectKey=myapp
                     # Only use multiple rounds in team mode with documents
                     max_rounds = 3 if (uploaded_files and chat_mode == 'team') else 1
                     all_responses = []
+                    skipped_agents = []
+                    rounds_completed = 0
+                    deadline_hit = False
                     
                     for round_num in range(max_rounds):
+                        remaining = deadline_at - time.monotonic()
+                        if round_num > 0 and remaining < MIN_EXTRA_ROUND_SECONDS:
+                            deadline_hit = True
+                            break  # Not enough time for another discussion round
                         round_responses = []
                         
                         # Build conversation context from previous rounds
@@ -1815,6 +1850,13 @@ sonar-scanner -Dsonar.projectKey=myapp
                             if not agent_config:
                                 continue
                             
+                            remaining = deadline_at - time.monotonic()
+                            if remaining < MIN_CALL_SECONDS:
+                                # Out of time: return what the team said so far
+                                skipped_agents.append(agent_key)
+                                deadline_hit = True
+                                continue
+                            
                             try:
                                 # Add conversation history to message for context
                                 full_message = message + conversation_history
@@ -1825,8 +1867,10 @@ sonar-scanner -Dsonar.projectKey=myapp
                                         {"role": "user", "content": full_message}
                                     ],
                                     model=agent_config["model"],
-                                    max_tokens=800,  # More tokens for collaboration
-                                    temperature=0.7
+                                    # More tokens for collaboration, fewer as the deadline nears
+                                    max_tokens=max(64, min(800, int((remaining - 1) * TOKENS_PER_SECOND))),
+                                    temperature=0.7,
+                                    timeout=remaining
                                 )
                                 
                                 ai_response = chat_completion.choices[0].message.content
@@ -1844,10 +1888,8 @@ sonar-scanner -Dsonar.projectKey=myapp
                                 
                                 # Check if this response mentions other agents (for next round)
                                 # Only add mentioned agents in Team Mode to prevent multiple agents in Single Mode
-                                mentioned_agents = []
-                                for check_agent in agent_configs.keys():
-                                    if check_agent != agent_key and check_agent in ai_response.lower():
-                                        mentioned_agents.append(check_agent)
+                                named, _, _ = scan_agents(ai_response)
+                                mentioned_agents = [a for a in AGENT_ORDER if a in named and a != agent_key and a in agent_configs]
                                 
                                 if mentioned_agents and chat_mode == 'team':
                                     # Add mentioned agents to next round if not already there
@@ -1865,6 +1907,8 @@ sonar-scanner -Dsonar.projectKey=myapp
                                     "round": round_num + 1
                                 })
                         
+                        rounds_completed = round_num + 1
+                        
                         # If no new agents mentioned, stop early
                         if round_num > 0 and len(round_responses) == 0:
                             break
@@ -1875,8 +1919,10 @@ sonar-scanner -Dsonar.projectKey=myapp
                         "responses": responses,
                         "groq_configured": True,
                         "agents_responded": len(responses),
-                        "collaboration_rounds": max_rounds,
-                        "documents_analyzed": len(uploaded_files)
+                        "collaboration_rounds": rounds_completed,
+                        "documents_analyzed": len(uploaded_files),
+                        "partial": deadline_hit,
+                        "skipped_agents": skipped_agents
                     }
                 except ImportError:
                     response_data = {
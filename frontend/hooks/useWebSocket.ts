@@ -42,17 +42,20 @@ export const useWebSocket = (sessionId: string): UseWebSocketReturn => {
   const ws = useRef<WebSocket | null>(null);
   const retryRef = useRef(0);
   const manualCloseRef = useRef(false);
+  // Last frame_seq received; sent on reconnect so the backend replays what we missed
+  const lastSeqRef = useRef(0);
 
   const buildUrl = () => {
     // In production serverless, disable WebSocket (use REST API fallback)
     if (process.env.NODE_ENV === 'production') {
       return null; // Force REST API fallback
     }
+    const resume = lastSeqRef.current > 0 ? `?last_seq=${lastSeqRef.current}` : '';
     // Development: use WebSocket
     if (typeof window !== 'undefined' && process.env.NEXT_PUBLIC_WS_URL) {
-      return `${process.env.NEXT_PUBLIC_WS_URL}/ws/${sessionId}`;
+      return `${process.env.NEXT_PUBLIC_WS_URL}/ws/${sessionId}${resume}`;
     }
-    return `ws://localhost:8000/ws/${sessionId}`;
+    return `ws://localhost:8000/ws/${sessionId}${resume}`;
   };
 
   const getApiUrl = () => {
@@ -190,8 +193,42 @@ export const useWebSocket = (sessionId: string): UseWebSocketReturn => {
     ws.current.onmessage = (event) => {
       try {
         const data: any = JSON.parse(event.data);
-        if (data.type === 'agent_response') {
-          setMessages(prev => [...prev, data]);
+        if (typeof data.frame_seq === 'number') {
+          if (data.type === 'status_update' && data.status === 'connected') {
+            // Sent after any replay, so it also resets the count when the backend lost our frames (e.g. restart)
+            lastSeqRef.current = data.frame_seq;
+          } else if (data.frame_seq <= lastSeqRef.current) {
+            // Frames replayed after a reconnect that we already have are skipped
+            return;
+          } else {
+            lastSeqRef.current = data.frame_seq;
+          }
+        }
+        if (data.type === 'agent_response_start') {
+          // A streamed reply begins: show an empty bubble that deltas fill in
+          setMessages(prev => [...prev, {
+            type: 'agent_response',
+            agent: data.agent,
+            message: '',
+            timestamp: data.timestamp,
+            message_id: data.message_id,
+            streaming: true
+          }]);
+        } else if (data.type === 'agent_response_delta') {
+          setMessages(prev => prev.map(msg =>
+            msg.message_id === data.message_id ? { ...msg, message: msg.message + data.delta } : msg
+          ));
+        } else if (data.type === 'agent_response' || data.type === 'agent_response_end') {
+          if (data.type === 'agent_response_end') {
+            // Replace the streamed text with the final message
+            setMessages(prev => prev.map(msg =>
+              msg.message_id === data.message_id
+                ? { ...msg, message: data.message, timestamp: data.timestamp, streaming: false }
+                : msg
+            ));
+          } else {
+            setMessages(prev => [...prev, data]);
+          }
           
           // Handle agent status based on message content
           if (data.agent && data.agent !== 'system') {
@@ -307,6 +344,7 @@ export const useWebSocket = (sessionId: string): UseWebSocketReturn => {
 
   useEffect(() => {
     manualCloseRef.current = false;
+    lastSeqRef.current = 0;
     connect();
     return () => {
       manualCloseRef.current = true;
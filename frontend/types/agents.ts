@@ -22,6 +22,8 @@ export interface AgentMessage {
   details?: string;
   context?: any;
   uploadedFiles?: UploadedFile[];
+  message_id?: string;
+  streaming?: boolean;
 }
 
 export interface ProjectContext {